@@ -0,0 +1,141 @@
+<?php
+
+namespace App\Jobs;
+
+use App\Enums\TranscriptionStatus;
+use App\Models\Transcription;
+use App\Services\ModalService;
+use Illuminate\Contracts\Queue\ShouldQueue;
+use Illuminate\Foundation\Queue\Queueable;
+use RuntimeException;
+use Throwable;
+
+/**
+ * Follows a submitted Modal transcription job until it finishes.
+ *
+ * Each run is one status request: while the job is queued or running the
+ * progress goes into the transcription's metadata and the job is released
+ * back to the queue, with a delay that follows the job's ETA.
+ */
+class PollTranscription implements ShouldQueue
+{
+    use Queueable;
+
+    public const MIN_DELAY_S = 3;
+
+    public const MAX_DELAY_S = 30;
+
+    public int $timeout = 120;
+
+    /** Seconds before retrying after a failed status or result request. */
+    public array $backoff = [5, 15, 30];
+
+    public function __construct(
+        public readonly string $transcriptionId,
+        public readonly string $jobId,
+    ) {}
+
+    public function retryUntil(): \DateTimeInterface
+    {
+        return now()->addHours(3);
+    }
+
+    public function handle(ModalService $modalService): void
+    {
+        $transcription = Transcription::findOrFail($this->transcriptionId);
+        if ($transcription->status !== TranscriptionStatus::Processing) {
+            return;
+        }
+
+        $status = $modalService->transcriptionStatus($this->jobId);
+
+        // Expired or never stored: polling again would only get the same 404
+        if ($status === null) {
+            $message = "Transcription job {$this->jobId} is unknown to Modal";
+            $transcription->update([
+                'status' => TranscriptionStatus::Failed,
+                'error_message' => $message,
+            ]);
+            $this->fail($message);
+
+            return;
+        }
+
+        if ($status['state'] === 'done') {
+            $result = $modalService->transcriptionResult($this->jobId);
+            if ($result === null) {
+                throw new RuntimeException("Job {$this->jobId} is done but has no result yet");
+            }
+
+            $transcription->update([
+                'status' => TranscriptionStatus::Completed,
+                'text' => $result['text'] ?? null,
+                'inference_time_s' => $result['inference_s'] ?? null,
+                'rtf' => $result['rtf'] ?? null,
+                'metadata' => $result + ['job_id' => $this->jobId],
+            ]);
+
+            return;
+        }
+
+        if (in_array($status['state'], ['failed', 'cancelled'], true)) {
+            $transcription->update([
+                'status' => TranscriptionStatus::Failed,
+                'error_message' => mb_substr(
+                    "Transcription job {$status['state']}: ".($status['error'] ?? ''), 0, 1000
+                ),
+            ]);
+
+            return;
+        }
+
+        $transcription->update([
+            'metadata' => [
+                'job_id' => $this->jobId,
+                'job_state' => $status['state'],
+                'chunks_done' => $status['chunks_done'] ?? 0,
+                'chunks_planned' => $status['chunks_planned'] ?? null,
+                'eta_s' => $status['eta_s'] ?? null,
+            ],
+        ]);
+
+        $this->release($this->nextDelay($status['eta_s'] ?? null));
+    }
+
+    /**
+     * Poll again at about half the remaining ETA, within MIN_DELAY_S..MAX_DELAY_S.
+     */
+    public function nextDelay(?float $etaSeconds): int
+    {
+        if ($etaSeconds === null) {
+            return self::MIN_DELAY_S;
+        }
+
+        return (int) max(self::MIN_DELAY_S, min(self::MAX_DELAY_S, ceil($etaSeconds / 2)));
+    }
+
+    /**
+     * Polling gave up: mark the transcription failed and stop the Modal job,
+     * which would otherwise keep its GPU busy for a result nobody collects.
+     */
+    public function failed(?Throwable $e): void
+    {
+        $updated = Transcription::whereKey($this->transcriptionId)
+            ->where('status', TranscriptionStatus::Processing)
+            ->update([
+                'status' => TranscriptionStatus::Failed,
+                'error_message' => mb_substr($e?->getMessage() ?? 'Polling gave up', 0, 1000),
+            ]);
+
+        // Nothing to stop if handle() already saw the job end
+        if ($updated === 0) {
+            return;
+        }
+
+        try {
+            app(ModalService::class)->cancelTranscription($this->jobId);
+        } catch (Throwable $cancelError) {
+            report($cancelError);
+        }
+    }
+}
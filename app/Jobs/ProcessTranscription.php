@@ -28,6 +28,23 @@ class ProcessTranscription implements ShouldQueue
         try {
             $audioPath = storage_path("app/{$transcription->audio_path}");
 
+            // Submit and hand over to PollTranscription: the worker is free at once
+            if ($modalService->supportsJobs()) {
+                $job = $modalService->submitTranscription(
+                    audioPath: $audioPath,
+                    language: $transcription->language,
+                );
+
+                $transcription->update([
+                    'metadata' => ['job_id' => $job['job_id'], 'job_state' => $job['state']],
+                ]);
+
+                PollTranscription::dispatch($transcription->id, $job['job_id'])
+                    ->delay(now()->addSeconds(PollTranscription::MIN_DELAY_S));
+
+                return;
+            }
+
             $result = $modalService->transcribe(
                 audioPath: $audioPath,
                 language: $transcription->language,
@@ -37,7 +37,8 @@ class ModalService
 
         $response = Http::timeout(300)
             ->attach('file', file_get_contents($audioPath), basename($audioPath))
-            ->post($endpoint, ['language' => $language]);
+            // checkpoint: a retried job resumes from the chunks the failed attempt finished
+            ->post($endpoint, ['language' => $language, 'checkpoint' => 'true']);
 
         if (! $response->successful()) {
             throw new RuntimeException(
@@ -48,6 +49,102 @@ class ModalService
         return $response->json();
     }
 
+    /**
+     * Whether the model has the submitted-job endpoints configured.
+     */
+    public function supportsJobs(?string $model = null): bool
+    {
+        $model ??= $this->defaultModel('stt');
+        $jobs = $this->getModelConfig($model)['jobs'] ?? [];
+
+        return ! empty($jobs['submit']) && ! empty($jobs['status']) && ! empty($jobs['result']);
+    }
+
+    /**
+     * Queue a transcription; returns at once.
+     *
+     * @return array{job_id: string, state: string}
+     */
+    public function submitTranscription(string $audioPath, string $language = 'pt', ?string $model = null): array
+    {
+        $model ??= $this->defaultModel('stt');
+
+        $response = Http::timeout(120)
+            ->attach('file', file_get_contents($audioPath), basename($audioPath))
+            ->post($this->getJobEndpoint($model, 'submit'), ['language' => $language]);
+
+        if (! $response->successful()) {
+            throw new RuntimeException(
+                "Transcription submit failed ({$response->status()}): {$response->body()}"
+            );
+        }
+
+        return $response->json();
+    }
+
+    /**
+     * Progress of a submitted transcription; null if Modal does not know the job.
+     *
+     * @return array{state: string, chunks_done: int, chunks_planned: ?int, eta_s: ?float, error: ?string, ...}|null
+     */
+    public function transcriptionStatus(string $jobId, ?string $model = null): ?array
+    {
+        $model ??= $this->defaultModel('stt');
+
+        $response = Http::timeout(30)
+            ->get($this->getJobEndpoint($model, 'status'), ['job_id' => $jobId]);
+
+        if ($response->status() === 404) {
+            return null;
+        }
+
+        if (! $response->successful()) {
+            throw new RuntimeException(
+                "Transcription status failed ({$response->status()}): {$response->body()}"
+            );
+        }
+
+        return $response->json();
+    }
+
+    /**
+     * Result of a finished transcription job; null while it is still running.
+     *
+     * @return array{text: string, language: string, duration_audio_s: float, inference_s: float, ...}|null
+     */
+    public function transcriptionResult(string $jobId, ?string $model = null): ?array
+    {
+        $model ??= $this->defaultModel('stt');
+
+        $response = Http::timeout(60)
+            ->get($this->getJobEndpoint($model, 'result'), ['job_id' => $jobId]);
+
+        if ($response->status() === 202) {
+            return null;
+        }
+
+        if (! $response->successful()) {
+            throw new RuntimeException(
+                "Transcription result failed ({$response->status()}): {$response->body()}"
+            );
+        }
+
+        return $response->json();
+    }
+
+    /**
+     * Ask a submitted transcription to stop.
+     */
+    public function cancelTranscription(string $jobId, ?string $model = null): bool
+    {
+        $model ??= $this->defaultModel('stt');
+
+        $response = Http::timeout(30)
+            ->post($this->getJobEndpoint($model, 'cancel').'?'.http_build_query(['job_id' => $jobId]));
+
+        return $response->successful() && ($response->json('cancelled') ?? false);
+    }
+
     /**
      * Check health of a deployed model endpoint.
      */
@@ -312,6 +409,22 @@ class ModalService
         return $endpoint;
     }
 
+    /**
+     * URL of one of the model's submitted-job endpoints (submit, status, result, cancel).
+     */
+    private function getJobEndpoint(string $model, string $action): string
+    {
+        $endpoint = $this->getModelConfig($model)['jobs'][$action] ?? null;
+
+        if (! $endpoint) {
+            throw new RuntimeException(
+                "Model '{$model}' has no job {$action} endpoint configured."
+            );
+        }
+
+        return $endpoint;
+    }
+
     private function getModelConfig(string $model): array
     {
         if (! isset($this->models[$model])) {
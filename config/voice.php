@@ -17,6 +17,14 @@ return [
             'deployed' => true,
             'endpoint' => env('WHISPER_HTTP_ENDPOINT'),
             'health' => env('WHISPER_HTTP_HEALTH'),
+            // Submitted jobs (web_submit / web_job_*): queue workers poll
+            // instead of holding one HTTP call for the whole transcription
+            'jobs' => [
+                'submit' => env('WHISPER_HTTP_SUBMIT'),
+                'status' => env('WHISPER_HTTP_JOB_STATUS'),
+                'result' => env('WHISPER_HTTP_JOB_RESULT'),
+                'cancel' => env('WHISPER_HTTP_JOB_CANCEL'),
+            ],
         ],
         'whisper-offline' => [
             'script' => 'modal_whisper_offline.py',
@@ -0,0 +1,451 @@
+"""In-process audio decoding shared by the Modal services.
+
+Everything here works on in-memory buffers: no temp files, no ffmpeg fork for
+the formats libsndfile understands. Canonical input (PCM WAV, 16 kHz mono) is
+viewed directly from the upload bytes without any decoding at all.
+
+Decode order:
+    1. WAV fast path -- RIFF header parsed here, samples viewed via np.frombuffer
+    2. soundfile on a BytesIO -- FLAC, OGG/Vorbis/Opus, MP3, other WAV subtypes
+    3. ffmpeg over pipes -- exotic codecs only (AAC/M4A, WebM, AMR, ...)
+
+Files on a volume can instead be decoded block by block (iter_decode_file),
+so memory stays constant however long the recording is.
+
+Clients can transcode before uploading (transcode_file) to 16 kHz mono FLAC,
+Opus or raw int16 and tag the payload with that audio_format: the server then
+skips container sniffing and resampling, and raw "pcm_s16le" is not decoded
+at all -- the samples are a view of the upload.
+
+Headerless mono PCM straight from a capture (browser AudioWorklet, mobile
+recorder) is accepted too: audio_format "pcm_s16le" or "pcm_f32le" plus the
+sample_rate it was captured at; only the resample to TARGET_SR remains.
+
+Used by:
+    whisper_service.py (modal_whisper_http.py, modal_whisper_vllm.py),
+    modal_tts_qwen_vllm_snap.py, modal_tts_qwen_vllm.py, modal_tts_chatterbox.py,
+    modal_tts_qwen_native.py, modal_voice_analyzer.py
+
+Images that import this module need `.add_local_python_source("audio_io")`
+plus numpy, soundfile and soxr.
+"""
+
+import io
+import os
+import struct
+import subprocess
+import tempfile
+import time
+from typing import Iterator
+
+import numpy as np
+
+TARGET_SR = 16000
+STREAM_BLOCK_SECONDS = 10
+# audio_format tags for payloads already converted to TARGET_SR mono;
+# "auto" (untagged) sniffs the container
+SPEECH_FORMATS = ("pcm_s16le", "flac", "opus")
+_SPEECH_CONTAINERS = {"flac": ("FLAC", "PCM_16"), "opus": ("OGG", "OPUS")}
+# Headerless mono PCM: audio_format -> sample dtype; the rate is declared
+# by the caller (sample_rate=), TARGET_SR unless stated otherwise
+RAW_FORMATS = {"pcm_s16le": "<i2", "pcm_f32le": "<f4"}
+
+_WAVE_FORMAT_PCM = 1
+_WAVE_FORMAT_IEEE_FLOAT = 3
+_WAVE_FORMAT_EXTENSIBLE = 0xFFFE
+
+# Raised (as ValueError, a client error) when neither soundfile nor ffmpeg can decode
+_NO_FFMPEG = "Could not decode audio: not a format soundfile reads, and ffmpeg is not installed"
+
+
+def wav_header(num_samples: int, sr: int = TARGET_SR, channels: int = 1) -> bytes:
+    """44-byte header for 16-bit PCM WAV data of num_samples frames."""
+    data_size = num_samples * channels * 2
+    return b"".join([
+        b"RIFF",
+        struct.pack("<I", 36 + data_size),
+        b"WAVE",
+        b"fmt ",
+        struct.pack("<IHHIIHH", 16, _WAVE_FORMAT_PCM, channels, sr,
+                    sr * channels * 2, channels * 2, 16),
+        b"data",
+        struct.pack("<I", data_size),
+    ])
+
+
+def _parse_wav(data) -> tuple[np.ndarray, int] | None:
+    try:
+        return _parse_wav_chunks(memoryview(data))
+    except struct.error:
+        return None
+
+
+def _parse_wav_chunks(view: memoryview) -> tuple[np.ndarray, int] | None:
+    """View the samples of a PCM16/float32 WAV without copying.
+
+    Returns (frames x channels array, sample rate), or None when the buffer is
+    not a WAV this fast path understands (caller falls back to soundfile).
+    """
+    if len(view) < 12 or view[:4] != b"RIFF" or view[8:12] != b"WAVE":
+        return None
+
+    fmt = None
+    pos = 12
+    while pos + 8 <= len(view):
+        chunk_id = bytes(view[pos:pos + 4])
+        (size,) = struct.unpack_from("<I", view, pos + 4)
+        body = pos + 8
+        if chunk_id == b"fmt ":
+            tag, channels, sr, _, _, bits = struct.unpack_from("<HHIIHH", view, body)
+            if tag == _WAVE_FORMAT_EXTENSIBLE and size >= 40:
+                (tag,) = struct.unpack_from("<H", view, body + 24)
+            fmt = (tag, channels, sr, bits)
+        elif chunk_id == b"data":
+            if fmt is None:
+                return None
+            tag, channels, sr, bits = fmt
+            if (tag, bits) == (_WAVE_FORMAT_PCM, 16):
+                dtype = "<i2"
+            elif (tag, bits) == (_WAVE_FORMAT_IEEE_FLOAT, 32):
+                dtype = "<f4"
+            else:
+                return None
+            frame_bytes = channels * bits // 8
+            if frame_bytes == 0 or sr == 0:
+                return None  # malformed fmt chunk: let soundfile/ffmpeg reject it
+            # Streaming writers leave size at 0/0xFFFFFFFF: take the rest
+            end = len(view) if size in (0, 0xFFFFFFFF) else min(body + size, len(view))
+            end -= (end - body) % frame_bytes
+            samples = np.frombuffer(view[body:end], dtype=dtype)
+            return samples.reshape(-1, channels), sr
+        pos = body + size + (size & 1)
+    return None
+
+
+def _decode_soundfile(data, dtype: str = "float32") -> tuple[np.ndarray, int] | None:
+    import soundfile as sf
+
+    try:
+        audio, sr = sf.read(io.BytesIO(data), dtype=dtype, always_2d=True)
+    except (RuntimeError, TypeError):
+        return None
+    return audio, sr
+
+
+def _decode_ffmpeg(data, sr: int) -> np.ndarray:
+    """Decode via ffmpeg to mono float32 at sr, over stdin/stdout pipes.
+
+    MP4/M4A files with the index (moov atom) at the end cannot be demuxed from
+    a pipe; those are retried from a temp file as a last resort.
+    """
+    cmd = ["ffmpeg", "-nostdin", "-hide_banner", "-loglevel", "error"]
+    out_args = ["-f", "f32le", "-ac", "1", "-ar", str(sr), "pipe:1"]
+
+    try:
+        proc = subprocess.run(
+            cmd + ["-i", "pipe:0"] + out_args, input=bytes(data), capture_output=True,
+        )
+    except FileNotFoundError as e:
+        raise ValueError(_NO_FFMPEG) from e
+    if proc.returncode == 0 and proc.stdout:
+        return np.frombuffer(proc.stdout, dtype="<f4")
+
+    with tempfile.NamedTemporaryFile(suffix=".input", delete=False) as f:
+        f.write(data)
+        tmp_path = f.name
+    try:
+        proc = subprocess.run(cmd + ["-i", tmp_path] + out_args, capture_output=True)
+    finally:
+        os.unlink(tmp_path)
+    if proc.returncode != 0:
+        raise ValueError(
+            f"Could not decode audio: {proc.stderr.decode(errors='replace')[-500:]}"
+        )
+    return np.frombuffer(proc.stdout, dtype="<f4")
+
+
+def to_float32(samples: np.ndarray) -> np.ndarray:
+    """int16 or float samples -> float32 in [-1, 1]."""
+    if samples.dtype == np.int16:
+        return samples.astype(np.float32) * (1.0 / 32768.0)
+    return samples.astype(np.float32, copy=False)
+
+
+def to_int16(samples: np.ndarray) -> np.ndarray:
+    """float samples in [-1, 1] (or int16) -> int16."""
+    if samples.dtype == np.int16:
+        return samples
+    # Same 1/32768 scale as to_float32 (and libsndfile), so int16 -> float -> int16
+    # round-trips exactly and re-encoded copies of the same PCM hash the same.
+    scaled = np.multiply(samples, 32768.0, dtype=np.float32)
+    np.rint(scaled, out=scaled)
+    return np.clip(scaled, -32768, 32767, out=scaled).astype(np.int16)
+
+
+def to_mono(frames: np.ndarray) -> np.ndarray:
+    """(frames x channels) -> 1-D. Mono input is returned as a view."""
+    if frames.ndim == 1:
+        return frames
+    if frames.shape[1] == 1:
+        return frames[:, 0]
+    return to_float32(frames).mean(axis=1, dtype=np.float32)
+
+
+def resample(audio: np.ndarray, orig_sr: int, target_sr: int = TARGET_SR) -> np.ndarray:
+    """Band-limited resample (soxr, vectorized C). No-op when rates match."""
+    if orig_sr == target_sr:
+        return audio
+    import soxr
+
+    return soxr.resample(to_float32(audio), orig_sr, target_sr, quality="HQ")
+
+
+def decode_audio(data, sr: int = TARGET_SR, dtype: str = "float32",
+                 timings: dict | None = None, audio_format: str = "auto",
+                 sample_rate: int = TARGET_SR) -> np.ndarray:
+    """Decode an in-memory audio file to mono samples at sr.
+
+    Args:
+        data: Encoded file contents (bytes, bytearray or memoryview).
+        sr: Output sample rate.
+        dtype: "float32" ([-1, 1]) or "int16".
+        timings: If given, filled with "decoder" (pcm/wav/soundfile/ffmpeg),
+            "decode_s" and "resample_s" (resample + dtype conversion).
+        audio_format: "auto", one of SPEECH_FORMATS for payloads made by
+            transcode_file, or "pcm_f32le" (see RAW_FORMATS).
+        sample_rate: Rate of headerless RAW_FORMATS input; ignored otherwise.
+
+    PCM16 mono WAV at the target rate, or "pcm_s16le" at TARGET_SR, decoded
+    with dtype="int16" is a zero-copy view of data.
+    """
+    t0 = time.perf_counter()
+    if audio_format in RAW_FORMATS:
+        decoder = "pcm"
+        decoded = _view_raw(data, audio_format).reshape(-1, 1), _raw_rate(sample_rate)
+    elif audio_format in _SPEECH_CONTAINERS:
+        # Known container: no WAV sniffing, and no ffmpeg fork if it is not one;
+        # the mono 16 kHz int16 the transcoder wrote needs no float round trip
+        decoder = "soundfile"
+        decoded = _decode_soundfile(data, "int16" if dtype == "int16" else "float32")
+        if decoded is None:
+            raise ValueError(f"Could not decode audio: not a readable {audio_format} payload")
+    elif audio_format == "auto":
+        decoder = "wav"
+        decoded = _parse_wav(data)
+        if decoded is None:
+            decoder = "soundfile"
+            decoded = _decode_soundfile(data)
+    else:
+        raise ValueError(f"Unknown audio_format {audio_format!r}")
+    if decoded is not None:
+        frames, orig_sr = decoded
+        t1 = time.perf_counter()
+        audio = resample(to_mono(frames), orig_sr, sr)
+    else:
+        # ffmpeg resamples while decoding
+        decoder = "ffmpeg"
+        audio = _decode_ffmpeg(data, sr)
+        t1 = time.perf_counter()
+
+    audio = to_int16(audio) if dtype == "int16" else to_float32(audio)
+    if timings is not None:
+        timings.update(
+            decoder=decoder, decode_s=t1 - t0, resample_s=time.perf_counter() - t1,
+        )
+    return audio
+
+
+def _view_raw(data, audio_format: str = "pcm_s16le") -> np.ndarray:
+    """Headerless little-endian samples (RAW_FORMATS), viewed without copying."""
+    dtype = np.dtype(RAW_FORMATS[audio_format])
+    view = memoryview(data).cast("B")
+    return np.frombuffer(view[:len(view) - len(view) % dtype.itemsize], dtype=dtype)
+
+
+def _raw_rate(sample_rate) -> int:
+    if isinstance(sample_rate, bool) or not isinstance(sample_rate, int) or sample_rate <= 0:
+        raise ValueError(f"sample_rate must be a positive integer, got {sample_rate!r}")
+    return sample_rate
+
+
+def _add_time(timings: dict | None, key: str, seconds: float) -> None:
+    if timings is not None:
+        timings[key] = timings.get(key, 0.0) + seconds
+
+
+def iter_wav_chunks(pcm: np.ndarray, spans, sr: int = TARGET_SR):
+    """Yield (WAV header, memoryview) for each (start, end) sample span of pcm.
+
+    pcm must be mono int16. Each chunk is a view into pcm -- no samples are
+    copied or encoded; b"".join(chunk) gives the complete WAV file when the
+    bytes are actually needed.
+    """
+    if pcm.dtype != np.int16:
+        raise TypeError(f"iter_wav_chunks needs int16 samples, got {pcm.dtype}")
+    pcm_view = memoryview(np.ascontiguousarray(pcm)).cast("B")
+    for start, end in spans:
+        yield wav_header(end - start, sr), pcm_view[start * 2:end * 2]
+
+
+def to_wav_bytes(audio: np.ndarray, sr: int = TARGET_SR) -> bytes:
+    """Mono samples -> 16-bit PCM WAV file bytes."""
+    pcm = to_int16(audio)
+    return wav_header(len(pcm), sr) + pcm.tobytes()
+
+
+def iter_decode_file(path: str, sr: int = TARGET_SR,
+                     block_seconds: float = STREAM_BLOCK_SECONDS,
+                     timings: dict | None = None,
+                     audio_format: str = "auto",
+                     sample_rate: int = TARGET_SR) -> Iterator[np.ndarray]:
+    """Decode an audio file to mono int16 blocks at sr, in constant memory.
+
+    soundfile reads block_seconds of the file at a time and soxr resamples
+    each block with carried-over filter state; formats libsndfile cannot
+    open are decoded by an ffmpeg subprocess read from a pipe. Concatenating
+    the blocks gives the same samples decode_audio(..., dtype="int16") would,
+    up to resampler edge effects.
+
+    timings, if given, accumulates "decode_s" and "resample_s" as decode_audio
+    reports them (time spent by the consumer between blocks is not counted).
+    audio_format and sample_rate are as for decode_audio.
+    """
+    import soundfile as sf
+
+    if audio_format in RAW_FORMATS:
+        if timings is not None:
+            timings["decoder"] = "pcm"
+        yield from _iter_raw_file(
+            path, sr, block_seconds, timings, audio_format, _raw_rate(sample_rate),
+        )
+        return
+    if audio_format not in ("auto", *_SPEECH_CONTAINERS):
+        raise ValueError(f"Unknown audio_format {audio_format!r}")
+
+    try:
+        f = sf.SoundFile(path)
+    except (RuntimeError, TypeError):
+        if audio_format != "auto":
+            raise ValueError(f"Could not decode audio: not a readable {audio_format} file")
+        if timings is not None:
+            timings["decoder"] = "ffmpeg"
+        yield from _iter_decode_ffmpeg(path, sr, block_seconds, timings)
+        return
+
+    if timings is not None:
+        timings["decoder"] = "soundfile"
+    with f:
+        resampler = None
+        if f.samplerate != sr:
+            import soxr
+
+            resampler = soxr.ResampleStream(f.samplerate, sr, 1, dtype="float32", quality="HQ")
+        # PCM16 mono at the target rate needs no float round trip
+        dtype = "int16" if resampler is None and f.channels == 1 else "float32"
+        blocksize = max(1, int(block_seconds * f.samplerate))
+        blocks = f.blocks(blocksize=blocksize, dtype=dtype, always_2d=True)
+        while True:
+            t0 = time.perf_counter()
+            block = next(blocks, None)
+            if block is None:
+                break
+            t1 = time.perf_counter()
+            mono = to_mono(block)
+            if resampler is not None:
+                mono = resampler.resample_chunk(np.ascontiguousarray(mono, dtype=np.float32))
+            mono = to_int16(mono)
+            _add_time(timings, "decode_s", t1 - t0)
+            _add_time(timings, "resample_s", time.perf_counter() - t1)
+            if len(mono):
+                yield mono
+        if resampler is not None:
+            tail = resampler.resample_chunk(np.zeros(0, dtype=np.float32), last=True)
+            if len(tail):
+                yield to_int16(tail)
+
+
+def _iter_raw_file(path: str, sr: int, block_seconds: float,
+                   timings: dict | None = None, audio_format: str = "pcm_s16le",
+                   sample_rate: int = TARGET_SR) -> Iterator[np.ndarray]:
+    block_bytes = int(block_seconds * sample_rate) * np.dtype(RAW_FORMATS[audio_format]).itemsize
+    resampler = None
+    if sr != sample_rate:
+        import soxr
+
+        resampler = soxr.ResampleStream(sample_rate, sr, 1, dtype="float32", quality="HQ")
+    with open(path, "rb") as f:
+        while True:
+            t0 = time.perf_counter()
+            block = f.read(block_bytes)
+            t1 = time.perf_counter()
+            _add_time(timings, "decode_s", t1 - t0)
+            if not block:
+                break
+            pcm = _view_raw(block, audio_format)
+            if resampler is not None:
+                pcm = resampler.resample_chunk(to_float32(pcm))
+            pcm = to_int16(pcm)
+            _add_time(timings, "resample_s", time.perf_counter() - t1)
+            if len(pcm):
+                yield pcm
+    if resampler is not None:
+        tail = resampler.resample_chunk(np.zeros(0, dtype=np.float32), last=True)
+        if len(tail):
+            yield to_int16(tail)
+
+
+def transcode_file(path: str, audio_format: str = "flac",
+                   timings: dict | None = None) -> bytes:
+    """Re-encode an audio file as 16 kHz mono speech, for the client to upload.
+
+    audio_format is one of SPEECH_FORMATS: "flac" (lossless, ~1 MB/min),
+    "opus" (Ogg Opus, ~0.2 MB/min) or "pcm_s16le" (raw int16, 1.9 MB/min,
+    no decode at all on the server). Decoding is streamed (iter_decode_file),
+    so only the encoded output is held in memory.
+    """
+    blocks = iter_decode_file(path, TARGET_SR, timings=timings)
+    if audio_format == "pcm_s16le":
+        return b"".join(block.tobytes() for block in blocks)
+    if audio_format not in _SPEECH_CONTAINERS:
+        raise ValueError(f"Unknown audio_format {audio_format!r}")
+    import soundfile as sf
+
+    container, subtype = _SPEECH_CONTAINERS[audio_format]
+    buf = io.BytesIO()
+    with sf.SoundFile(buf, "w", TARGET_SR, 1, subtype, format=container) as out:
+        for block in blocks:
+            out.write(block)
+    return buf.getvalue()
+
+
+def _iter_decode_ffmpeg(path: str, sr: int, block_seconds: float,
+                        timings: dict | None = None) -> Iterator[np.ndarray]:
+    cmd = [
+        "ffmpeg", "-nostdin", "-hide_banner", "-loglevel", "error",
+        "-i", path, "-f", "s16le", "-ac", "1", "-ar", str(sr), "pipe:1",
+    ]
+    block_bytes = int(block_seconds * sr) * 2
+    with tempfile.TemporaryFile() as stderr:
+        try:
+            proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=stderr)
+        except FileNotFoundError as e:
+            raise ValueError(_NO_FFMPEG) from e
+        with proc:
+            try:
+                while True:
+                    t0 = time.perf_counter()
+                    block = proc.stdout.read(block_bytes)
+                    _add_time(timings, "decode_s", time.perf_counter() - t0)
+                    if not block:
+                        break
+                    usable = len(block) - len(block) % 2
+                    yield np.frombuffer(block[:usable], dtype="<i2")
+            finally:
+                # Consumer stopped early (or failed): don't leave ffmpeg running
+                if proc.poll() is None:
+                    proc.kill()
+            if proc.wait() != 0:
+                stderr.seek(0)
+                raise ValueError(
+                    f"Could not decode audio: {stderr.read().decode(errors='replace')[-500:]}"
+                )
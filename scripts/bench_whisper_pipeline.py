@@ -0,0 +1,302 @@
+#!/usr/bin/env python3
+"""Offline CPU benchmark for the Whisper preprocessing path (no GPU, no Modal).
+
+Times every CPU stage between an upload and the vLLM requests -- WAV header
+parsing, decode, resample, VAD chunk planning, chunk encoding, the streaming
+decode+plan used for volume files -- plus transcript stitching, on synthetic
+speech-like audio in several formats, sample rates and channel layouts.
+
+Results (median time, x-realtime throughput, peak traced memory per stage)
+are written as JSON; with --baseline they are compared against a previous
+run and the exit code is 1 when any stage regressed.
+
+Usage:
+    python3 scripts/bench_whisper_pipeline.py --output bench.json
+    python3 scripts/bench_whisper_pipeline.py --baseline bench.json
+    python3 scripts/bench_whisper_pipeline.py --full --durations 30 600 1800
+
+Needs numpy, soundfile and soxr; ffmpeg on PATH adds the M4A (AAC) cases.
+"""
+
+import argparse
+import io
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+import soundfile as sf
+
+import audio_io
+import whisper_pipeline
+from warmup import synth_speech
+
+FORMATS = ["wav16", "wavf32", "flac", "ogg", "m4a"]
+RATES = [8000, 16000, 44100, 48000]
+DEFAULT_DURATIONS = [30, 600]
+STITCH_CHUNKS = [10, 120]
+
+# Regressions below these absolute deltas are treated as noise
+MIN_DELTA_S = 0.005
+MIN_DELTA_MB = 1.0
+
+
+# ---------------------------------------------------------------------------
+# Synthetic input
+# ---------------------------------------------------------------------------
+
+def encode(audio: np.ndarray, sr: int, fmt: str) -> bytes | None:
+    """Encode audio as an upload would arrive. None if no local encoder."""
+    buf = io.BytesIO()
+    if fmt == "wav16":
+        sf.write(buf, audio, sr, format="WAV", subtype="PCM_16")
+    elif fmt == "wavf32":
+        sf.write(buf, audio, sr, format="WAV", subtype="FLOAT")
+    elif fmt == "flac":
+        sf.write(buf, audio, sr, format="FLAC")
+    elif fmt == "ogg":
+        sf.write(buf, audio, sr, format="OGG", subtype="VORBIS")
+    elif fmt == "m4a":
+        if not shutil.which("ffmpeg"):
+            return None
+        # MP4 needs a seekable output
+        with tempfile.NamedTemporaryFile(suffix=".m4a") as out:
+            wav = encode(audio, sr, "wav16")
+            subprocess.run(
+                ["ffmpeg", "-nostdin", "-loglevel", "error", "-y", "-i", "pipe:0",
+                 "-c:a", "aac", "-b:a", "96k", out.name],
+                input=wav, check=True,
+            )
+            return open(out.name, "rb").read()
+    return buf.getvalue()
+
+
+# ---------------------------------------------------------------------------
+# Measurement
+# ---------------------------------------------------------------------------
+
+def measure(fn, repeats: int) -> dict:
+    """Median/min wall time over repeats, then one traced run for peak memory."""
+    fn()  # warm-up: first-call imports and allocator growth are not the stage's cost
+    times = []
+    for _ in range(repeats):
+        t0 = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - t0)
+
+    tracemalloc.start()
+    try:
+        fn()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return {
+        "median_s": statistics.median(times),
+        "min_s": min(times),
+        "peak_mb": peak / 1e6,
+    }
+
+
+def bench_case(fmt: str, sr: int, channels: int, seconds: float,
+               repeats: int) -> tuple[dict, str | None]:
+    """All preprocessing stages for one input. Returns (stage -> stats, skip reason)."""
+    data = encode(synth_speech(seconds, sr, channels), sr, fmt)
+    if data is None:
+        return {}, "no local encoder (ffmpeg not on PATH)"
+
+    stages = {}
+    if fmt.startswith("wav"):
+        stages["wav_parse"] = measure(lambda: audio_io._parse_wav(data), repeats)
+
+    # decode_audio reports decode vs resample; time each side from its own report
+    split = {"decode_s": [], "resample_s": []}
+
+    def decode():
+        timings = {}
+        audio_io.decode_audio(data, audio_io.TARGET_SR, dtype="int16", timings=timings)
+        split["decode_s"].append(timings["decode_s"])
+        split["resample_s"].append(timings["resample_s"])
+
+    stages["decode_total"] = measure(decode, repeats)
+    for key in ("decode", "resample"):
+        samples = split[f"{key}_s"][1:repeats + 1]
+        stages[key] = {"median_s": statistics.median(samples), "min_s": min(samples)}
+
+    pcm = audio_io.decode_audio(data, audio_io.TARGET_SR, dtype="int16")
+    stages["plan"] = measure(
+        lambda: whisper_pipeline.plan_chunks(pcm, audio_io.TARGET_SR), repeats,
+    )
+
+    spans, _ = whisper_pipeline.plan_chunks(pcm, audio_io.TARGET_SR)
+
+    def encode_chunks():
+        # WAV header + PCM view -> request body, as each dispatched chunk does
+        for chunk in audio_io.iter_wav_chunks(pcm, spans, audio_io.TARGET_SR):
+            b"".join(chunk)
+
+    stages["chunk_encode"] = measure(encode_chunks, repeats)
+
+    with tempfile.NamedTemporaryFile(suffix=f".{fmt}") as f:
+        f.write(data)
+        f.flush()
+
+        def stream():
+            plan = {"spans_s": [], "skipped_s": 0.0}
+            blocks = audio_io.iter_decode_file(f.name, audio_io.TARGET_SR)
+            for chunk in whisper_pipeline.stream_chunks(blocks, plan):
+                b"".join(chunk)
+
+        stages["stream_decode_plan"] = measure(stream, repeats)
+
+    for stats in stages.values():
+        stats["audio_s"] = seconds
+        stats["x_realtime"] = seconds / stats["median_s"] if stats["median_s"] else None
+    stages["decode_total"]["bytes_in"] = len(data)
+    return stages, None
+
+
+def synth_chunk_results(num_chunks: int, timed: bool, seed: int = 0):
+    """Chunk results shaped like vLLM verbose_json output, with 2s overlaps."""
+    rng = np.random.default_rng(seed)
+    vocab = [f"palavra{i}" for i in range(400)]
+    step = whisper_pipeline.CHUNK_SECONDS - whisper_pipeline.OVERLAP_SECONDS
+    spans = [(i * step, i * step + whisper_pipeline.CHUNK_SECONDS) for i in range(num_chunks)]
+
+    # One global word track; each chunk sees the words inside its span
+    n_words = int(spans[-1][1] * 2.5)
+    starts = np.sort(rng.uniform(0, spans[-1][1], n_words))
+    words = [vocab[i] for i in rng.integers(0, len(vocab), n_words)]
+
+    results = []
+    for index, (a, b) in enumerate(spans):
+        inside = [(w, t) for w, t in zip(words, starts) if a <= t < b]
+        results.append({
+            "index": index,
+            "text": " ".join(w for w, _ in inside),
+            "words": [
+                {"word": " " + w, "start": float(t - a), "end": float(t - a + 0.3)}
+                for w, t in inside
+            ] if timed else [],
+            "segments": [],
+        })
+    return results, spans
+
+
+def bench_stitch(repeats: int) -> dict:
+    out = {}
+    for num_chunks in STITCH_CHUNKS:
+        audio_s = num_chunks * whisper_pipeline.CHUNK_SECONDS
+        for mode, timed in (("timestamps", True), ("align", False), ("concat", True)):
+            results, spans = synth_chunk_results(num_chunks, timed)
+            stats = measure(
+                lambda: whisper_pipeline.stitch_chunks(results, spans, mode), repeats,
+            )
+            stats["audio_s"] = audio_s
+            stats["x_realtime"] = audio_s / stats["median_s"] if stats["median_s"] else None
+            out[f"stitch-{mode}-{num_chunks}chunks"] = stats
+    return out
+
+
+def cases(full: bool) -> list[tuple[str, int, int]]:
+    if full:
+        return [(fmt, sr, ch) for fmt in FORMATS for sr in RATES for ch in (1, 2)]
+    picked = [(fmt, 16000, 1) for fmt in FORMATS] + [(fmt, 48000, 2) for fmt in FORMATS]
+    picked += [("wav16", 8000, 1), ("wav16", 44100, 1)]
+    return picked
+
+
+# ---------------------------------------------------------------------------
+# Baseline comparison
+# ---------------------------------------------------------------------------
+
+def compare(current: dict, baseline: dict, tolerance: float) -> list[str]:
+    """Lines describing every stage that got slower or hungrier than baseline."""
+    regressions = []
+    for key, stats in current["results"].items():
+        base = baseline.get("results", {}).get(key)
+        if base is None:
+            continue
+        cur_t, base_t = stats["median_s"], base["median_s"]
+        if cur_t > base_t * (1 + tolerance) and cur_t - base_t > MIN_DELTA_S:
+            regressions.append(
+                f"{key}: {base_t * 1000:.1f}ms -> {cur_t * 1000:.1f}ms "
+                f"({cur_t / base_t - 1:+.0%})"
+            )
+        cur_m, base_m = stats.get("peak_mb"), base.get("peak_mb")
+        if (cur_m is not None and base_m is not None
+                and cur_m > base_m * (1 + tolerance) and cur_m - base_m > MIN_DELTA_MB):
+            regressions.append(f"{key}: peak {base_m:.1f}MB -> {cur_m:.1f}MB")
+    return regressions
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Benchmark Whisper preprocessing on CPU")
+    parser.add_argument("--durations", type=float, nargs="+", default=DEFAULT_DURATIONS,
+                        help="Synthetic audio lengths in seconds")
+    parser.add_argument("--repeats", type=int, default=3, help="Timed runs per stage")
+    parser.add_argument("--full", action="store_true",
+                        help="Every format x rate x mono/stereo (default: a representative subset)")
+    parser.add_argument("--output", help="Write results JSON here (default: stdout)")
+    parser.add_argument("--baseline", help="Compare against a previous results JSON")
+    parser.add_argument("--tolerance", type=float, default=0.25,
+                        help="Allowed slowdown / memory growth vs baseline (0.25 = 25%%)")
+    args = parser.parse_args()
+
+    report = {
+        "meta": {
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "soundfile": sf.__version__,
+            "machine": platform.machine(),
+            "cpus": os.cpu_count(),
+            "ffmpeg": bool(shutil.which("ffmpeg")),
+            "repeats": args.repeats,
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        },
+        "results": {},
+        "skipped": {},
+    }
+
+    for seconds in args.durations:
+        for fmt, sr, channels in cases(args.full):
+            name = f"{fmt}-{sr}hz-{'stereo' if channels == 2 else 'mono'}-{seconds:g}s"
+            print(f"  {name}...", file=sys.stderr, flush=True)
+            stages, skipped = bench_case(fmt, sr, channels, seconds, args.repeats)
+            if skipped:
+                report["skipped"][name] = skipped
+            for stage, stats in stages.items():
+                report["results"][f"{name}/{stage}"] = stats
+
+    print("  stitch...", file=sys.stderr, flush=True)
+    for name, stats in bench_stitch(args.repeats).items():
+        report["results"][f"{name}/stitch"] = stats
+
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+        print(f"Wrote {len(report['results'])} results to {args.output}", file=sys.stderr)
+    else:
+        print(text)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(report, json.load(f), args.tolerance)
+        if regressions:
+            print(f"\n{len(regressions)} regression(s) vs {args.baseline}:", file=sys.stderr)
+            for line in regressions:
+                print(f"  {line}", file=sys.stderr)
+            return 1
+        print(f"No regressions vs {args.baseline}", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+"""Benchmark the deployed Whisper services against each other.
+
+Sends the same files to WhisperHTTP (modal_whisper_http.py), WhisperService
+(modal_whisper_vllm.py, fp8 KV cache) and WhisperEngine (modal_whisper_engine.py,
+vLLM in-process, no HTTP hop) -- all run the same WhisperPipeline, so only
+the vLLM configuration and transport differ -- with the results cache bypassed, and
+reports the median of each result field per service and file, plus whether
+the transcripts agree.
+
+The first call to each service absorbs its cold start and is not counted.
+
+Usage:
+    python3 scripts/bench_whisper_services.py --audio docs/Refaudio.wav long.m4a
+    python3 scripts/bench_whisper_services.py --audio a.wav --repeats 5 --output bench.json
+"""
+
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+
+import modal
+
+SERVICES = {
+    "whisper-http": ("whisper-http", "WhisperHTTP"),
+    "whisper-vllm": ("whisper-vllm", "WhisperService"),
+    "whisper-engine": ("whisper-engine", "WhisperEngine"),
+}
+FIELDS = ["total_s", "inference_s", "rtf"]
+TIMING_FIELDS = ["decode_s", "plan_s", "encode_s", "stitch_s"]
+
+
+def run(service, audio_bytes: bytes, language: str) -> tuple[dict, float]:
+    t0 = time.perf_counter()
+    result = service.transcribe.remote(audio_bytes, language, use_cache=False)
+    return result, time.perf_counter() - t0
+
+
+def summarize(results: list[dict], walls: list[float]) -> dict:
+    out = {"wall_s": round(statistics.median(walls), 3)}
+    for field in FIELDS:
+        out[field] = round(statistics.median(r[field] for r in results), 3)
+    for field in TIMING_FIELDS:
+        values = [r.get("timings", {}).get(field) for r in results]
+        if None not in values:
+            out[field] = round(statistics.median(values), 4)
+    latency = [r["timings"]["chunk_latency_s"]["p50"] for r in results if "timings" in r]
+    if latency:
+        out["chunk_latency_p50_s"] = round(statistics.median(latency), 3)
+    out["chunks"] = results[0]["chunks"]
+    out["duration_audio_s"] = results[0]["duration_audio_s"]
+    return out
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Compare the deployed Whisper services")
+    parser.add_argument("--audio", required=True, nargs="+", help="Audio files to send")
+    parser.add_argument("--language", default="pt")
+    parser.add_argument("--repeats", type=int, default=3, help="Timed calls per file and service")
+    parser.add_argument("--services", nargs="+", choices=list(SERVICES), default=list(SERVICES))
+    parser.add_argument("--output", help="Write the report JSON here")
+    args = parser.parse_args()
+
+    files = {}
+    for path in args.audio:
+        with open(path, "rb") as f:
+            files[os.path.basename(path)] = f.read()
+
+    report = {"repeats": args.repeats, "results": {}}
+    texts = {}
+    for label in args.services:
+        app_name, cls_name = SERVICES[label]
+        service = modal.Cls.from_name(app_name, cls_name)()
+        print(f"{label}: warming up...", file=sys.stderr, flush=True)
+        first, wall = run(service, next(iter(files.values())), args.language)
+        print(f"  first call {wall:.1f}s (cold_start={first.get('cold_start')})", file=sys.stderr)
+
+        for name, audio_bytes in files.items():
+            results, walls = [], []
+            for _ in range(args.repeats):
+                result, wall = run(service, audio_bytes, args.language)
+                results.append(result)
+                walls.append(wall)
+            stats = summarize(results, walls)
+            report["results"][f"{label}/{name}"] = stats
+            texts.setdefault(name, {})[label] = results[-1]["text"]
+            print(f"  {name}: wall {stats['wall_s']}s, total {stats['total_s']}s, "
+                  f"RTF {stats['rtf']}, {stats['chunks']} chunk(s)", file=sys.stderr)
+
+    report["same_text"] = {
+        name: len(set(by_service.values())) == 1 for name, by_service in texts.items()
+    }
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+    print(text)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,173 @@
+#!/usr/bin/env python3
+"""Cold-start timelines for the snapshot-based Modal services.
+
+A container's life starts in @modal.enter(snap=True) (spawn, readiness,
+warm-up, sleep -- then the memory/GPU snapshot is taken) and continues, maybe
+much later and on another host, in @modal.enter(snap=False) (restore, wake),
+followed by the first request. ColdStartTimeline records a wall-clock mark
+for each of these steps; wall clock because perf_counter() does not carry
+across a snapshot restore.
+
+The first response a container serves gets {"cold_start": True,
+"cold_start_timeline": {...}} (later ones {"cold_start": False}) and the
+timeline is written as JSON to the coldstart-timelines volume, one file per
+container, so the restore / wake / first-request split can be aggregated:
+
+    modal volume get coldstart-timelines / ./timelines
+    python3 scripts/coldstart.py ./timelines
+
+Images that import this module need `.add_local_python_source("coldstart")`.
+"""
+
+import json
+import os
+import threading
+import time
+import uuid
+
+COLDSTART_PATH = "/coldstart-timelines"
+
+
+class ColdStartTimeline:
+    def __init__(self, service: str, root: str = COLDSTART_PATH, logger=None):
+        """Create at the top of the snap=True enter; marks that phase's start."""
+        self.service = service
+        self.root = root
+        self.logger = logger
+        self.marks = []  # (phase, event, wall time)
+        self.phase = "snapshot"
+        self._served = False
+        self._lock = threading.Lock()
+        self.mark("enter")
+
+    def mark(self, event: str) -> None:
+        """Record that `event` (a step of the current phase) just finished."""
+        self.marks.append((self.phase, event, time.time()))
+
+    def begin_restore(self) -> None:
+        """Call at the top of the snap=False enter."""
+        self.phase = "restore"
+        self.mark("enter")
+
+    def first_response(self) -> dict:
+        """Fields to merge into a response; the timeline only on the first one.
+
+        The first call also writes the timeline to the volume. Warm-up
+        requests, served before the snapshot, do not count.
+        """
+        with self._lock:
+            if self._served or self.phase == "snapshot":
+                return {"cold_start": False}
+            self._served = True
+            self.phase = "request"
+            self.mark("first_response")
+            timeline = self.summary()
+        self._write(timeline)
+        return {"cold_start": True, "cold_start_timeline": timeline}
+
+    def summary(self) -> dict:
+        """Per-phase step durations plus the gaps between phases."""
+        phases = {}
+        previous = {}
+        for phase, event, at in self.marks:
+            steps = phases.setdefault(phase, {})
+            if phase in previous:
+                steps[f"{event}_s"] = round(at - previous[phase], 3)
+            previous[phase] = at
+        starts = {p: next(at for ph, _, at in self.marks if ph == p) for p in phases}
+        ends = {p: previous[p] for p in phases}
+
+        timeline = {"service": self.service, "steps": phases}
+        if "snapshot" in phases:
+            timeline["snapshot_s"] = round(ends["snapshot"] - starts["snapshot"], 3)
+        if "restore" in phases:
+            timeline["restore_s"] = round(ends["restore"] - starts["restore"], 3)
+            if "snapshot" in phases:
+                # ~0 when the container did not come from a snapshot (the
+                # first start after a deploy runs both phases back to back)
+                timeline["snapshot_age_s"] = round(starts["restore"] - ends["snapshot"], 1)
+        if "request" in phases:
+            ready = ends.get("restore", ends.get("snapshot"))
+            timeline["first_request_s"] = round(ends["request"] - ready, 3)
+            if "restore" in phases:
+                timeline["restore_to_first_response_s"] = round(
+                    ends["request"] - starts["restore"], 3,
+                )
+        timeline["marks"] = [
+            {"phase": phase, "event": event, "at": round(at, 3)}
+            for phase, event, at in self.marks
+        ]
+        return timeline
+
+    def _write(self, timeline: dict) -> None:
+        """Best effort: a missing volume must not fail the request."""
+        container = os.environ.get("MODAL_TASK_ID") or uuid.uuid4().hex[:12]
+        day = time.strftime("%Y-%m-%d", time.gmtime())
+        path = os.path.join(
+            self.root, self.service, day, f"{int(time.time())}-{container}.json",
+        )
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, "w") as f:
+                json.dump(timeline, f)
+        except OSError as e:
+            if self.logger is not None:
+                self.logger.warning("Cold-start timeline not written: %s", e)
+            return
+        if self.logger is not None:
+            self.logger.info(
+                "Cold start: restore %.2fs, first response %.2fs after ready",
+                timeline.get("restore_s", 0.0), timeline.get("first_request_s", 0.0),
+            )
+
+
+def response_headers(fields: dict) -> dict:
+    """first_response() fields as headers, for endpoints that return audio."""
+    headers = {"X-Cold-Start": "1" if fields["cold_start"] else "0"}
+    if fields["cold_start"]:
+        timeline = {k: v for k, v in fields["cold_start_timeline"].items() if k != "marks"}
+        headers["X-Cold-Start-Timeline"] = json.dumps(timeline, separators=(",", ":"))
+    return headers
+
+
+def aggregate(root: str) -> dict:
+    """p50/p90/max of every duration field, per service, over all timeline files."""
+    import statistics
+
+    values = {}
+    for dirpath, _, filenames in os.walk(root):
+        for name in filenames:
+            if not name.endswith(".json"):
+                continue
+            with open(os.path.join(dirpath, name)) as f:
+                timeline = json.load(f)
+            fields = values.setdefault(timeline["service"], {})
+            for key, value in timeline.items():
+                if key.endswith("_s"):
+                    fields.setdefault(key, []).append(value)
+            for phase, steps in timeline["steps"].items():
+                for key, value in steps.items():
+                    fields.setdefault(f"{phase}.{key}", []).append(value)
+
+    report = {}
+    for service, fields in sorted(values.items()):
+        report[service] = {}
+        for key, samples in sorted(fields.items()):
+            samples.sort()
+            report[service][key] = {
+                "n": len(samples),
+                "p50": round(statistics.median(samples), 3),
+                "p90": round(samples[min(len(samples) - 1, int(0.9 * len(samples)))], 3),
+                "max": round(samples[-1], 3),
+            }
+    return report
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Aggregate cold-start timelines")
+    parser.add_argument("root", help="Directory downloaded from the coldstart-timelines volume")
+    args = parser.parse_args()
+
+    print(json.dumps(aggregate(args.root), indent=2))
@@ -0,0 +1,177 @@
+"""Fair in-container scheduling of vLLM work across concurrent requests.
+
+A container that serves several requests at once (@modal.concurrent) would
+otherwise let each one push its own --max-num-seqs worth of chunks at vLLM:
+the engine queues them first come, first served, so a dictation arriving
+behind a two-hour recording waits for all of that recording's chunks.
+
+FairScheduler sits in front of the engine with one global limit on work in
+flight (the engine's max-num-seqs) and one FIFO queue per request. When a
+slot frees up it goes to the next request in round-robin order, so every
+waiting request gets a turn per rotation: a one-chunk dictation waits for
+at most one slot, however much a long file has queued.
+
+    scheduler = FairScheduler(MAX_CONCURRENT_CHUNKS)
+    with scheduler.slot(request_key):              # worker threads
+        ...
+    async with scheduler.aslot(request_key):       # event-loop tasks
+        ...
+
+Both kinds of waiter share the same queues. stats() reports in-flight and
+queued work for the services' health checks.
+
+Images that import this module need `.add_local_python_source("fair_scheduler")`.
+"""
+
+import asyncio
+import itertools
+import threading
+from collections import deque
+from contextlib import asynccontextmanager, contextmanager
+
+_request_ids = itertools.count()
+
+
+def new_request_key() -> int:
+    """A key identifying one request's work to the scheduler."""
+    return next(_request_ids)
+
+
+class _Waiter:
+    __slots__ = ("event", "loop", "future", "granted")
+
+    def __init__(self, loop=None):
+        self.loop = loop
+        self.future = loop.create_future() if loop is not None else None
+        self.event = threading.Event() if loop is None else None
+        self.granted = False
+
+    def wake(self) -> None:
+        if self.event is not None:
+            self.event.set()
+        else:
+            self.loop.call_soon_threadsafe(_resolve, self.future)
+
+
+def _resolve(future: asyncio.Future) -> None:
+    if not future.done():
+        future.set_result(None)
+
+
+class FairScheduler:
+    def __init__(self, max_in_flight: int):
+        """max_in_flight: work admitted at once over all requests (the engine's max-num-seqs)."""
+        if max_in_flight < 1:
+            raise ValueError("max_in_flight must be at least 1")
+        self.max_in_flight = max_in_flight
+        self._lock = threading.Lock()
+        self._in_flight = 0
+        self._queues: dict[object, deque[_Waiter]] = {}
+        self._rotation: deque = deque()  # keys with waiters, next turn first
+        self._queued = 0
+        self._admitted = 0
+        self._waited = 0
+        self._max_queued = 0
+
+    # --- threads ---
+
+    def acquire(self, key) -> None:
+        with self._lock:
+            waiter = self._enqueue(key, None)
+        if waiter is not None:
+            waiter.event.wait()
+
+    @contextmanager
+    def slot(self, key):
+        self.acquire(key)
+        try:
+            yield
+        finally:
+            self.release()
+
+    # --- event loop ---
+
+    async def aacquire(self, key) -> None:
+        with self._lock:
+            waiter = self._enqueue(key, asyncio.get_running_loop())
+        if waiter is None:
+            return
+        try:
+            await waiter.future
+        except asyncio.CancelledError:
+            with self._lock:
+                if waiter.granted:
+                    self._in_flight -= 1
+                    self._grant()
+                else:
+                    self._remove(key, waiter)
+            raise
+
+    @asynccontextmanager
+    async def aslot(self, key):
+        await self.aacquire(key)
+        try:
+            yield
+        finally:
+            self.release()
+
+    # --- shared ---
+
+    def release(self) -> None:
+        with self._lock:
+            self._in_flight -= 1
+            self._grant()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "max_in_flight": self.max_in_flight,
+                "in_flight": self._in_flight,
+                "queued": self._queued,
+                "requests_waiting": len(self._queues),
+                "max_queued": self._max_queued,
+                "admitted": self._admitted,
+                "waited": self._waited,
+            }
+
+    def _enqueue(self, key, loop) -> _Waiter | None:
+        """Take a free slot (None) or queue a waiter; called with the lock held."""
+        self._admitted += 1
+        if self._in_flight < self.max_in_flight and not self._rotation:
+            self._in_flight += 1
+            return None
+        waiter = _Waiter(loop)
+        queue = self._queues.get(key)
+        if queue is None:
+            queue = self._queues[key] = deque()
+            self._rotation.append(key)
+        queue.append(waiter)
+        self._queued += 1
+        self._waited += 1
+        self._max_queued = max(self._max_queued, self._queued)
+        return waiter
+
+    def _grant(self) -> None:
+        """Hand free slots out round-robin over the waiting requests; lock held."""
+        while self._in_flight < self.max_in_flight and self._rotation:
+            key = self._rotation.popleft()
+            queue = self._queues[key]
+            waiter = queue.popleft()
+            self._queued -= 1
+            if queue:
+                self._rotation.append(key)
+            else:
+                del self._queues[key]
+            waiter.granted = True
+            self._in_flight += 1
+            waiter.wake()
+
+    def _remove(self, key, waiter: _Waiter) -> None:
+        queue = self._queues.get(key)
+        if queue is None or waiter not in queue:
+            return
+        queue.remove(waiter)
+        self._queued -= 1
+        if not queue:
+            del self._queues[key]
+            self._rotation.remove(key)
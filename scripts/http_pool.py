@@ -0,0 +1,107 @@
+"""Keep-alive HTTP client shared by the services that proxy to a local vLLM server.
+
+One PooledHTTPClient per server: a requests.Session with a bounded urllib3
+pool for sync callers, and a lazily created httpx.AsyncClient for async
+callers. Connections are reused across calls instead of opening a new TCP
+connection per request.
+
+reset() drops pooled connections -- call it before a memory snapshot is
+taken, since sockets do not survive restore.
+
+Images that import this module need `.add_local_python_source("http_pool")`
+plus requests (and httpx for the async variant; fastapi[standard] ships it).
+"""
+
+import threading
+
+import requests
+from requests.adapters import HTTPAdapter
+
+DEFAULT_POOL_SIZE = 16
+DEFAULT_CONNECT_TIMEOUT_S = 5
+DEFAULT_READ_TIMEOUT_S = 300
+
+
+class PooledHTTPClient:
+    def __init__(self, base_url: str, pool_size: int = DEFAULT_POOL_SIZE,
+                 connect_timeout: float = DEFAULT_CONNECT_TIMEOUT_S,
+                 read_timeout: float = DEFAULT_READ_TIMEOUT_S):
+        self.base_url = base_url.rstrip("/")
+        self.pool_size = pool_size
+        self.timeout = (connect_timeout, read_timeout)
+
+        self.session = requests.Session()
+        # pool_block: callers beyond pool_size wait for a free connection
+        # instead of opening throwaway ones
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, pool_block=True)
+        self.session.mount("http://", adapter)
+        self._adapter = adapter
+
+        self._async_client = None
+        self._lock = threading.Lock()
+        self._async_requests = 0
+        self._async_connections = 0
+
+    def post(self, path: str, **kwargs) -> requests.Response:
+        kwargs.setdefault("timeout", self.timeout)
+        return self.session.post(self.base_url + path, **kwargs)
+
+    def get(self, path: str, **kwargs) -> requests.Response:
+        kwargs.setdefault("timeout", self.timeout)
+        return self.session.get(self.base_url + path, **kwargs)
+
+    def _get_async_client(self):
+        import httpx
+
+        if self._async_client is None:
+            self._async_client = httpx.AsyncClient(
+                base_url=self.base_url,
+                limits=httpx.Limits(
+                    max_connections=self.pool_size,
+                    max_keepalive_connections=self.pool_size,
+                ),
+                timeout=httpx.Timeout(self.timeout[1], connect=self.timeout[0]),
+            )
+        return self._async_client
+
+    async def apost(self, path: str, **kwargs):
+        """Async POST via httpx (files=/data=/json= as in httpx)."""
+        client = self._get_async_client()
+        extensions = kwargs.pop("extensions", {})
+        extensions["trace"] = self._trace
+        with self._lock:
+            self._async_requests += 1
+        return await client.post(path, extensions=extensions, **kwargs)
+
+    async def _trace(self, event_name: str, info: dict) -> None:
+        if event_name == "connection.connect_tcp.complete":
+            with self._lock:
+                self._async_connections += 1
+
+    def stats(self) -> dict:
+        """Requests sent and connections opened since start (or the last reset)."""
+        pools = self._adapter.poolmanager.pools
+        sync_pools = [pools[key] for key in pools.keys()]
+        with self._lock:
+            requests_sent = sum(p.num_requests for p in sync_pools) + self._async_requests
+            opened = sum(p.num_connections for p in sync_pools) + self._async_connections
+        return {
+            "requests": requests_sent,
+            "connections_opened": opened,
+            "connections_reused": max(0, requests_sent - opened),
+        }
+
+    def reset(self) -> None:
+        """Drop pooled sync connections; the pool refills on the next request."""
+        self._adapter.poolmanager.clear()
+        with self._lock:
+            self._async_requests = 0
+            self._async_connections = 0
+
+    async def aclose(self) -> None:
+        if self._async_client is not None:
+            await self._async_client.aclose()
+            self._async_client = None
+
+    def close(self) -> None:
+        self.session.close()
@@ -30,10 +30,15 @@ image = (
     .pip_install(
         "chatterbox-tts==0.1.6",
         "peft==0.18.0",
+        "soxr",
         "fastapi[standard]",
     )
+    .add_local_python_source("audio_io")
 )
 
+with image.imports():
+    import audio_io
+
 
 @app.cls(
     gpu=GPU_TYPE,
@@ -78,8 +83,6 @@ class TTSService:
         ref audio: ref_audio_path (volume, for curl) or ref_audio_base64 (from PHP).
         """
         import os
-        import subprocess
-        import tempfile
 
         import torchaudio as ta
 
@@ -97,7 +100,6 @@ class TTSService:
             }
 
             # Resolve ref audio: volume path > base64
-            ref_path = None
             ref_bytes = None
             if ref_audio_path.strip():
                 vol_path = os.path.join(VOICE_REFS_PATH, ref_audio_path.strip())
@@ -113,24 +115,13 @@ class TTSService:
                 ref_bytes = base64.b64decode(ref_audio_base64)
 
             if ref_bytes:
-                with tempfile.NamedTemporaryFile(suffix=".input", delete=False) as f:
-                    f.write(ref_bytes)
-                    tmp_in = f.name
-
-                ref_path = tmp_in + ".wav"
-                subprocess.run(
-                    ["ffmpeg", "-y", "-i", tmp_in, "-ar", "16000", "-ac", "1",
-                     "-sample_fmt", "s16", ref_path],
-                    capture_output=True, check=True,
-                )
-                os.unlink(tmp_in)
-                gen_kwargs["audio_prompt_path"] = ref_path
+                # Normalized in-process to 16kHz mono WAV. Chatterbox loads the
+                # prompt with librosa.load, which accepts a file-like object.
+                ref_wav = audio_io.to_wav_bytes(audio_io.decode_audio(ref_bytes))
+                gen_kwargs["audio_prompt_path"] = io.BytesIO(ref_wav)
 
             wav = self.model.generate(**gen_kwargs)
 
-            if ref_path and os.path.exists(ref_path):
-                os.unlink(ref_path)
-
             duration = wav.shape[-1] / self.sr
             elapsed = time.perf_counter() - t0
 
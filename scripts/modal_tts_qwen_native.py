@@ -45,13 +45,18 @@ image = (
     .pip_install(
         "qwen-tts>=0.1.0",
         "soundfile",
+        "soxr",
         "huggingface_hub",
         "numpy",
         "fastapi[standard]",
     )
     .run_function(download_model_weights, secrets=[hf_secret])
+    .add_local_python_source("audio_io")
 )
 
+with image.imports():
+    import audio_io
+
 
 @app.cls(
     gpu=GPU_TYPE,
@@ -83,11 +88,6 @@ class TTSService:
         language: str = fastapi.Form("Portuguese"),
     ) -> fastapi.Response:
         """Voice cloning TTS. Returns audio WAV bytes."""
-        import os
-        import subprocess
-        import tempfile
-
-        import numpy as np
         import soundfile as sf
 
         if not text.strip():
@@ -96,23 +96,9 @@ class TTSService:
         t0 = time.perf_counter()
 
         try:
-            # Decode and convert ref audio to WAV PCM (accepts any ffmpeg format)
+            # Decode ref audio in-process to 16kHz mono float32 (any format)
             ref_bytes = base64.b64decode(ref_audio_base64)
-            with tempfile.NamedTemporaryFile(suffix=".input", delete=False) as tmp_in:
-                tmp_in.write(ref_bytes)
-                tmp_in_path = tmp_in.name
-
-            tmp_wav_path = tmp_in_path + ".wav"
-            subprocess.run(
-                ["ffmpeg", "-y", "-i", tmp_in_path, "-ar", "16000", "-ac", "1",
-                 "-sample_fmt", "s16", tmp_wav_path],
-                capture_output=True, check=True,
-            )
-            os.unlink(tmp_in_path)
-
-            ref_data, ref_sr = sf.read(tmp_wav_path)
-            os.unlink(tmp_wav_path)
-            ref_audio_tuple = (ref_data.astype(np.float32), ref_sr)
+            ref_audio_tuple = (audio_io.decode_audio(ref_bytes), audio_io.TARGET_SR)
 
             gen_kwargs = {
                 "text": text,
@@ -14,7 +14,6 @@ Synth:   curl -X POST https://<url>/web_synthesize \
 import base64
 import io
 import os
-import subprocess
 import time
 
 import fastapi
@@ -152,6 +151,7 @@ image = (
     .pip_install(
         "vllm-omni==0.16.0",
         "soundfile",
+        "soxr",
         "numpy",
         "fastapi[standard]",
     )
@@ -166,8 +166,12 @@ image = (
             "TORCH_CPP_LOG_LEVEL": "FATAL",
         }
     )
+    .add_local_python_source("audio_io")
 )
 
+with image.imports():
+    import audio_io
+
 
 @app.cls(
     image=image,
@@ -214,8 +218,6 @@ class TTSService:
         ref audio: ref_audio_path (volume, for curl) or ref_audio_base64 (from PHP).
         """
         import soundfile as sf
-        import tempfile
-
         import torch
 
         if not text.strip():
@@ -225,9 +227,8 @@ class TTSService:
 
         t0 = time.perf_counter()
 
-        ref_wav_path = None
         try:
-            # -- Resolve ref audio to a local WAV path --
+            # -- Resolve ref audio bytes --
             ref_bytes = None
             if ref_audio_path.strip():
                 vol_path = os.path.join(VOICE_REFS_PATH, ref_audio_path.strip())
@@ -242,24 +243,11 @@ class TTSService:
             elif ref_audio_base64.strip():
                 ref_bytes = base64.b64decode(ref_audio_base64)
 
+            # Normalized in-process to 16kHz mono WAV, passed as a data URL
+            ref_audio = None
             if ref_bytes:
-                with tempfile.NamedTemporaryFile(
-                    suffix=".input", delete=False
-                ) as tmp_in:
-                    tmp_in.write(ref_bytes)
-                    tmp_in_path = tmp_in.name
-
-                ref_wav_path = tmp_in_path + ".wav"
-                subprocess.run(
-                    [
-                        "ffmpeg", "-y", "-i", tmp_in_path,
-                        "-ar", "16000", "-ac", "1", "-sample_fmt", "s16",
-                        ref_wav_path,
-                    ],
-                    capture_output=True,
-                    check=True,
-                )
-                os.unlink(tmp_in_path)
+                ref_wav = audio_io.to_wav_bytes(audio_io.decode_audio(ref_bytes))
+                ref_audio = "data:audio/wav;base64," + base64.b64encode(ref_wav).decode()
 
             # -- Build additional_information (ALL values as lists per end2end.py) --
             x_vector_only = not ref_text.strip()
@@ -270,8 +258,8 @@ class TTSService:
                 "x_vector_only_mode": [x_vector_only],
                 "max_new_tokens": [2048],
             }
-            if ref_wav_path:
-                additional_info["ref_audio"] = [ref_wav_path]
+            if ref_audio:
+                additional_info["ref_audio"] = [ref_audio]
                 if ref_text.strip():
                     additional_info["ref_text"] = [ref_text]
 
@@ -340,9 +328,6 @@ class TTSService:
             return fastapi.Response(
                 content=str(e), status_code=500, media_type="text/plain"
             )
-        finally:
-            if ref_wav_path and os.path.exists(ref_wav_path):
-                os.unlink(ref_wav_path)
 
     @modal.fastapi_endpoint(method="GET")
     def web_health(self) -> dict:
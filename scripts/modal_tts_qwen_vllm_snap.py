@@ -13,13 +13,13 @@ Design:  curl -X POST https://<url>/web_design \
            -F "text=Olá mundo" -F "voice_instructions=A deep male voice"
 Analyze: curl -X POST https://<url>/web_analyze \
            -F "audio=@voice.wav"
+Health:  curl https://<url>/web_health   (TTSService, incl. scheduler queue depth)
 """
 
+import asyncio
 import base64
 import io
 import os
-import socket
-import subprocess
 import time
 
 import fastapi
@@ -33,12 +33,21 @@ VLLM_PORT = 8091
 STAGE_CONFIG_PATH = "/opt/stage_configs/qwen3_tts.yaml"
 VOICE_REFS_PATH = "/voice-refs"
 MINUTES = 60
+# max_num_seqs of the talker stage (STAGE_CONFIG_YAML): syntheses sent to
+# vLLM-Omni at once
+TALKER_MAX_NUM_SEQS = 10
+# Synthesis requests one TTSService container serves at once (async endpoint,
+# shared connection pool); those beyond TALKER_MAX_NUM_SEQS wait in the
+# container's FairScheduler instead of starting another GPU
+MAX_CONCURRENT_INPUTS = 16
 
 app = modal.App(
     APP_NAME, tags={"project": "elco-machina", "model": "qwen3-tts-vllm-snap"}
 )
 hf_secret = modal.Secret.from_name("huggingface-secret")
 voice_refs_vol = modal.Volume.from_name("tts-voice-refs", create_if_missing=True)
+coldstart_vol = modal.Volume.from_name("coldstart-timelines", create_if_missing=True)
+COLDSTART_PATH = "/coldstart-timelines"
 
 STAGE_CONFIG_YAML = """\
 async_chunk: true
@@ -155,6 +164,7 @@ image = (
     .pip_install(
         "vllm-omni==0.16.0",
         "soundfile",
+        "soxr",
         "numpy",
         "requests",
         "fastapi[standard]",
@@ -170,43 +180,67 @@ image = (
             "TORCH_CPP_LOG_LEVEL": "FATAL",
         }
     )
+    .add_local_python_source(
+        "audio_io", "coldstart", "fair_scheduler", "http_pool", "vllm_supervisor",
+        "warmup",
+    )
 )
 
 with image.imports():
-    import requests as http_requests
-
-
-def _wait_ready(proc: subprocess.Popen, timeout: int = 5 * MINUTES) -> None:
-    deadline = time.time() + timeout
-    while time.time() < deadline:
-        try:
-            socket.create_connection(("localhost", VLLM_PORT), timeout=1).close()
-            return
-        except OSError:
-            if proc.poll() is not None:
-                stderr_tail = ""
-                try:
-                    with open("/tmp/vllm-stderr.log") as f:
-                        stderr_tail = f.read()[-3000:]
-                except Exception:
-                    pass
-                raise RuntimeError(
-                    f"vLLM-Omni exited with {proc.returncode}.\n{stderr_tail}"
-                )
-            time.sleep(1)
-    raise TimeoutError(f"vLLM-Omni not ready within {timeout}s")
-
-
-def _sleep(level: int = 1) -> None:
-    http_requests.post(
-        f"http://localhost:{VLLM_PORT}/sleep?level={level}"
-    ).raise_for_status()
-
-
-def _wake_up() -> None:
-    http_requests.post(
-        f"http://localhost:{VLLM_PORT}/wake_up"
-    ).raise_for_status()
+    import audio_io
+    import coldstart
+    import warmup
+    from fair_scheduler import FairScheduler, new_request_key
+    from http_pool import PooledHTTPClient
+    from vllm_supervisor import VLLMSupervisor
+
+
+def _read_bytes(path: str) -> bytes:
+    with open(path, "rb") as f:
+        return f.read()
+
+
+def _ref_wav_base64(ref_bytes: bytes) -> str:
+    """Normalize ref audio to 16kHz mono PCM WAV in-process, base64 for the API."""
+    ref_wav = audio_io.to_wav_bytes(audio_io.decode_audio(ref_bytes))
+    return base64.b64encode(ref_wav).decode()
+
+
+def _base_payload(text: str, language: str) -> dict:
+    """/v1/audio/speech body for Base voice cloning (ref_audio/ref_text added by caller)."""
+    return {
+        "model": MODEL_BASE,
+        "input": text,
+        "voice": "alloy",
+        "language": language,
+        "task_type": "Base",
+        "response_format": "wav",
+    }
+
+
+def _design_payload(text: str, voice_instructions: str, language: str) -> dict:
+    return {
+        "model": MODEL_VOICEDESIGN,
+        "input": text,
+        "voice": "alloy",
+        "language": language,
+        "task_type": "VoiceDesign",
+        "instructions": voice_instructions.strip(),
+        "response_format": "wav",
+    }
+
+
+def _warmup_ref(profile: dict) -> tuple[bytes, str]:
+    """A .wav + .txt pair from the voice-refs volume, else synthetic speech."""
+    if os.path.isdir(VOICE_REFS_PATH):
+        for name in sorted(os.listdir(VOICE_REFS_PATH)):
+            txt_path = os.path.join(VOICE_REFS_PATH, os.path.splitext(name)[0] + ".txt")
+            if name.endswith(".wav") and os.path.exists(txt_path):
+                with open(txt_path) as f:
+                    ref_text = f.read().strip()
+                if ref_text:
+                    return _read_bytes(os.path.join(VOICE_REFS_PATH, name)), ref_text
+    return warmup.encode_clip(profile["ref_s"], 24000, 1, "wav"), profile["ref_text"]
 
 
 @app.cls(
@@ -215,11 +249,12 @@ def _wake_up() -> None:
     memory=32768,
     timeout=600,
     secrets=[hf_secret],
-    volumes={VOICE_REFS_PATH: voice_refs_vol},
+    volumes={VOICE_REFS_PATH: voice_refs_vol, COLDSTART_PATH: coldstart_vol},
     enable_memory_snapshot=True,
     experimental_options={"enable_gpu_snapshot": True},
     scaledown_window=2,
 )
+@modal.concurrent(max_inputs=MAX_CONCURRENT_INPUTS)
 class TTSService:
     @modal.enter(snap=True)
     def start(self):
@@ -230,8 +265,13 @@ class TTSService:
             format="%(asctime)s - %(levelname)s - %(message)s",
         )
         self.logger = logging.getLogger("tts-vllm")
+        self.coldstart = coldstart.ColdStartTimeline("tts-vllm", COLDSTART_PATH, self.logger)
 
         self.logger.info("Starting vllm serve --omni ...")
+        self.vllm = PooledHTTPClient(
+            f"http://localhost:{VLLM_PORT}", pool_size=TALKER_MAX_NUM_SEQS,
+        )
+        self.scheduler = FairScheduler(TALKER_MAX_NUM_SEQS)
 
         cmd = [
             "vllm", "serve", MODEL_BASE,
@@ -247,20 +287,31 @@ class TTSService:
             "--disable-uvicorn-access-log",
         ]
 
-        self._vllm_log = open("/tmp/vllm-stderr.log", "w")
-        self.vllm_proc = subprocess.Popen(cmd, stderr=self._vllm_log)
-
-        _wait_ready(self.vllm_proc)
+        self.supervisor = VLLMSupervisor(
+            cmd, self.vllm, name="vLLM-Omni", logger=self.logger, echo=True,
+        )
+        self.coldstart.mark("setup")
+        self.supervisor.start(timeout=5 * MINUTES)
+        self.coldstart.mark("vllm_ready")
         self.logger.info("vLLM-Omni ready on port %d", VLLM_PORT)
 
+        self.logger.info("Running warm-up profile...")
+        self._warmup()
+        self.coldstart.mark("warmup")
+        self.logger.info("Warm-up done")
+
         self.logger.info("Putting to sleep...")
-        _sleep()
+        self.supervisor.sleep()
+        # Pooled sockets do not survive snapshot restore
+        self.vllm.reset()
+        self.coldstart.mark("sleep")
         self.logger.info("vLLM-Omni sleeping — snapshot point")
 
     @modal.enter(snap=False)
     def restore(self):
         import logging
 
+        self.coldstart.begin_restore()
         try:
             import torch.distributed as dist
 
@@ -277,28 +328,70 @@ class TTSService:
             self.logger = logging.getLogger("tts-vllm")
 
         self.logger.info("Waking vLLM-Omni...")
-        _wake_up()
-        _wait_ready(self.vllm_proc, timeout=MINUTES)
+        self.supervisor.wake_up(timeout=MINUTES)
+        self.coldstart.mark("wake")
         self.logger.info("vLLM-Omni awake on port %d", VLLM_PORT)
 
     @modal.exit()
     def stop(self):
         # Sleep first for cleaner shutdown (avoids ZMQ socket warnings)
+        if not hasattr(self, "supervisor"):
+            return
         try:
-            _sleep()
+            self.supervisor.sleep()
         except Exception:
             pass
-        if hasattr(self, "vllm_proc") and self.vllm_proc.poll() is None:
-            self.vllm_proc.terminate()
-            try:
-                self.vllm_proc.wait(timeout=10)
-            except subprocess.TimeoutExpired:
-                self.vllm_proc.kill()
-        if hasattr(self, "_vllm_log"):
-            self._vllm_log.close()
+        self.supervisor.stop()
+
+    def _warmup(self) -> None:
+        """Push TTS_WARMUP (warmup.py) through the web_synthesize path.
+
+        The ref audio goes through the same decode/resample as a request;
+        the texts are sent one at a time, then TALKER_MAX_NUM_SEQS at once
+        over the async client, as production traffic arrives.
+        """
+        profile = warmup.TTS_WARMUP
+        self.logger.info("Warm-up imports: %.2fs", warmup.prime_imports(profile["imports"]))
+        ref_bytes, ref_text = _warmup_ref(profile)
+        ref_audio = f"data:audio/wav;base64,{_ref_wav_base64(ref_bytes)}"
+
+        payloads = []
+        for text in profile["texts"]:
+            payload = _base_payload(text, profile["language"])
+            payload["ref_audio"] = ref_audio
+            payload["ref_text"] = ref_text
+            payloads.append(payload)
+
+        for payload in payloads:
+            t0 = time.perf_counter()
+            self.vllm.post("/v1/audio/speech", json=payload).raise_for_status()
+            self.logger.info(
+                "Warm-up: %d chars in %.2fs", len(payload["input"]), time.perf_counter() - t0,
+            )
+        batch = [payloads[i % len(payloads)] for i in range(TALKER_MAX_NUM_SEQS)]
+        t0 = time.perf_counter()
+        asyncio.run(self._awarmup(batch))
+        self.logger.info(
+            "Warm-up: %d concurrent in %.2fs", len(batch), time.perf_counter() - t0,
+        )
+
+    async def _awarmup(self, payloads: list[dict]) -> None:
+        """Concurrent requests over the async client, then drop it: it is bound
+        to this throwaway event loop."""
+        import soundfile as sf
+
+        try:
+            responses = await asyncio.gather(*[
+                self.vllm.apost("/v1/audio/speech", json=payload) for payload in payloads
+            ])
+            for resp in responses:
+                resp.raise_for_status()
+                sf.info(io.BytesIO(resp.content))
+        finally:
+            await self.vllm.aclose()
 
     @modal.fastapi_endpoint(method="POST")
-    def web_synthesize(
+    async def web_synthesize(
         self,
         text: str = fastapi.Form(...),
         ref_audio_base64: str = fastapi.Form(""),
@@ -311,7 +404,6 @@ class TTSService:
         ref audio: ref_audio_path (volume, for curl) or ref_audio_base64 (from PHP).
         """
         import soundfile as sf
-        import tempfile
 
         if not text.strip():
             return fastapi.Response(
@@ -321,14 +413,7 @@ class TTSService:
         t0 = time.perf_counter()
 
         try:
-            payload = {
-                "model": MODEL_BASE,
-                "input": text,
-                "voice": "alloy",
-                "language": language,
-                "task_type": "Base",
-                "response_format": "wav",
-            }
+            payload = _base_payload(text, language)
 
             # Resolve ref audio: volume path > base64
             ref_bytes = None
@@ -340,34 +425,13 @@ class TTSService:
                         status_code=404,
                         media_type="text/plain",
                     )
-                with open(vol_path, "rb") as f:
-                    ref_bytes = f.read()
+                ref_bytes = await asyncio.to_thread(_read_bytes, vol_path)
             elif ref_audio_base64.strip():
                 ref_bytes = base64.b64decode(ref_audio_base64)
 
             if ref_bytes:
-                # Convert to WAV PCM via ffmpeg, then base64 for the API
-                with tempfile.NamedTemporaryFile(
-                    suffix=".input", delete=False
-                ) as tmp_in:
-                    tmp_in.write(ref_bytes)
-                    tmp_in_path = tmp_in.name
-
-                tmp_wav_path = tmp_in_path + ".wav"
-                subprocess.run(
-                    [
-                        "ffmpeg", "-y", "-i", tmp_in_path,
-                        "-ar", "16000", "-ac", "1", "-sample_fmt", "s16",
-                        tmp_wav_path,
-                    ],
-                    capture_output=True,
-                    check=True,
-                )
-                os.unlink(tmp_in_path)
-
-                with open(tmp_wav_path, "rb") as f:
-                    wav_b64 = base64.b64encode(f.read()).decode()
-                os.unlink(tmp_wav_path)
+                # Decode/resample off the event loop; other requests keep flowing
+                wav_b64 = await asyncio.to_thread(_ref_wav_base64, ref_bytes)
 
                 payload["ref_audio"] = f"data:audio/wav;base64,{wav_b64}"
 
@@ -394,12 +458,10 @@ class TTSService:
                     )
                 payload["ref_text"] = resolved_ref_text
 
-            # POST to local vLLM-Omni server
-            resp = http_requests.post(
-                f"http://localhost:{VLLM_PORT}/v1/audio/speech",
-                json=payload,
-                timeout=300,
-            )
+            # POST to local vLLM-Omni server (waits out an in-place restart)
+            await asyncio.to_thread(self.supervisor.ensure_running)
+            async with self.scheduler.aslot(new_request_key()):
+                resp = await self.vllm.apost("/v1/audio/speech", json=payload)
 
             if resp.status_code != 200:
                 self.logger.error(
@@ -421,9 +483,9 @@ class TTSService:
             sr = 24000
             content_type = resp.headers.get("content-type", "audio/wav")
             try:
-                buf = io.BytesIO(audio_bytes)
-                data, sr = sf.read(buf)
-                duration = len(data) / sr
+                # Header only -- no need to decode the samples
+                info = sf.info(io.BytesIO(audio_bytes))
+                duration, sr = info.duration, info.samplerate
             except Exception:
                 # Fallback: estimate from raw bytes (24kHz, 16-bit mono)
                 duration = len(audio_bytes) / (sr * 2)
@@ -440,6 +502,7 @@ class TTSService:
                     "X-Inference-Time": f"{elapsed:.2f}",
                     "X-Audio-Duration": f"{duration:.2f}",
                     "X-Sample-Rate": str(sr),
+                    **coldstart.response_headers(self.coldstart.first_response()),
                 },
             )
         except Exception as e:
@@ -448,6 +511,19 @@ class TTSService:
                 content=str(e), status_code=500, media_type="text/plain"
             )
 
+    @modal.fastapi_endpoint(method="GET")
+    def web_health(self) -> dict:
+        """Health check: vLLM-Omni state and the synthesis queue."""
+        vllm = self.supervisor.status()
+        return {
+            "status": "healthy" if vllm["state"] == "ready" else "degraded",
+            "vllm": vllm,
+            "model": MODEL_BASE,
+            "backend": "vllm-omni-serve",
+            "gpu": GPU_TYPE,
+            "scheduler": self.scheduler.stats(),
+        }
+
 
 # ---------------------------------------------------------------------------
 # VoiceDesign: create voice profiles from text description (no microphone)
@@ -460,7 +536,7 @@ class TTSService:
     memory=32768,
     timeout=600,
     secrets=[hf_secret],
-    volumes={VOICE_REFS_PATH: voice_refs_vol},
+    volumes={VOICE_REFS_PATH: voice_refs_vol, COLDSTART_PATH: coldstart_vol},
     enable_memory_snapshot=True,
     experimental_options={"enable_gpu_snapshot": True},
     scaledown_window=15,
@@ -475,7 +551,9 @@ class VoiceDesignService:
             format="%(asctime)s - %(levelname)s - %(message)s",
         )
         self.logger = logging.getLogger("tts-voicedesign")
+        self.coldstart = coldstart.ColdStartTimeline("tts-voicedesign", COLDSTART_PATH, self.logger)
         self.logger.info("Starting vllm serve --omni (VoiceDesign)...")
+        self.vllm = PooledHTTPClient(f"http://localhost:{VLLM_PORT}")
 
         cmd = [
             "vllm", "serve", MODEL_VOICEDESIGN,
@@ -491,20 +569,31 @@ class VoiceDesignService:
             "--disable-uvicorn-access-log",
         ]
 
-        self._vllm_log = open("/tmp/vllm-stderr.log", "w")
-        self.vllm_proc = subprocess.Popen(cmd, stderr=self._vllm_log)
-
-        _wait_ready(self.vllm_proc)
+        self.supervisor = VLLMSupervisor(
+            cmd, self.vllm, name="vLLM-Omni", logger=self.logger, echo=True,
+        )
+        self.coldstart.mark("setup")
+        self.supervisor.start(timeout=5 * MINUTES)
+        self.coldstart.mark("vllm_ready")
         self.logger.info("vLLM-Omni (VoiceDesign) ready on port %d", VLLM_PORT)
 
+        self.logger.info("Running warm-up profile...")
+        self._warmup()
+        self.coldstart.mark("warmup")
+        self.logger.info("Warm-up done")
+
         self.logger.info("Putting to sleep...")
-        _sleep()
+        self.supervisor.sleep()
+        # Pooled sockets do not survive snapshot restore
+        self.vllm.reset()
+        self.coldstart.mark("sleep")
         self.logger.info("vLLM-Omni sleeping — snapshot point")
 
     @modal.enter(snap=False)
     def restore(self):
         import logging
 
+        self.coldstart.begin_restore()
         try:
             import torch.distributed as dist
 
@@ -521,24 +610,35 @@ class VoiceDesignService:
             self.logger = logging.getLogger("tts-voicedesign")
 
         self.logger.info("Waking vLLM-Omni (VoiceDesign)...")
-        _wake_up()
-        _wait_ready(self.vllm_proc, timeout=2 * MINUTES)
+        self.supervisor.wake_up(timeout=2 * MINUTES)
+        self.coldstart.mark("wake")
         self.logger.info("vLLM-Omni (VoiceDesign) awake on port %d", VLLM_PORT)
 
     @modal.exit()
     def stop(self):
+        if not hasattr(self, "supervisor"):
+            return
         try:
-            _sleep()
+            self.supervisor.sleep()
         except Exception:
             pass
-        if hasattr(self, "vllm_proc") and self.vllm_proc.poll() is None:
-            self.vllm_proc.terminate()
-            try:
-                self.vllm_proc.wait(timeout=10)
-            except subprocess.TimeoutExpired:
-                self.vllm_proc.kill()
-        if hasattr(self, "_vllm_log"):
-            self._vllm_log.close()
+        self.supervisor.stop()
+
+    def _warmup(self) -> None:
+        """VOICEDESIGN_WARMUP texts, one at a time (the service is not concurrent)."""
+        import soundfile as sf
+
+        profile = warmup.VOICEDESIGN_WARMUP
+        for text in profile["texts"]:
+            t0 = time.perf_counter()
+            resp = self.vllm.post("/v1/audio/speech", json=_design_payload(
+                text, profile["instructions"], profile["language"],
+            ))
+            resp.raise_for_status()
+            sf.read(io.BytesIO(resp.content))
+            self.logger.info(
+                "Warm-up: %d chars in %.2fs", len(text), time.perf_counter() - t0,
+            )
 
     @modal.method()
     def design(
@@ -559,21 +659,10 @@ class VoiceDesignService:
         t0 = time.perf_counter()
 
         try:
-            payload = {
-                "model": MODEL_VOICEDESIGN,
-                "input": text,
-                "voice": "alloy",
-                "language": language,
-                "task_type": "VoiceDesign",
-                "instructions": voice_instructions.strip(),
-                "response_format": "wav",
-            }
+            self.supervisor.ensure_running()
+            payload = _design_payload(text, voice_instructions, language)
 
-            resp = http_requests.post(
-                f"http://localhost:{VLLM_PORT}/v1/audio/speech",
-                json=payload,
-                timeout=300,
-            )
+            resp = self.vllm.post("/v1/audio/speech", json=payload)
 
             if resp.status_code != 200:
                 self.logger.error(
@@ -623,6 +712,7 @@ class VoiceDesignService:
                 "sample_rate": sr,
                 "saved_as": saved_as,
                 "size": len(audio_bytes),
+                **self.coldstart.first_response(),
             }
         except Exception as e:
             self.logger.error("[VoiceDesign] Error: %s", e)
@@ -655,5 +745,6 @@ class VoiceDesignService:
                 "X-Audio-Duration": str(result["duration"]),
                 "X-Sample-Rate": str(result["sample_rate"]),
                 "X-Saved-As": result.get("saved_as", ""),
+                **coldstart.response_headers(result),
             },
         )
@@ -8,7 +8,6 @@ Deploy:   modal deploy scripts/modal_voice_analyzer.py
 Analyze:  curl -X POST https://<url>/web_analyze -F "audio=@voice.wav"
 """
 
-import os
 import time
 
 import fastapi
@@ -24,6 +23,8 @@ app = modal.App(
 )
 hf_secret = modal.Secret.from_name("huggingface-secret")
 voice_refs_vol = modal.Volume.from_name("tts-voice-refs", create_if_missing=True)
+coldstart_vol = modal.Volume.from_name("coldstart-timelines", create_if_missing=True)
+COLDSTART_PATH = "/coldstart-timelines"
 
 
 def build_image():
@@ -43,12 +44,18 @@ image = (
         "accelerate",
         "qwen-omni-utils",
         "soundfile",
+        "soxr",
         "numpy",
         "fastapi[standard]",
     )
     .run_function(build_image, secrets=[hf_secret])
+    .add_local_python_source("audio_io", "coldstart")
 )
 
+with image.imports():
+    import audio_io
+    from coldstart import ColdStartTimeline
+
 
 @app.cls(
     image=image,
@@ -56,7 +63,7 @@ image = (
     memory=32768,
     timeout=600,
     secrets=[hf_secret],
-    volumes={VOICE_REFS_PATH: voice_refs_vol},
+    volumes={VOICE_REFS_PATH: voice_refs_vol, COLDSTART_PATH: coldstart_vol},
     enable_memory_snapshot=True,
     scaledown_window=15,
 )
@@ -73,6 +80,7 @@ class VoiceAnalyzerService:
             format="%(asctime)s - %(levelname)s - %(message)s",
         )
         self.logger = logging.getLogger("voice-analyzer")
+        self.coldstart = ColdStartTimeline(APP_NAME, COLDSTART_PATH, self.logger)
         self.logger.info("Loading Qwen3-Omni Captioner...")
 
         self.model = Qwen3OmniMoeForConditionalGeneration.from_pretrained(
@@ -81,13 +89,16 @@ class VoiceAnalyzerService:
             device_map="auto",
             attn_implementation="sdpa",
         )
+        self.coldstart.mark("model_load")
         self.processor = Qwen3OmniMoeProcessor.from_pretrained(MODEL_NAME)
+        self.coldstart.mark("processor_load")
         self.logger.info("Captioner loaded — snapshot point.")
 
     @modal.enter(snap=False)
     def restore(self):
         import logging
 
+        self.coldstart.begin_restore()
         if not hasattr(self, "logger"):
             logging.basicConfig(
                 level=logging.INFO,
@@ -95,6 +106,7 @@ class VoiceAnalyzerService:
             )
             self.logger = logging.getLogger("voice-analyzer")
 
+        self.coldstart.mark("restore")
         self.logger.info("Restored from snapshot.")
 
     @modal.fastapi_endpoint(method="POST")
@@ -106,22 +118,19 @@ class VoiceAnalyzerService:
 
         Returns a detailed text description of the voice.
         """
-        import tempfile
-
         from qwen_omni_utils import process_mm_info
 
         t0 = time.perf_counter()
 
         try:
             audio_bytes = await audio.read()
-            with tempfile.NamedTemporaryFile(suffix=".wav", delete=False) as tmp:
-                tmp.write(audio_bytes)
-                tmp_path = tmp.name
+            # The captioner expects 16kHz mono; arrays are used as-is
+            audio_array = audio_io.decode_audio(audio_bytes)
 
             conversation = [
                 {
                     "role": "user",
-                    "content": [{"type": "audio", "audio": tmp_path}],
+                    "content": [{"type": "audio", "audio": audio_array}],
                 },
             ]
 
@@ -151,7 +160,6 @@ class VoiceAnalyzerService:
                 clean_up_tokenization_spaces=False,
             )
 
-            os.unlink(tmp_path)
             elapsed = time.perf_counter() - t0
 
             description = caption[0] if caption else ""
@@ -163,6 +171,7 @@ class VoiceAnalyzerService:
             return fastapi.responses.JSONResponse({
                 "description": description,
                 "inference_time": round(elapsed, 2),
+                **self.coldstart.first_response(),
             })
 
         except Exception as e:
@@ -0,0 +1,381 @@
+#!/usr/bin/env python3
+"""Modal DEPLOYED worker for Whisper via vLLM -- in-process engine + GPU Snapshot.
+
+Same service as modal_whisper_http.py, but vLLM runs inside this process
+(vllm.LLM, as modal_tts_qwen_vllm.py does with Omni) instead of as a
+`vllm serve` subprocess behind localhost HTTP. Each chunk's PCM goes to the
+engine as a float32 NumPy array: no WAV encode, multipart upload, request
+parsing or second decode per chunk, which is most of the overhead left on a
+short dictation clip.
+
+Pattern:
+    1. @modal.enter(snap=True) -- load the engine, warm up, sleep. Snapshot taken after.
+    2. @modal.enter(snap=False) -- wake the engine, ready to serve.
+
+Everything else -- results cache, decode, VAD chunk planning, stitching,
+timings, batches, warm-up profile, transcribe / transcribe_batch schema -- is
+the WhisperPipeline of whisper_service.py, with the engine backend of
+whisper_engine.py. Differences in the results: no word timestamps (stitching
+aligns repeated words instead), "http_container" is {}, and the vLLM
+queue/inference times come from the engine's request metrics.
+
+Workflow:
+    1. Deploy:  modal deploy scripts/modal_whisper_engine.py
+    2. Test:    python3 scripts/modal_whisper_engine.py --audio docs/Refaudio.wav
+                (several --audio paths -> one transcribe_batch call)
+    3. Compare: python3 scripts/bench_whisper_services.py --audio docs/Refaudio.wav
+
+GPU: L4 (24GB). Whisper large-v3 FP16 = ~3GB weights + KV cache.
+"""
+
+import json
+import os
+import time
+
+import modal
+from fastapi import UploadFile, File, Form
+from fastapi.responses import StreamingResponse
+
+# Argument/Form defaults: no dependencies, so the local client runs without numpy
+from whisper_defaults import CHUNK_SECONDS, OVERLAP_SECONDS, STITCH_MODE, TARGET_SR
+
+APP_NAME = "whisper-engine"
+app = modal.App(APP_NAME, tags={"project": "elco-machina", "model": "whisper", "engine": "vllm-inprocess"})
+
+GPU_TYPE = "L4"
+MINUTES = 60
+VLLM_MODEL = "openai/whisper-large-v3"
+MODE = "engine-snapshot"
+# Requests share the engine; their generate() calls take turns (round-robin)
+MAX_CONCURRENT_INPUTS = 16
+
+whisper_image = (
+    modal.Image.from_registry(
+        "nvidia/cuda:12.9.0-devel-ubuntu22.04", add_python="3.12"
+    )
+    .entrypoint([])
+    .apt_install(["ffmpeg"])
+    .uv_pip_install(
+        "vllm==0.8.5.post1",
+        "transformers==4.52.4",
+        "huggingface-hub>=0.28.0",
+        "numpy",
+        "soundfile",
+        "soxr",
+        "requests",
+        "fastapi[standard]",
+    )
+    .env({
+        "HF_XET_HIGH_PERFORMANCE": "1",
+        "TORCHINDUCTOR_COMPILE_THREADS": "1",
+        "NCCL_DEBUG": "ERROR",
+        "TORCH_NCCL_ENABLE_MONITORING": "0",
+        "TORCH_CPP_LOG_LEVEL": "FATAL",
+    })
+    .add_local_python_source(
+        "audio_io", "coldstart", "fair_scheduler", "transcript_cache", "transcript_checkpoint",
+        "volume_upload", "warmup", "whisper_defaults", "whisper_engine",
+        "whisper_pipeline", "whisper_service",
+    )
+)
+
+vllm_cache_vol = modal.Volume.from_name("vllm-cache", create_if_missing=True)
+audio_volume = modal.Volume.from_name("audio-uploads", create_if_missing=True)
+AUDIO_VOLUME_PATH = "/audio-uploads"
+results_cache_vol = modal.Volume.from_name("whisper-engine-results-cache", create_if_missing=True)
+RESULTS_CACHE_PATH = "/results-cache"
+RESULTS_CACHE_MAX_BYTES = 2 * 1024**3
+RESULTS_CACHE_TTL_S = 30 * 24 * 3600
+coldstart_vol = modal.Volume.from_name("coldstart-timelines", create_if_missing=True)
+COLDSTART_PATH = "/coldstart-timelines"
+
+with whisper_image.imports():
+    import volume_upload
+    from coldstart import ColdStartTimeline
+    from transcript_cache import TranscriptCache
+    from transcript_checkpoint import CHECKPOINT_DIR, CheckpointStore
+    from whisper_engine import EngineWhisperPipeline
+    from whisper_service import MAX_CONCURRENT_CHUNKS, read_upload
+
+
+@app.cls(
+    image=whisper_image,
+    gpu=GPU_TYPE,
+    timeout=10 * MINUTES,
+    volumes={
+        "/root/.cache/vllm": vllm_cache_vol,
+        AUDIO_VOLUME_PATH: audio_volume,
+        RESULTS_CACHE_PATH: results_cache_vol,
+        COLDSTART_PATH: coldstart_vol,
+    },
+    enable_memory_snapshot=True,
+    experimental_options={"enable_gpu_snapshot": True},
+    secrets=[modal.Secret.from_name("huggingface-secret")],
+    scaledown_window=2,
+)
+@modal.concurrent(max_inputs=MAX_CONCURRENT_INPUTS)
+class WhisperEngine:
+    @modal.enter(snap=True)
+    def start(self):
+        import logging
+
+        from vllm import LLM
+
+        logging.basicConfig(
+            level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s"
+        )
+        self.logger = logging.getLogger("whisper-engine")
+        self.coldstart = ColdStartTimeline(APP_NAME, COLDSTART_PATH, self.logger)
+        self.cache = TranscriptCache(
+            RESULTS_CACHE_PATH, RESULTS_CACHE_MAX_BYTES, RESULTS_CACHE_TTL_S,
+        )
+        self.coldstart.mark("setup")
+
+        self.logger.info("Loading vLLM engine for %s...", VLLM_MODEL)
+        self.llm = LLM(
+            model=VLLM_MODEL,
+            dtype="auto",
+            gpu_memory_utilization=0.90,
+            enable_sleep_mode=True,
+            max_model_len=448,
+            max_num_seqs=MAX_CONCURRENT_CHUNKS,
+            limit_mm_per_prompt={"audio": 1},
+        )
+        self.coldstart.mark("vllm_ready")
+        self.logger.info("vLLM engine loaded")
+
+        self.pipeline = EngineWhisperPipeline(
+            self.llm, self.cache, self.coldstart, self.logger,
+            model=VLLM_MODEL, mode=MODE,
+            resolve_volume_path=lambda path: volume_upload.resolve(
+                AUDIO_VOLUME_PATH, path, audio_volume,
+            ),
+            checkpoints=CheckpointStore(
+                os.path.join(RESULTS_CACHE_PATH, CHECKPOINT_DIR),
+                commit=results_cache_vol.commit, reload=results_cache_vol.reload,
+            ),
+        )
+
+        self.logger.info("Running warm-up profile...")
+        self.pipeline.run_warmup()
+        self.coldstart.mark("warmup")
+        self.logger.info("Warm-up done")
+
+        self.logger.info("Putting vLLM engine to sleep...")
+        self.llm.sleep(level=1)
+        self.awake = False
+        self.coldstart.mark("sleep")
+        self.logger.info("vLLM engine sleeping -- snapshot point")
+
+    @modal.enter(snap=False)
+    def restore(self):
+        """Wake the engine from sleep mode after restoring from a memory snapshot."""
+        self.coldstart.begin_restore()
+        self.llm.wake_up()
+        self.awake = True
+        self.coldstart.mark("wake")
+
+    @modal.method()
+    def transcribe(self, audio_bytes: bytes, language: str = "pt",
+                   volume_path: str = "", vad: bool = True,
+                   chunk_seconds: float = CHUNK_SECONDS,
+                   overlap_seconds: float = OVERLAP_SECONDS,
+                   stitch: str = STITCH_MODE, use_cache: bool = True,
+                   stream_decode: bool | None = None, timings: bool = True,
+                   audio_format: str = "auto",
+                   sample_rate: int = TARGET_SR, checkpoint: bool = False,
+                   time_budget_s: float | None = None) -> dict:
+        """Transcribe audio via gRPC. Same arguments and result as WhisperHTTP.transcribe."""
+        return self.pipeline.transcribe(
+            audio_bytes, language, volume_path, vad=vad, chunk_seconds=chunk_seconds,
+            overlap_seconds=overlap_seconds, stitch=stitch, use_cache=use_cache,
+            stream_decode=stream_decode, timings=timings, audio_format=audio_format,
+            sample_rate=sample_rate, checkpoint=checkpoint, time_budget_s=time_budget_s,
+        )
+
+    @modal.method()
+    def transcribe_batch(self, files: list[dict], language: str = "pt",
+                         vad: bool = True, chunk_seconds: float = CHUNK_SECONDS,
+                         overlap_seconds: float = OVERLAP_SECONDS,
+                         stitch: str = STITCH_MODE, use_cache: bool = True,
+                         timings: bool = True, audio_format: str = "auto",
+                         sample_rate: int = TARGET_SR) -> dict:
+        """Transcribe many files at once (gRPC). Same as WhisperHTTP.transcribe_batch."""
+        return self.pipeline.transcribe_batch(
+            files, language, vad=vad, chunk_seconds=chunk_seconds,
+            overlap_seconds=overlap_seconds, stitch=stitch, use_cache=use_cache,
+            timings=timings, audio_format=audio_format, sample_rate=sample_rate,
+        )
+
+    @modal.method()
+    def health(self) -> dict:
+        """Health check (gRPC)."""
+        return self._health()
+
+    def _health(self) -> dict:
+        import torch
+
+        return {
+            "status": "healthy" if self.awake else "degraded",
+            "vllm_alive": self.awake,
+            "gpu": torch.cuda.get_device_name(0) if torch.cuda.is_available() else None,
+            "model": VLLM_MODEL,
+            "mode": MODE,
+            "scheduler": self.pipeline.scheduler.stats(),
+        }
+
+    # --- Web endpoints (HTTP, callable from Laravel via curl/Guzzle) ---
+
+    @modal.fastapi_endpoint(method="POST")
+    async def web_transcribe(
+        self,
+        file: UploadFile = File(...),
+        language: str = Form("pt"),
+        vad: bool = Form(True),
+        chunk_seconds: float = Form(CHUNK_SECONDS),
+        overlap_seconds: float = Form(OVERLAP_SECONDS),
+        stitch: str = Form(STITCH_MODE),
+        use_cache: bool = Form(True),
+        timings: bool = Form(True),
+        audio_format: str = Form("auto"),
+        sample_rate: int = Form(TARGET_SR),
+        checkpoint: bool = Form(False),
+    ) -> dict:
+        """Transcribe uploaded audio file. Returns JSON with text + metrics.
+
+        Usage:
+            curl -X POST https://<modal-url>/web_transcribe \
+              -F "file=@audio.wav" -F "language=pt"
+        """
+        return await self.pipeline.atranscribe(
+            await read_upload(file), language, vad=vad, chunk_seconds=chunk_seconds,
+            overlap_seconds=overlap_seconds, stitch=stitch, use_cache=use_cache,
+            timings=timings, audio_format=audio_format, sample_rate=sample_rate,
+            checkpoint=checkpoint,
+        )
+
+    @modal.fastapi_endpoint(method="POST")
+    async def web_transcribe_stream(
+        self,
+        file: UploadFile = File(...),
+        language: str = Form("pt"),
+        vad: bool = Form(True),
+        chunk_seconds: float = Form(CHUNK_SECONDS),
+        overlap_seconds: float = Form(OVERLAP_SECONDS),
+        stitch: str = Form(STITCH_MODE),
+        use_cache: bool = Form(True),
+        timings: bool = Form(True),
+        audio_format: str = Form("auto"),
+        sample_rate: int = Form(TARGET_SR),
+        format: str = Form("ndjson"),
+    ) -> StreamingResponse:
+        """Transcribe uploaded audio, streaming plan / chunk / summary records.
+
+        Same records as WhisperHTTP.web_transcribe_stream; chunk records come
+        in groups of up to MAX_CONCURRENT_CHUNKS (one engine call each).
+        """
+        return await self.pipeline.astream_response(
+            await read_upload(file), format, language, vad=vad,
+            chunk_seconds=chunk_seconds, overlap_seconds=overlap_seconds,
+            stitch=stitch, use_cache=use_cache, timings=timings,
+            audio_format=audio_format, sample_rate=sample_rate,
+        )
+
+    @modal.fastapi_endpoint(method="POST")
+    async def web_transcribe_batch(
+        self,
+        files: list[UploadFile] = File(...),
+        language: str = Form("pt"),
+        vad: bool = Form(True),
+        chunk_seconds: float = Form(CHUNK_SECONDS),
+        overlap_seconds: float = Form(OVERLAP_SECONDS),
+        stitch: str = Form(STITCH_MODE),
+        use_cache: bool = Form(True),
+        timings: bool = Form(True),
+        audio_format: str = Form("auto"),
+        sample_rate: int = Form(TARGET_SR),
+    ) -> dict:
+        """Transcribe several uploaded files in one request (one shared work queue)."""
+        items = [(f.filename or f"file_{i}", await read_upload(f))
+                 for i, f in enumerate(files)]
+        return await self.pipeline.atranscribe_batch(
+            items, language, vad=vad, chunk_seconds=chunk_seconds,
+            overlap_seconds=overlap_seconds, stitch=stitch, use_cache=use_cache,
+            timings=timings, audio_format=audio_format, sample_rate=sample_rate,
+        )
+
+    @modal.fastapi_endpoint(method="GET")
+    def web_health(self) -> dict:
+        """Health check via HTTP GET."""
+        return self._health()
+
+
+# ---------------------------------------------------------------------------
+# Client mode (call deployed service)
+# ---------------------------------------------------------------------------
+
+if __name__ == "__main__":
+    import argparse
+
+    import volume_upload
+
+    parser = argparse.ArgumentParser(description="Call deployed Whisper engine service")
+    parser.add_argument("--audio", required=True, nargs="+",
+                        help="Path to audio file (several = one batch call)")
+    parser.add_argument("--language", default="pt", help="Language code")
+    parser.add_argument("--use-volume", action="store_true",
+                        help="Always go through the Modal Volume (same as --transport volume)")
+    parser.add_argument("--transport", choices=["auto", "bytes", "volume"], default="auto",
+                        help="auto: files >= 16MB via the volume, smaller ones as bytes")
+    parser.add_argument("--debug", action="store_true", help="Show raw container logs")
+    args = parser.parse_args()
+    if args.use_volume:
+        args.transport = "volume"
+
+    if args.debug:
+        modal.enable_output()
+
+    t0 = time.time()
+    vol = modal.Volume.from_name(volume_upload.VOLUME_NAME, create_if_missing=True)
+    files = []
+    for path in args.audio:
+        name = os.path.basename(path)
+        if volume_upload.choose_transport(os.path.getsize(path), args.transport) == "volume":
+            print(f"Uploading {name} to Modal Volume (content-addressed)...")
+            files.append({"volume_path": volume_upload.upload(vol, path), "name": name})
+        else:
+            with open(path, "rb") as f:
+                files.append({"audio_bytes": f.read(), "name": name})
+
+    print("PROGRESS:status:loading_vllm", flush=True)
+    service = modal.Cls.from_name(APP_NAME, "WhisperEngine")()
+    print("PROGRESS:status:transcribing", flush=True)
+
+    if len(files) > 1:
+        result = service.transcribe_batch.remote(files, args.language)
+        wall = time.time() - t0
+        print(f"RESULT:" + json.dumps(result), flush=True)
+        for r in result["results"]:
+            status = r.get("error") or f"{r['duration_audio_s']}s, cached={r['cached']}"
+            print(f"\n[{r['name']}] {status}\n{r.get('text', '')}")
+        print(f"\nWall time:      {wall:.1f}s")
+        print(f"Inference:      {result['inference_s']}s")
+        print(f"Chunks:         {result['chunks']} (max in flight {result['max_in_flight']})")
+        print(f"Failed:         {result['failed']}")
+        raise SystemExit(0)
+
+    f = files[0]
+    result = service.transcribe.remote(f.get("audio_bytes", b""), args.language,
+                                       volume_path=f.get("volume_path", ""))
+    wall = time.time() - t0
+
+    print(f"RESULT:" + json.dumps(result), flush=True)
+
+    print(f"\nWall time:      {wall:.1f}s")
+    print(f"Inference:      {result['inference_s']}s")
+    print(f"Audio duration: {result['duration_audio_s']}s")
+    print(f"RTF:            {result['rtf']}")
+    print(f"Chunks:         {result['chunks']}")
+    print(f"Skipped:        {result['skipped_s']}s (non-speech)")
+    print(f"Mode:           {result['mode']}")
+    print(f"\nTexto:\n{result['text']}")
@@ -8,14 +8,87 @@ Pattern:
     1. @modal.enter(snap=True) -- start vllm serve, warm up, sleep. Snapshot taken after.
     2. @modal.enter(snap=False) -- wake vLLM, ready to serve.
 
-Audio >30s is chunked automatically (30s windows, 2s overlap) because
-vLLM Whisper has a 30-second-per-prompt architectural limit.
+Audio is chunked automatically (windows of at most 30s) because vLLM Whisper
+has a 30-second-per-prompt architectural limit. An energy VAD places the cuts
+at pauses and drops non-speech stretches entirely; the 2s overlap is only used
+when a cut has to land inside continuous speech, and the words it repeats are
+removed when chunks are stitched (by word timestamps, or by aligning the
+repeated words when the server returns none). Chunks are
+dispatched concurrently (up to MAX_CONCURRENT_CHUNKS in flight) so vLLM can
+batch them; a failed chunk is retried on its own.
+
+Results are cached by content (raw upload hash, and decoded PCM hash so a
+re-encoded copy also hits) on the whisper-results-cache volume; a hit returns
+without touching vLLM.
+
+The web endpoints are async: uploads are read in blocks, decode/planning run
+in a worker thread, and chunks go to vLLM over a pooled httpx client, so one
+container serves up to MAX_CONCURRENT_INPUTS requests on a single event loop.
+Their chunks share the --max-num-seqs vLLM slots round-robin (FairScheduler,
+fair_scheduler.py), so a dictation is not stuck behind a long file's chunks;
+health reports the scheduler's in-flight and queued chunks.
+
+Every result carries a "timings" breakdown (decode, resample, hash, plan,
+encode, chunk latency min/p50/max, vLLM queue/inference time from its
+/metrics, stitch, bytes in/out), also logged; pass timings=False to skip it.
+
+Large volume files (transcribe(volume_path=...), >= STREAM_DECODE_MIN_BYTES or
+stream_decode=True) are never loaded whole: they are decoded, resampled and
+VAD-planned in windows while earlier chunks are already being transcribed,
+so memory stays flat however long the recording is.
+
+The request path (cache, decode, chunk planning and dispatch, stitching,
+timings, batches, warm-up) is WhisperPipeline in whisper_service.py, shared
+with modal_whisper_vllm.py so both return the same schema.
+
+The vllm serve process is run by VLLMSupervisor (vllm_supervisor.py): HTTP
+readiness probing, in-memory log tail, and in-place restart if it crashes;
+health reports its state and transition timings.
+
+The first result a container returns carries cold_start=True and the
+snapshot/restore/first-request timeline (coldstart.py), which is also written
+to the coldstart-timelines volume; later results carry cold_start=False.
+
+Clients may convert audio to 16 kHz mono FLAC, Opus or raw int16 before
+sending (client --transcode) and tag it with audio_format: the server then
+skips container sniffing and resampling, and "pcm_s16le" is used as is, with
+no decode at all. Raw capture PCM (audio_format=pcm_s16le|pcm_f32le plus the
+sample_rate it was recorded at) is accepted as well, e.g. straight from the
+browser recorder.
+
+Clips no longer than one chunk window -- dictation, the most common request
+-- skip VAD chunk planning and go to vLLM as a single request.
+
+With checkpoint=True every finished chunk is saved on the results-cache
+volume (transcript_checkpoint.py) and a repeated call resumes where the
+last one stopped -- after a crash, a timeout, or a time_budget_s that ran
+out on purpose.
+
+web_submit queues a transcription and returns a job id at once, so callers
+(Laravel queue workers) are not held for the whole transcription: the work
+is spawned as WhisperHTTP.run_job, which keeps per-chunk progress and an
+ETA in the whisper-jobs modal.Dict (transcription_jobs.py);
+web_job_status / web_job_result / web_job_cancel read and steer it.
+
+transcribe_batch / web_transcribe_batch take many files at once and pack the
+chunks of all of them into one work queue, so short clips still fill the
+--max-num-seqs batch instead of each running its own chunk loop.
+
+transcribe_long is the opposite case: one very long volume recording is cut
+at pauses into ~SEGMENT_SECONDS segments on a CPU container, each segment is
+transcribed by its own WhisperHTTP container in parallel, and the transcripts
+are stitched back together (whisper_mapreduce.py) -- wall time then follows
+the longest segment rather than the whole file.
 
 Workflow:
     1. Deploy:  modal deploy scripts/modal_whisper_http.py
     2. Test:    python3 scripts/modal_whisper_http.py --audio docs/Refaudio.wav
+                (several --audio paths -> one transcribe_batch call)
     3. First call after deploy: slow (~2-3min, creating snapshot)
     4. Subsequent cold starts: ~10-15s (GPU state restore + wake)
+    5. Long:    python3 scripts/modal_whisper_http.py --audio deposition.m4a --long
+                (or --resumable: one container, checkpointed over several calls)
+    6. Job:     python3 scripts/modal_whisper_http.py --audio meeting.m4a --submit
 
 GPU: L4 (24GB). Whisper large-v3 FP16 = ~3GB weights + KV cache.
 
@@ -25,15 +98,18 @@ NOTE: GPU snapshot with vLLM serve + encoder-decoder (Whisper) is experimental.
 
 import json
 import os
-import socket
-import subprocess
-import tempfile
 import time
 
 import modal
 from fastapi import Response, UploadFile, File, Form
+from fastapi.responses import JSONResponse, StreamingResponse
 from pydantic import BaseModel, Field
 
+# Argument/Form defaults: no dependencies, so the local client runs without numpy
+from whisper_defaults import (
+    CHUNK_SECONDS, OVERLAP_SECONDS, SEGMENT_SECONDS, STITCH_MODE, TARGET_SR,
+)
+
 APP_NAME = "whisper-http"
 app = modal.App(APP_NAME, tags={"project": "elco-machina", "model": "whisper", "engine": "vllm-http"})
 
@@ -41,8 +117,11 @@ GPU_TYPE = "L4"
 MINUTES = 60
 VLLM_PORT = 8000
 VLLM_MODEL = "openai/whisper-large-v3"
-CHUNK_SECONDS = 30
-OVERLAP_SECONDS = 2
+# Requests one container serves at once; the web endpoints are async, so these
+# share the event loop and the vLLM connection pool rather than a thread each.
+# Their chunks take turns at the --max-num-seqs vLLM slots (pipeline.scheduler),
+# so requests beyond those slots queue fairly here instead of starting a GPU.
+MAX_CONCURRENT_INPUTS = 16
 
 whisper_image = (
     modal.Image.from_registry(
@@ -54,8 +133,9 @@ whisper_image = (
         "vllm==0.8.5.post1",
         "transformers==4.52.4",
         "huggingface-hub>=0.28.0",
-        "librosa",
+        "numpy",
         "soundfile",
+        "soxr",
         "requests",
         "fastapi[standard]",
     )
@@ -67,123 +147,36 @@ whisper_image = (
         "TORCH_NCCL_ENABLE_MONITORING": "0",
         "TORCH_CPP_LOG_LEVEL": "FATAL",
     })
+    .add_local_python_source(
+        "audio_io", "coldstart", "fair_scheduler", "http_pool", "transcript_cache",
+        "transcript_checkpoint", "transcription_jobs", "vllm_supervisor",
+        "volume_upload", "warmup", "whisper_defaults", "whisper_mapreduce",
+        "whisper_pipeline", "whisper_service",
+    )
 )
 
 vllm_cache_vol = modal.Volume.from_name("vllm-cache", create_if_missing=True)
 audio_volume = modal.Volume.from_name("audio-uploads", create_if_missing=True)
 AUDIO_VOLUME_PATH = "/audio-uploads"
+results_cache_vol = modal.Volume.from_name("whisper-results-cache", create_if_missing=True)
+RESULTS_CACHE_PATH = "/results-cache"
+RESULTS_CACHE_MAX_BYTES = 2 * 1024**3
+RESULTS_CACHE_TTL_S = 30 * 24 * 3600
+coldstart_vol = modal.Volume.from_name("coldstart-timelines", create_if_missing=True)
+COLDSTART_PATH = "/coldstart-timelines"
+# Progress, results and cancel flags of submitted jobs (transcription_jobs.py)
+jobs_dict = modal.Dict.from_name("whisper-jobs", create_if_missing=True)
 
 with whisper_image.imports():
-    import requests
-
-
-def _wait_ready(proc: subprocess.Popen, timeout: int = 5 * MINUTES) -> None:
-    deadline = time.time() + timeout
-    while time.time() < deadline:
-        try:
-            socket.create_connection(("localhost", VLLM_PORT), timeout=1).close()
-            return
-        except OSError:
-            if proc.poll() is not None:
-                raise RuntimeError(f"vLLM exited with {proc.returncode}")
-            time.sleep(1)
-    raise TimeoutError(f"vLLM not ready within {timeout}s")
-
-
-def _warmup() -> None:
-    """Warm-up with short audio via /v1/audio/transcriptions endpoint."""
-    import io
-    import struct
-
-    # Generate 1s WAV file (16kHz, 16-bit, mono, silence)
-    sr = 16000
-    num_samples = sr
-    wav_buf = io.BytesIO()
-    # WAV header
-    data_size = num_samples * 2  # 16-bit = 2 bytes per sample
-    wav_buf.write(b"RIFF")
-    wav_buf.write(struct.pack("<I", 36 + data_size))
-    wav_buf.write(b"WAVE")
-    wav_buf.write(b"fmt ")
-    wav_buf.write(struct.pack("<I", 16))  # chunk size
-    wav_buf.write(struct.pack("<H", 1))   # PCM
-    wav_buf.write(struct.pack("<H", 1))   # mono
-    wav_buf.write(struct.pack("<I", sr))  # sample rate
-    wav_buf.write(struct.pack("<I", sr * 2))  # byte rate
-    wav_buf.write(struct.pack("<H", 2))   # block align
-    wav_buf.write(struct.pack("<H", 16))  # bits per sample
-    wav_buf.write(b"data")
-    wav_buf.write(struct.pack("<I", data_size))
-    wav_buf.write(b"\x00" * data_size)  # silence
-    wav_bytes = wav_buf.getvalue()
-
-    for _ in range(2):
-        resp = requests.post(
-            f"http://localhost:{VLLM_PORT}/v1/audio/transcriptions",
-            files={"file": ("warmup.wav", wav_bytes, "audio/wav")},
-            data={"model": VLLM_MODEL},
-            timeout=300,
-        )
-        resp.raise_for_status()
-
-
-def _sleep(level: int = 1) -> None:
-    requests.post(
-        f"http://localhost:{VLLM_PORT}/sleep?level={level}"
-    ).raise_for_status()
-
-
-def _wake_up() -> None:
-    requests.post(
-        f"http://localhost:{VLLM_PORT}/wake_up"
-    ).raise_for_status()
-
-
-def _chunk_audio_bytes(audio_bytes: bytes) -> tuple[list[bytes], float]:
-    """Load audio, chunk if >30s, return (list of WAV bytes, duration)."""
-    import io
-    import tempfile
-
-    import librosa
-    import soundfile as sf
-
-    # Save to temp file so librosa can detect format from extension
-    with tempfile.NamedTemporaryFile(suffix=".wav", delete=False) as f:
-        f.write(audio_bytes)
-        tmp_path = f.name
-
-    try:
-        audio_array, sr = librosa.load(tmp_path, sr=16000, mono=True)
-    finally:
-        os.unlink(tmp_path)
-
-    total_samples = len(audio_array)
-    audio_duration = total_samples / sr
-    chunk_samples = CHUNK_SECONDS * sr
-    overlap_samples = OVERLAP_SECONDS * sr
-    step = chunk_samples - overlap_samples
-
-    if total_samples <= chunk_samples:
-        # Re-encode as proper WAV for the API
-        buf = io.BytesIO()
-        sf.write(buf, audio_array, sr, format="WAV", subtype="PCM_16")
-        return [buf.getvalue()], audio_duration
-
-    chunks_wav = []
-    start = 0
-    while start < total_samples:
-        end = min(start + chunk_samples, total_samples)
-        chunk = audio_array[start:end]
-
-        buf = io.BytesIO()
-        sf.write(buf, chunk, sr, format="WAV", subtype="PCM_16")
-        chunks_wav.append(buf.getvalue())
-
-        start += step
-        if end == total_samples:
-            break
-
-    return chunks_wav, audio_duration
+    import volume_upload
+    from coldstart import ColdStartTimeline
+    from http_pool import PooledHTTPClient
+    from transcript_cache import TranscriptCache
+    from transcript_checkpoint import CHECKPOINT_DIR, CheckpointStore
+    from transcription_jobs import JobStore, function_call_error, submit
+    from vllm_supervisor import VLLMSupervisor
+    from whisper_mapreduce import SEGMENTS_DIR, merge_segments, split_recording
+    from whisper_service import MAX_CONCURRENT_CHUNKS, WhisperPipeline, read_upload
 
 
 @app.cls(
@@ -193,12 +186,15 @@ def _chunk_audio_bytes(audio_bytes: bytes) -> tuple[list[bytes], float]:
     volumes={
         "/root/.cache/vllm": vllm_cache_vol,
         AUDIO_VOLUME_PATH: audio_volume,
+        RESULTS_CACHE_PATH: results_cache_vol,
+        COLDSTART_PATH: coldstart_vol,
     },
     enable_memory_snapshot=True,
     experimental_options={"enable_gpu_snapshot": True},
     secrets=[modal.Secret.from_name("huggingface-secret")],
     scaledown_window=2,
 )
+@modal.concurrent(max_inputs=MAX_CONCURRENT_INPUTS)
 class WhisperHTTP:
     @modal.enter(snap=True)
     def start(self):
@@ -208,6 +204,13 @@ class WhisperHTTP:
             level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s"
         )
         self.logger = logging.getLogger("whisper-http")
+        self.coldstart = ColdStartTimeline(APP_NAME, COLDSTART_PATH, self.logger)
+        self.cache = TranscriptCache(
+            RESULTS_CACHE_PATH, RESULTS_CACHE_MAX_BYTES, RESULTS_CACHE_TTL_S,
+        )
+        self.vllm = PooledHTTPClient(
+            f"http://localhost:{VLLM_PORT}", pool_size=MAX_CONCURRENT_CHUNKS,
+        )
 
         self.logger.info("Starting vLLM serve for %s...", VLLM_MODEL)
 
@@ -219,172 +222,468 @@ class WhisperHTTP:
             "--gpu_memory_utilization", "0.90",
             "--enable-sleep-mode",
             "--max-model-len", "448",
-            "--max-num-seqs", "16",
+            "--max-num-seqs", str(MAX_CONCURRENT_CHUNKS),
             "--uvicorn-log-level", "warning",
             "--disable-log-requests",
         ]
 
-        self._vllm_log = open("/tmp/vllm-stderr.log", "w")
-        self.vllm_proc = subprocess.Popen(
-            cmd, stdout=self._vllm_log, stderr=subprocess.STDOUT,
-        )
-
+        self.supervisor = VLLMSupervisor(cmd, self.vllm, logger=self.logger, echo=True)
+        self.coldstart.mark("setup")
         try:
-            _wait_ready(self.vllm_proc)
+            self.supervisor.start(timeout=5 * MINUTES)
         except (RuntimeError, TimeoutError):
-            # Dump stderr so we can see what went wrong
-            self._vllm_log.flush()
-            with open("/tmp/vllm-stderr.log") as f:
-                self.logger.error("vLLM stderr:\n%s", f.read()[-3000:])
+            self.logger.error("vLLM output:\n%s", self.supervisor.log_tail())
             raise
+        self.coldstart.mark("vllm_ready")
         self.logger.info("vLLM ready on port %d", VLLM_PORT)
 
-        self.logger.info("Running warm-up (2 requests)...")
-        _warmup()
+        self.pipeline = WhisperPipeline(
+            self.vllm, self.supervisor, self.cache, self.coldstart, self.logger,
+            model=VLLM_MODEL, mode="http-snapshot",
+            resolve_volume_path=lambda path: volume_upload.resolve(
+                AUDIO_VOLUME_PATH, path, audio_volume,
+            ),
+            checkpoints=CheckpointStore(
+                os.path.join(RESULTS_CACHE_PATH, CHECKPOINT_DIR),
+                commit=results_cache_vol.commit, reload=results_cache_vol.reload,
+            ),
+        )
+
+        self.logger.info("Running warm-up profile...")
+        self.pipeline.run_warmup()
+        self.coldstart.mark("warmup")
         self.logger.info("Warm-up done")
 
         self.logger.info("Putting vLLM to sleep...")
-        _sleep()
+        self.supervisor.sleep()
+        # Pooled sockets do not survive snapshot restore
+        self.vllm.reset()
+        self.coldstart.mark("sleep")
         self.logger.info("vLLM sleeping -- snapshot point")
 
     @modal.enter(snap=False)
     def restore(self):
         """Wake vLLM from sleep mode after restoring from a memory snapshot."""
-        _wake_up()
+        self.coldstart.begin_restore()
+        self.supervisor.wake_up(timeout=MINUTES)
+        self.coldstart.mark("wake")
 
     @modal.exit()
     def stop(self):
-        if hasattr(self, "vllm_proc") and self.vllm_proc.poll() is None:
-            self.vllm_proc.terminate()
-            try:
-                self.vllm_proc.wait(timeout=10)
-            except subprocess.TimeoutExpired:
-                self.vllm_proc.kill()
-        if hasattr(self, "_vllm_log"):
-            self._vllm_log.close()
+        if hasattr(self, "supervisor"):
+            self.supervisor.stop()
 
     @modal.method()
     def transcribe(self, audio_bytes: bytes, language: str = "pt",
-                   volume_path: str = "") -> dict:
-        """Transcribe audio via gRPC (used by python3 client). Auto-chunks >30s."""
-        if volume_path:
-            full_path = os.path.join(AUDIO_VOLUME_PATH, volume_path)
-            self.logger.info("Reading audio from volume: %s", full_path)
-            with open(full_path, "rb") as f:
-                audio_bytes = f.read()
-
-        result = self._do_transcribe(audio_bytes, language)
-        result["source"] = "volume" if volume_path else "bytes"
-        return result
+                   volume_path: str = "", vad: bool = True,
+                   chunk_seconds: float = CHUNK_SECONDS,
+                   overlap_seconds: float = OVERLAP_SECONDS,
+                   stitch: str = STITCH_MODE, use_cache: bool = True,
+                   stream_decode: bool | None = None, timings: bool = True,
+                   audio_format: str = "auto",
+                   sample_rate: int = TARGET_SR, checkpoint: bool = False,
+                   time_budget_s: float | None = None) -> dict:
+        """Transcribe audio via gRPC (used by python3 client). Auto-chunks >30s.
+
+        Volume files are decoded as a stream (constant memory) when
+        stream_decode is set, or by default when at least
+        STREAM_DECODE_MIN_BYTES large. timings=False drops the per-stage
+        "timings" breakdown (and the vLLM /metrics reads behind it).
+        audio_format tags audio the client already transcoded to 16 kHz mono
+        (audio_io.SPEECH_FORMATS) or headerless capture PCM ("pcm_s16le",
+        "pcm_f32le") recorded at sample_rate; "auto" sniffs the container.
+
+        checkpoint=True saves each finished chunk (transcript_checkpoint.py),
+        so calling again with the same audio and arguments after a crash or
+        timeout only transcribes the chunks still missing. time_budget_s
+        (with checkpoint) stops taking new chunks after that many seconds
+        and returns {"complete": False, "chunks_done", "chunks_planned", ...}
+        instead of the text; call again to continue.
+        """
+        return self.pipeline.transcribe(
+            audio_bytes, language, volume_path, vad=vad, chunk_seconds=chunk_seconds,
+            overlap_seconds=overlap_seconds, stitch=stitch, use_cache=use_cache,
+            stream_decode=stream_decode, timings=timings, audio_format=audio_format,
+            sample_rate=sample_rate, checkpoint=checkpoint, time_budget_s=time_budget_s,
+        )
+
+    @modal.method()
+    def transcribe_batch(self, files: list[dict], language: str = "pt",
+                         vad: bool = True, chunk_seconds: float = CHUNK_SECONDS,
+                         overlap_seconds: float = OVERLAP_SECONDS,
+                         stitch: str = STITCH_MODE, use_cache: bool = True,
+                         timings: bool = True, audio_format: str = "auto",
+                         sample_rate: int = TARGET_SR) -> dict:
+        """Transcribe many files at once (gRPC).
+
+        files: [{"audio_bytes": ..., "name": ...} or {"volume_path": ...}, ...]
+        audio_format applies to every file (as for transcribe).
+
+        The chunks of all files share one vLLM work queue, so a batch of short
+        clips still keeps up to MAX_CONCURRENT_CHUNKS sequences in flight.
+        Returns per-file results (input order, same fields as transcribe) plus
+        batch totals.
+        """
+        return self.pipeline.transcribe_batch(
+            files, language, vad=vad, chunk_seconds=chunk_seconds,
+            overlap_seconds=overlap_seconds, stitch=stitch, use_cache=use_cache,
+            timings=timings, audio_format=audio_format, sample_rate=sample_rate,
+        )
+
+    @modal.method()
+    def run_job(self, job_id: str, audio_bytes: bytes, language: str = "pt",
+                volume_path: str = "", options: dict | None = None) -> dict | None:
+        """Worker half of a submitted job: transcribe with progress in jobs_dict.
+
+        options: transcribe() keyword arguments. Jobs are checkpointed, so a
+        failed or cancelled job submitted again resumes where it stopped.
+        Returns the result (also stored for web_job_result), None if cancelled.
+        """
+        records = self.pipeline.iter_transcribe(
+            audio_bytes, language, volume_path, checkpoint=True, **(options or {}),
+        )
+        return JobStore(jobs_dict).run(job_id, records)
 
     @modal.method()
     def health(self) -> dict:
         """Health check (gRPC)."""
         import torch
 
-        vllm_alive = hasattr(self, "vllm_proc") and self.vllm_proc.poll() is None
+        vllm = self.supervisor.status()
         return {
-            "status": "healthy" if vllm_alive else "degraded",
-            "vllm_alive": vllm_alive,
+            "status": "healthy" if vllm["state"] == "ready" else "degraded",
+            "vllm_alive": vllm["alive"],
+            "vllm": vllm,
             "gpu": torch.cuda.get_device_name(0) if torch.cuda.is_available() else None,
             "model": VLLM_MODEL,
             "mode": "http-snapshot",
+            "scheduler": self.pipeline.scheduler.stats(),
         }
 
     # --- Web endpoints (HTTP, callable from Laravel via curl/Guzzle) ---
 
     @modal.fastapi_endpoint(method="POST")
-    def web_transcribe(
+    async def web_transcribe(
         self,
         file: UploadFile = File(...),
         language: str = Form("pt"),
+        vad: bool = Form(True),
+        chunk_seconds: float = Form(CHUNK_SECONDS),
+        overlap_seconds: float = Form(OVERLAP_SECONDS),
+        stitch: str = Form(STITCH_MODE),
+        use_cache: bool = Form(True),
+        timings: bool = Form(True),
+        audio_format: str = Form("auto"),
+        sample_rate: int = Form(TARGET_SR),
+        checkpoint: bool = Form(False),
     ) -> dict:
         """Transcribe uploaded audio file. Returns JSON with text + metrics.
 
         Usage:
             curl -X POST https://<modal-url>/web_transcribe \
               -F "file=@audio.wav" -F "language=pt"
+
+        A client that already converted the audio to 16 kHz mono sends
+        audio_format=pcm_s16le|flac|opus and the decode fast path is used.
+        Raw mono PCM from a recorder is sent as is, with its rate:
+            curl -X POST https://<modal-url>/web_transcribe \
+              -F "file=@clip.raw" -F "audio_format=pcm_f32le" -F "sample_rate=48000"
+        """
+        return await self.pipeline.atranscribe(
+            await read_upload(file), language, vad=vad, chunk_seconds=chunk_seconds,
+            overlap_seconds=overlap_seconds, stitch=stitch, use_cache=use_cache,
+            timings=timings, audio_format=audio_format, sample_rate=sample_rate,
+            checkpoint=checkpoint,
+        )
+
+    @modal.fastapi_endpoint(method="POST")
+    async def web_transcribe_stream(
+        self,
+        file: UploadFile = File(...),
+        language: str = Form("pt"),
+        vad: bool = Form(True),
+        chunk_seconds: float = Form(CHUNK_SECONDS),
+        overlap_seconds: float = Form(OVERLAP_SECONDS),
+        stitch: str = Form(STITCH_MODE),
+        use_cache: bool = Form(True),
+        timings: bool = Form(True),
+        audio_format: str = Form("auto"),
+        sample_rate: int = Form(TARGET_SR),
+        format: str = Form("ndjson"),
+    ) -> StreamingResponse:
+        """Transcribe uploaded audio, streaming partial results as they finish.
+
+        Emits one JSON record per line (format=ndjson) or per SSE event
+        (format=sse):
+            {"type": "plan", ...}     -- right after decode: duration, chunks, spans
+            {"type": "chunk", ...}    -- one per chunk, in completion order
+            {"type": "summary", ...}  -- same fields as web_transcribe
+
+        A cached result is sent as the summary record alone.
+
+        Usage:
+            curl -N -X POST https://<modal-url>/web_transcribe_stream \
+              -F "file=@audio.wav" -F "language=pt"
+        """
+        return await self.pipeline.astream_response(
+            await read_upload(file), format, language, vad=vad,
+            chunk_seconds=chunk_seconds, overlap_seconds=overlap_seconds,
+            stitch=stitch, use_cache=use_cache, timings=timings,
+            audio_format=audio_format, sample_rate=sample_rate,
+        )
+
+    @modal.fastapi_endpoint(method="POST")
+    async def web_transcribe_batch(
+        self,
+        files: list[UploadFile] = File(...),
+        language: str = Form("pt"),
+        vad: bool = Form(True),
+        chunk_seconds: float = Form(CHUNK_SECONDS),
+        overlap_seconds: float = Form(OVERLAP_SECONDS),
+        stitch: str = Form(STITCH_MODE),
+        use_cache: bool = Form(True),
+        timings: bool = Form(True),
+        audio_format: str = Form("auto"),
+        sample_rate: int = Form(TARGET_SR),
+    ) -> dict:
+        """Transcribe several uploaded files in one request.
+
+        Chunks of all files are packed into one work queue. Returns
+        {"results": [...per file, in upload order...], "files", "failed", ...}.
+
+        Usage:
+            curl -X POST https://<modal-url>/web_transcribe_batch \
+              -F "files=@a.wav" -F "files=@b.m4a" -F "language=pt"
         """
-        audio_bytes = file.file.read()
-        return self._do_transcribe(audio_bytes, language)
+        items = [(f.filename or f"file_{i}", await read_upload(f))
+                 for i, f in enumerate(files)]
+        return await self.pipeline.atranscribe_batch(
+            items, language, vad=vad, chunk_seconds=chunk_seconds,
+            overlap_seconds=overlap_seconds, stitch=stitch, use_cache=use_cache,
+            timings=timings, audio_format=audio_format, sample_rate=sample_rate,
+        )
 
     @modal.fastapi_endpoint(method="GET")
     def web_health(self) -> dict:
         """Health check via HTTP GET."""
         import torch
 
-        vllm_alive = hasattr(self, "vllm_proc") and self.vllm_proc.poll() is None
+        vllm = self.supervisor.status()
         return {
-            "status": "healthy" if vllm_alive else "degraded",
-            "vllm_alive": vllm_alive,
+            "status": "healthy" if vllm["state"] == "ready" else "degraded",
+            "vllm_alive": vllm["alive"],
+            "vllm": vllm,
             "gpu": torch.cuda.get_device_name(0) if torch.cuda.is_available() else None,
             "model": VLLM_MODEL,
             "mode": "http-snapshot",
+            "scheduler": self.pipeline.scheduler.stats(),
         }
 
-    def _do_transcribe(self, audio_bytes: bytes, language: str = "pt") -> dict:
-        """Shared transcription logic for both gRPC and web endpoints."""
-        t0 = time.perf_counter()
 
-        # Check vLLM is alive
-        if self.vllm_proc.poll() is not None:
-            stderr_tail = ""
-            try:
-                with open("/tmp/vllm-stderr.log") as f:
-                    stderr_tail = f.read()[-2000:]
-            except Exception:
-                pass
-            raise RuntimeError(
-                f"vLLM process died (exit {self.vllm_proc.returncode}). "
-                f"Last stderr:\n{stderr_tail}"
-            )
+# ---------------------------------------------------------------------------
+# Submitted jobs: return at once, poll progress, fetch the result later
+# ---------------------------------------------------------------------------
 
-        # Chunk audio if needed
-        chunks_wav, audio_duration = _chunk_audio_bytes(audio_bytes)
-        num_chunks = len(chunks_wav)
-        self.logger.info("Audio: %.1fs, %d chunk(s)", audio_duration, num_chunks)
-
-        # Transcribe each chunk via internal vLLM HTTP
-        texts = []
-        t_infer = time.perf_counter()
-
-        for i, chunk_wav in enumerate(chunks_wav):
-            resp = requests.post(
-                f"http://localhost:{VLLM_PORT}/v1/audio/transcriptions",
-                files={"file": (f"chunk_{i}.wav", chunk_wav, "audio/wav")},
-                data={
-                    "model": VLLM_MODEL,
-                    "language": language,
-                    "temperature": "0",
-                },
-                timeout=300,
-            )
-            resp.raise_for_status()
-            result = resp.json()
-            text = result.get("text", "").strip()
-            if text:
-                texts.append(text)
-
-        infer_time = time.perf_counter() - t_infer
-        full_text = " ".join(texts)
-        elapsed = time.perf_counter() - t0
-
-        self.logger.info(
-            "Transcribed %.1fs audio in %.1fs (infer %.1fs, RTF %.3f)",
-            audio_duration, elapsed, infer_time,
-            elapsed / audio_duration if audio_duration > 0 else 0,
+def _jobs() -> "JobStore":
+    """jobs_dict as a JobStore that notices run_job workers that died."""
+    return JobStore(jobs_dict, check_call=function_call_error)
+
+
+def submit_job(audio_bytes: bytes, language: str = "pt", volume_path: str = "",
+               options: dict | None = None, request: dict | None = None) -> str:
+    """Register a job in jobs_dict and spawn WhisperHTTP.run_job; returns the job id."""
+    options = options or {}
+    return submit(
+        _jobs(),
+        lambda job_id: WhisperHTTP().run_job.spawn(
+            job_id, audio_bytes, language, volume_path, options,
+        ),
+        {"language": language, "volume_path": volume_path, **options, **(request or {})},
+    )
+
+
+@app.function(image=whisper_image, volumes={AUDIO_VOLUME_PATH: audio_volume},
+              timeout=5 * MINUTES)
+@modal.concurrent(max_inputs=32)
+@modal.fastapi_endpoint(method="POST")
+async def web_submit(
+    file: UploadFile = File(...),
+    language: str = Form("pt"),
+    vad: bool = Form(True),
+    chunk_seconds: float = Form(CHUNK_SECONDS),
+    overlap_seconds: float = Form(OVERLAP_SECONDS),
+    stitch: str = Form(STITCH_MODE),
+    use_cache: bool = Form(True),
+    audio_format: str = Form("auto"),
+    sample_rate: int = Form(TARGET_SR),
+) -> dict:
+    """Queue a transcription and return at once with its job id.
+
+    Usage:
+        curl -X POST https://<modal-url>/web_submit -F "file=@audio.wav" -F "language=pt"
+        -> {"job_id": "...", "state": "queued"}
+
+    Then poll web_job_status?job_id=... (chunks_done / chunks_planned /
+    eta_s) and fetch web_job_result?job_id=... once state is "done";
+    web_job_cancel stops the job. Uploads of VOLUME_MIN_BYTES or more are
+    stored on the audio-uploads volume and streamed from there.
+    """
+    import asyncio
+
+    audio_bytes = await read_upload(file)
+    size = len(audio_bytes)
+    volume_path = ""
+    if volume_upload.choose_transport(size) == "volume":
+        volume_path = await asyncio.to_thread(
+            volume_upload.store, AUDIO_VOLUME_PATH, audio_bytes,
+            os.path.splitext(file.filename or "")[1], audio_volume,
         )
+        audio_bytes = b""
+    options = {
+        "vad": vad, "chunk_seconds": chunk_seconds, "overlap_seconds": overlap_seconds,
+        "stitch": stitch, "use_cache": use_cache, "audio_format": audio_format,
+        "sample_rate": sample_rate,
+    }
+    job_id = await asyncio.to_thread(
+        submit_job, audio_bytes, language, volume_path, options,
+        {"filename": file.filename, "bytes_in": size},
+    )
+    return {"job_id": job_id, "state": "queued"}
+
+
+@app.function(image=whisper_image)
+@modal.concurrent(max_inputs=100)
+@modal.fastapi_endpoint(method="GET")
+def web_job_status(job_id: str):
+    """Progress of a submitted job: state, chunks_done / chunks_planned, eta_s, elapsed_s."""
+    status = _jobs().status(job_id)
+    if status is None:
+        return Response(content="Unknown job", status_code=404, media_type="text/plain")
+    return status
+
+
+@app.function(image=whisper_image)
+@modal.concurrent(max_inputs=100)
+@modal.fastapi_endpoint(method="GET")
+def web_job_result(job_id: str):
+    """Result of a finished job (same fields as web_transcribe).
+
+    202 with the job's status while it is queued or running, 404 for an
+    unknown job, 409 with the status if it failed or was cancelled.
+    """
+    jobs = _jobs()
+    result = jobs.result(job_id)
+    if result is not None:
+        return result
+    status = jobs.status(job_id)
+    if status is None:
+        return Response(content="Unknown job", status_code=404, media_type="text/plain")
+    return JSONResponse(status, status_code=409 if status["state"] in ("failed", "cancelled") else 202)
 
-        return {
-            "text": full_text,
-            "language": language,
-            "duration_audio_s": round(audio_duration, 1),
-            "inference_s": round(infer_time, 2),
-            "total_s": round(elapsed, 2),
-            "rtf": round(elapsed / audio_duration, 3) if audio_duration > 0 else 0,
-            "chunks": num_chunks,
-            "mode": "http-snapshot",
-        }
+
+@app.function(image=whisper_image)
+@modal.fastapi_endpoint(method="POST")
+def web_job_cancel(job_id: str) -> dict:
+    """Ask a job to stop; chunks already in flight finish, and it stays resumable."""
+    return {"job_id": job_id, "cancelled": _jobs().cancel(job_id)}
+
+
+# ---------------------------------------------------------------------------
+# Map-reduce over containers for very long recordings
+# ---------------------------------------------------------------------------
+
+SEGMENT_RETRIES = 1
+# --resumable: each call stops taking chunks well before the 10-minute timeout
+RESUME_BUDGET_S = 8 * MINUTES
+RESUME_RETRIES = 3
+
+
+@app.function(
+    image=whisper_image,
+    cpu=4,
+    memory=4096,
+    timeout=60 * MINUTES,
+    volumes={AUDIO_VOLUME_PATH: audio_volume},
+)
+def transcribe_long(volume_path: str, language: str = "pt",
+                    segment_seconds: float = SEGMENT_SECONDS, vad: bool = True,
+                    chunk_seconds: float = CHUNK_SECONDS,
+                    overlap_seconds: float = OVERLAP_SECONDS,
+                    stitch: str = STITCH_MODE, use_cache: bool = True,
+                    audio_format: str = "auto", sample_rate: int = TARGET_SR) -> dict:
+    """Transcribe one long volume recording on several GPU containers at once.
+
+    The file is decoded and VAD-planned here (CPU), split into segments of
+    about segment_seconds at pauses, and every segment is spawned as its own
+    WhisperHTTP.transcribe call. WhisperHTTP takes up to MAX_CONCURRENT_INPUTS
+    requests per container; segments are sent with one input per container,
+    since each one already keeps --max-num-seqs chunks in flight. A failed
+    segment is retried SEGMENT_RETRIES time(s) before the call fails; segments
+    are checkpointed, so a retry only redoes the chunks the failure lost.
+
+    Returns the stitched text plus per-segment chunks / total_s / wall_s,
+    "gpu_s" (sum of the segments' in-container time) and the split timings.
+    """
+    import logging
+    import shutil
+    import uuid
+    from concurrent.futures import ThreadPoolExecutor
+
+    logging.basicConfig(
+        level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s"
+    )
+    logger = logging.getLogger("whisper-http")
+    t0 = time.perf_counter()
+    path = volume_upload.resolve(AUDIO_VOLUME_PATH, volume_path, audio_volume)
+    job_dir = os.path.join(SEGMENTS_DIR, uuid.uuid4().hex[:16])
+    split = split_recording(
+        path, os.path.join(AUDIO_VOLUME_PATH, job_dir), segment_seconds, vad=vad,
+        chunk_seconds=chunk_seconds, overlap_seconds=overlap_seconds,
+        audio_format=audio_format, sample_rate=sample_rate,
+    )
+    audio_volume.commit()
+    logger.info("Split %.0fs into %d segment(s) in %.1fs", split["duration_s"],
+                len(split["segments"]), time.perf_counter() - t0)
+
+    service = WhisperHTTP.with_concurrency(max_inputs=1)()
+
+    def run(segment: dict) -> tuple[dict, float]:
+        t_spawn = time.perf_counter()
+        for attempt in range(SEGMENT_RETRIES + 1):
+            call = service.transcribe.spawn(
+                b"", language, volume_path=os.path.join(job_dir, os.path.basename(segment["path"])),
+                vad=vad, chunk_seconds=chunk_seconds, overlap_seconds=overlap_seconds,
+                stitch=stitch, use_cache=use_cache, stream_decode=False, timings=False,
+                audio_format="pcm_s16le", checkpoint=True,
+            )
+            try:
+                return call.get(), time.perf_counter() - t_spawn
+            except Exception as e:
+                if attempt == SEGMENT_RETRIES:
+                    raise RuntimeError(f"Segment {segment['index']} failed: {e}") from e
+                logger.warning("Segment %d failed (%s), retrying", segment["index"], e)
+
+    try:
+        with ThreadPoolExecutor(max_workers=max(1, len(split["segments"]))) as pool:
+            done = list(pool.map(run, split["segments"]))
+    finally:
+        shutil.rmtree(os.path.join(AUDIO_VOLUME_PATH, job_dir), ignore_errors=True)
+        audio_volume.commit()
+
+    result = merge_segments(split, [r for r, _ in done], [wall for _, wall in done])
+    elapsed = time.perf_counter() - t0
+    result.update(
+        language=language,
+        total_s=round(elapsed, 2),
+        rtf=round(elapsed / split["duration_s"], 4) if split["duration_s"] > 0 else 0,
+        split_timings={k: round(v, 3) if isinstance(v, float) else v
+                       for k, v in split["timings"].items()},
+        source="volume-segments",
+        mode="http-snapshot-mapreduce",
+    )
+    logger.info("Transcribed %ss in %.1fs (%d segments, %s GPU-s)",
+                result["duration_audio_s"], elapsed, len(done), result["gpu_s"])
+    return result
 
 
 # ---------------------------------------------------------------------------
@@ -393,37 +692,170 @@ class WhisperHTTP:
 
 if __name__ == "__main__":
     import argparse
-    import hashlib
+
+    import volume_upload
+    from transcription_jobs import FINAL_STATES, JobStore, function_call_error, submit
+
+    JOB_POLL_S = 2
 
     parser = argparse.ArgumentParser(description="Call deployed Whisper HTTP service")
-    parser.add_argument("--audio", required=True, help="Path to audio file")
+    parser.add_argument("--audio", required=True, nargs="+",
+                        help="Path to audio file (several = one batch call)")
     parser.add_argument("--language", default="pt", help="Language code")
     parser.add_argument("--use-volume", action="store_true",
-                        help="Upload audio to Modal Volume first (recommended for large files)")
+                        help="Always go through the Modal Volume (same as --transport volume)")
+    parser.add_argument("--transport", choices=["auto", "bytes", "volume"], default="auto",
+                        help="auto: files >= 16MB via the volume, smaller ones as bytes")
+    parser.add_argument("--transcode", choices=["none", "flac", "opus", "pcm_s16le"],
+                        default="none",
+                        help="Convert to 16kHz mono locally before sending (server skips "
+                             "decode/resample; needs numpy, soundfile, soxr)")
+    parser.add_argument("--long", action="store_true",
+                        help="Split the recording over several containers (transcribe_long; "
+                             "always via the volume)")
+    parser.add_argument("--resumable", action="store_true",
+                        help="Checkpoint chunks and continue over several calls (recordings "
+                             "longer than one call's timeout; survives failed calls)")
+    parser.add_argument("--submit", action="store_true",
+                        help="Submit as a job and poll its progress (Ctrl-C cancels it)")
     parser.add_argument("--debug", action="store_true", help="Show raw container logs")
     args = parser.parse_args()
+    if args.use_volume or args.long:
+        args.transport = "volume"
 
     if args.debug:
         modal.enable_output()
 
-    t0 = time.time()
-    print(f"Reading {args.audio}...")
-    with open(args.audio, "rb") as f:
-        audio_bytes = f.read()
-    print(f"  {len(audio_bytes) / 1e6:.1f}MB")
+    TRANSCODE_EXT = {"flac": ".flac", "opus": ".opus", "pcm_s16le": ".pcm"}
+
+    def transcode(path: str) -> bytes | None:
+        """The --transcode payload for path, or None to send the file as is."""
+        if args.transcode == "none":
+            return None
+        import audio_io
+
+        t = time.time()
+        data = audio_io.transcode_file(path, args.transcode)
+        print(f"Transcoded {os.path.basename(path)} to 16kHz mono {args.transcode}: "
+              f"{os.path.getsize(path) / 1e6:.1f}MB -> {len(data) / 1e6:.1f}MB "
+              f"in {time.time() - t:.1f}s")
+        return data
+
+    audio_format = "auto" if args.transcode == "none" else args.transcode
+
+    if len(args.audio) > 1:
+        t0 = time.time()
+        files = []
+        vol = modal.Volume.from_name(volume_upload.VOLUME_NAME, create_if_missing=True)
+        sent = 0
+        for path in args.audio:
+            name = os.path.basename(path)
+            data = transcode(path)
+            size = os.path.getsize(path) if data is None else len(data)
+            sent += size
+            if volume_upload.choose_transport(size, args.transport) == "volume":
+                print(f"Uploading {name}...")
+                if data is None:
+                    volume_path = volume_upload.upload(vol, path)
+                else:
+                    volume_path = volume_upload.upload_bytes(
+                        vol, data, TRANSCODE_EXT[args.transcode],
+                    )
+                files.append({"volume_path": volume_path, "name": name})
+            else:
+                if data is None:
+                    with open(path, "rb") as f:
+                        data = f.read()
+                files.append({"audio_bytes": data, "name": name})
+        print(f"Batch: {len(files)} files, {sent / 1e6:.1f}MB")
+
+        print("PROGRESS:status:loading_vllm", flush=True)
+        service = modal.Cls.from_name(APP_NAME, "WhisperHTTP")()
+        print("PROGRESS:status:transcribing", flush=True)
+        result = service.transcribe_batch.remote(files, args.language,
+                                                 audio_format=audio_format)
+        wall = time.time() - t0
+
+        print(f"RESULT:" + json.dumps(result), flush=True)
+        for r in result["results"]:
+            status = r.get("error") or f"{r['duration_audio_s']}s, cached={r['cached']}"
+            print(f"\n[{r['name']}] {status}\n{r.get('text', '')}")
+        print(f"\nWall time:      {wall:.1f}s")
+        print(f"Inference:      {result['inference_s']}s")
+        print(f"Audio duration: {result['duration_audio_s']}s")
+        print(f"Chunks:         {result['chunks']} (max in flight {result['max_in_flight']})")
+        print(f"Failed:         {result['failed']}")
+        raise SystemExit(0)
+    args.audio = args.audio[0]
 
+    t0 = time.time()
+    print(f"Reading {args.audio} ({os.path.getsize(args.audio) / 1e6:.1f}MB)...")
+    data = transcode(args.audio)
+    size = os.path.getsize(args.audio) if data is None else len(data)
     volume_path = ""
-    if args.use_volume:
-        print("Uploading to Modal Volume...")
-        t_upload = time.time()
-        vol = modal.Volume.from_name("audio-uploads", create_if_missing=True)
-        file_hash = hashlib.sha256(audio_bytes).hexdigest()[:12]
-        volume_name = f"{file_hash}_{os.path.basename(args.audio)}"
-        with vol.batch_upload(force=True) as batch:
-            batch.put_file(args.audio, f"/{volume_name}")
-        print(f"  Uploaded in {time.time() - t_upload:.1f}s")
-        volume_path = volume_name
+    if volume_upload.choose_transport(size, args.transport) == "volume":
+        print("Uploading to Modal Volume (content-addressed)...")
+        vol = modal.Volume.from_name(volume_upload.VOLUME_NAME, create_if_missing=True)
+        if data is None:
+            volume_path = volume_upload.upload(vol, args.audio)
+        else:
+            volume_path = volume_upload.upload_bytes(vol, data, TRANSCODE_EXT[args.transcode])
         audio_bytes = b""  # Don't send bytes via gRPC
+    elif data is None:
+        with open(args.audio, "rb") as f:
+            audio_bytes = f.read()
+    else:
+        audio_bytes = data
+
+    if args.long:
+        print("PROGRESS:status:transcribing", flush=True)
+        print("Splitting over containers...")
+        transcribe_long_fn = modal.Function.from_name(APP_NAME, "transcribe_long")
+        result = transcribe_long_fn.remote(volume_path, args.language, audio_format=audio_format)
+        wall = time.time() - t0
+
+        print(f"RESULT:" + json.dumps(result), flush=True)
+        for seg in result["segments"]:
+            print(f"  segment {seg['index']}: {seg['start_s']:.0f}-{seg['end_s']:.0f}s, "
+                  f"{seg['chunks']} chunk(s), {seg['total_s']}s on GPU, {seg['wall_s']}s wall")
+        print(f"\nWall time:      {wall:.1f}s")
+        print(f"Audio duration: {result['duration_audio_s']}s")
+        print(f"GPU-seconds:    {result['gpu_s']}")
+        print(f"\nTexto:\n{result['text']}")
+        raise SystemExit(0)
+
+    if args.submit:
+        jobs = JobStore(modal.Dict.from_name("whisper-jobs"), check_call=function_call_error)
+        run_job = modal.Cls.from_name(APP_NAME, "WhisperHTTP")().run_job
+        options = {"audio_format": audio_format}
+        job_id = submit(jobs, lambda job_id: run_job.spawn(
+            job_id, audio_bytes, args.language, volume_path, options,
+        ), {"language": args.language, "volume_path": volume_path, **options})
+        print(f"Job {job_id} submitted")
+        print("PROGRESS:status:queued", flush=True)
+        try:
+            while (status := jobs.status(job_id))["state"] not in FINAL_STATES:
+                if status["state"] == "running":
+                    planned = status["chunks_planned"] or "?"
+                    print(f"PROGRESS:chunks:{status['chunks_done']}/{planned}", flush=True)
+                    if status["eta_s"] is not None:
+                        print(f"PROGRESS:eta:{status['eta_s']}", flush=True)
+                time.sleep(JOB_POLL_S)
+        except KeyboardInterrupt:
+            jobs.cancel(job_id)
+            print(f"\nCancel requested for job {job_id}")
+            raise SystemExit(130)
+        if status["state"] != "done":
+            print(f"ERROR:job {status['state']}: {status['error'] or ''}", flush=True)
+            raise SystemExit(1)
+        result = jobs.result(job_id)
+        wall = time.time() - t0
+        print(f"RESULT:" + json.dumps(result), flush=True)
+        print(f"\nWall time:      {wall:.1f}s")
+        print(f"Audio duration: {result['duration_audio_s']}s")
+        print(f"Chunks:         {result['chunks']}")
+        print(f"\nTexto:\n{result['text']}")
+        raise SystemExit(0)
 
     print("PROGRESS:status:loading_vllm", flush=True)
     print("Connecting to deployed service...")
@@ -432,7 +864,27 @@ if __name__ == "__main__":
 
     print("PROGRESS:status:transcribing", flush=True)
     print("Transcribing...")
-    result = service.transcribe.remote(audio_bytes, args.language, volume_path=volume_path)
+    if not args.resumable:
+        result = service.transcribe.remote(audio_bytes, args.language, volume_path=volume_path,
+                                           audio_format=audio_format)
+    else:
+        failures = 0
+        while True:
+            try:
+                result = service.transcribe.remote(
+                    audio_bytes, args.language, volume_path=volume_path,
+                    audio_format=audio_format, checkpoint=True, time_budget_s=RESUME_BUDGET_S,
+                )
+            except Exception as e:
+                failures += 1
+                if failures > RESUME_RETRIES:
+                    raise
+                print(f"Call failed ({e}), resuming from checkpoint...", flush=True)
+                continue
+            if result.get("complete") is not False:
+                break
+            planned = result["chunks_planned"] or "?"
+            print(f"PROGRESS:chunks:{result['chunks_done']}/{planned}", flush=True)
     wall = time.time() - t0
 
     print(f"RESULT:" + json.dumps(result), flush=True)
@@ -442,6 +894,7 @@ if __name__ == "__main__":
     print(f"Audio duration: {result['duration_audio_s']}s")
     print(f"RTF:            {result['rtf']}")
     print(f"Chunks:         {result['chunks']}")
+    print(f"Skipped:        {result['skipped_s']}s (non-speech)")
     print(f"Source:         {result['source']}")
     print(f"Mode:           {result['mode']}")
     print(f"\nTexto:\n{result['text']}")
@@ -8,6 +8,13 @@ Pattern:
     1. @modal.enter(snap=True) -- start vllm serve, warm up, sleep. Snapshot taken after.
     2. @modal.enter(snap=False) -- wake vLLM, ready to serve.
 
+Requests go through the same WhisperPipeline (whisper_service.py) as
+modal_whisper_http.py: VAD-planned <=30s chunks sent as binary multipart WAV
+to /v1/audio/transcriptions, concurrently, then stitched -- and the same
+transcribe / transcribe_batch result schema. What differs is the vLLM
+configuration (fp8 KV cache here), so the two can be benchmarked against
+each other on equal terms (bench_whisper_services.py).
+
 Workflow:
     1. Deploy:  modal deploy scripts/modal_whisper_vllm.py
     2. Test:    python3 scripts/modal_whisper_vllm.py --audio docs/Refaudio.wav
@@ -19,13 +26,13 @@ GPU: L4 (24GB). Whisper large-v3 FP16 = ~3GB weights.
 
 import json
 import os
-import socket
-import subprocess
-import tempfile
 import time
 
 import modal
 
+# Argument/Form defaults: no dependencies, so the local client runs without numpy
+from whisper_defaults import CHUNK_SECONDS, OVERLAP_SECONDS, STITCH_MODE, TARGET_SR
+
 APP_NAME = "whisper-vllm"
 app = modal.App(APP_NAME, tags={"project": "elco-machina", "model": "whisper", "engine": "vllm"})
 
@@ -34,6 +41,9 @@ MINUTES = 60
 VLLM_PORT = 8000
 VLLM_MODEL = "openai/whisper-large-v3"
 MODEL_CACHE = "/models"
+# Requests one container serves at once (in worker threads); their chunks take
+# turns at the --max-num-seqs vLLM slots (pipeline.scheduler)
+MAX_CONCURRENT_INPUTS = 16
 
 whisper_image = (
     modal.Image.from_registry(
@@ -44,8 +54,9 @@ whisper_image = (
     .uv_pip_install(
         "vllm>=0.7.3",
         "huggingface-hub>=0.36.0",
-        "librosa",
+        "numpy",
         "soundfile",
+        "soxr",
         "requests",
     )
     .env({
@@ -57,78 +68,32 @@ whisper_image = (
         "TORCH_CPP_LOG_LEVEL": "FATAL",
         "HF_HUB_CACHE": MODEL_CACHE,
     })
+    .add_local_python_source(
+        "audio_io", "coldstart", "fair_scheduler", "http_pool", "transcript_cache",
+        "transcript_checkpoint", "vllm_supervisor", "volume_upload", "warmup",
+        "whisper_defaults", "whisper_pipeline", "whisper_service",
+    )
 )
 
 model_volume = modal.Volume.from_name("whisper-vllm-cache", create_if_missing=True)
 vllm_cache_vol = modal.Volume.from_name("vllm-cache", create_if_missing=True)
 audio_volume = modal.Volume.from_name("audio-uploads", create_if_missing=True)
 AUDIO_VOLUME_PATH = "/audio-uploads"
+results_cache_vol = modal.Volume.from_name("whisper-vllm-results-cache", create_if_missing=True)
+RESULTS_CACHE_PATH = "/results-cache"
+RESULTS_CACHE_MAX_BYTES = 2 * 1024**3
+RESULTS_CACHE_TTL_S = 30 * 24 * 3600
+coldstart_vol = modal.Volume.from_name("coldstart-timelines", create_if_missing=True)
+COLDSTART_PATH = "/coldstart-timelines"
 
 with whisper_image.imports():
-    import requests
-
-
-def _wait_ready(proc: subprocess.Popen, timeout: int = 5 * MINUTES) -> None:
-    deadline = time.time() + timeout
-    while time.time() < deadline:
-        try:
-            socket.create_connection(("localhost", VLLM_PORT), timeout=1).close()
-            return
-        except OSError:
-            if proc.poll() is not None:
-                raise RuntimeError(f"vLLM exited with {proc.returncode}")
-            time.sleep(1)
-    raise TimeoutError(f"vLLM not ready within {timeout}s")
-
-
-def _warmup() -> None:
-    """Warm-up with a dummy transcription request."""
-    import librosa
-    import numpy as np
-
-    # Generate 1s of silence as warm-up audio
-    sr = 16000
-    silence = np.zeros(sr, dtype=np.float32)
-
-    payload = {
-        "model": VLLM_MODEL,
-        "messages": [
-            {
-                "role": "user",
-                "content": [
-                    {
-                        "type": "input_audio",
-                        "input_audio": {
-                            "data": __import__("base64").b64encode(
-                                silence.tobytes()
-                            ).decode(),
-                            "format": "wav",
-                        },
-                    }
-                ],
-            }
-        ],
-        "max_tokens": 16,
-    }
-
-    for _ in range(2):
-        requests.post(
-            f"http://localhost:{VLLM_PORT}/v1/chat/completions",
-            json=payload,
-            timeout=300,
-        ).raise_for_status()
-
-
-def _sleep(level: int = 1) -> None:
-    requests.post(
-        f"http://localhost:{VLLM_PORT}/sleep?level={level}"
-    ).raise_for_status()
-
-
-def _wake_up() -> None:
-    requests.post(
-        f"http://localhost:{VLLM_PORT}/wake_up"
-    ).raise_for_status()
+    import volume_upload
+    from coldstart import ColdStartTimeline
+    from http_pool import PooledHTTPClient
+    from transcript_cache import TranscriptCache
+    from transcript_checkpoint import CHECKPOINT_DIR, CheckpointStore
+    from vllm_supervisor import VLLMSupervisor
+    from whisper_service import MAX_CONCURRENT_CHUNKS, WhisperPipeline
 
 
 @app.cls(
@@ -139,12 +104,15 @@ def _wake_up() -> None:
         MODEL_CACHE: model_volume,
         "/root/.cache/vllm": vllm_cache_vol,
         AUDIO_VOLUME_PATH: audio_volume,
+        RESULTS_CACHE_PATH: results_cache_vol,
+        COLDSTART_PATH: coldstart_vol,
     },
     enable_memory_snapshot=True,
     experimental_options={"enable_gpu_snapshot": True},
     secrets=[modal.Secret.from_name("huggingface-secret")],
     scaledown_window=2,
 )
+@modal.concurrent(max_inputs=MAX_CONCURRENT_INPUTS)
 class WhisperService:
     @modal.enter(snap=True)
     def start(self):
@@ -154,8 +122,15 @@ class WhisperService:
             level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s"
         )
         self.logger = logging.getLogger("whisper-vllm")
+        self.coldstart = ColdStartTimeline(APP_NAME, COLDSTART_PATH, self.logger)
+        self.cache = TranscriptCache(
+            RESULTS_CACHE_PATH, RESULTS_CACHE_MAX_BYTES, RESULTS_CACHE_TTL_S,
+        )
 
         self.logger.info("Starting vLLM for %s...", VLLM_MODEL)
+        self.vllm = PooledHTTPClient(
+            f"http://localhost:{VLLM_PORT}", pool_size=MAX_CONCURRENT_CHUNKS,
+        )
 
         cmd = [
             "vllm", "serve", VLLM_MODEL,
@@ -165,31 +140,48 @@ class WhisperService:
             "--gpu_memory_utilization", "0.90",
             "--enable-sleep-mode",
             "--max-model-len", "448",
-            "--max-num-seqs", "16",
+            "--max-num-seqs", str(MAX_CONCURRENT_CHUNKS),
             "--kv-cache-dtype", "fp8",
             "--uvicorn-log-level", "error",
             "--disable-uvicorn-access-log",
             "--disable-log-requests",
         ]
 
-        self._vllm_log = open("/tmp/vllm-stderr.log", "w")
-        self.vllm_proc = subprocess.Popen(cmd, stderr=self._vllm_log)
-
-        _wait_ready(self.vllm_proc)
+        self.supervisor = VLLMSupervisor(cmd, self.vllm, logger=self.logger, echo=True)
+        self.coldstart.mark("setup")
+        self.supervisor.start(timeout=5 * MINUTES)
+        self.coldstart.mark("vllm_ready")
         self.logger.info("vLLM ready on port %d", VLLM_PORT)
 
-        self.logger.info("Running warm-up...")
-        _warmup()
+        self.pipeline = WhisperPipeline(
+            self.vllm, self.supervisor, self.cache, self.coldstart, self.logger,
+            model=VLLM_MODEL, mode="vllm-snapshot",
+            resolve_volume_path=lambda path: volume_upload.resolve(
+                AUDIO_VOLUME_PATH, path, audio_volume,
+            ),
+            checkpoints=CheckpointStore(
+                os.path.join(RESULTS_CACHE_PATH, CHECKPOINT_DIR),
+                commit=results_cache_vol.commit, reload=results_cache_vol.reload,
+            ),
+        )
+
+        self.logger.info("Running warm-up profile...")
+        self.pipeline.run_warmup()
+        self.coldstart.mark("warmup")
         self.logger.info("Warm-up done")
 
         self.logger.info("Putting vLLM to sleep...")
-        _sleep()
+        self.supervisor.sleep()
+        # Pooled sockets do not survive snapshot restore
+        self.vllm.reset()
+        self.coldstart.mark("sleep")
         self.logger.info("vLLM sleeping -- snapshot point")
 
     @modal.enter(snap=False)
     def restore(self):
         import logging
 
+        self.coldstart.begin_restore()
         try:
             import torch.distributed as dist
             if dist.is_initialized():
@@ -204,115 +196,69 @@ class WhisperService:
             self.logger = logging.getLogger("whisper-vllm")
 
         self.logger.info("Waking vLLM...")
-        _wake_up()
-        _wait_ready(self.vllm_proc, timeout=MINUTES)
+        self.supervisor.wake_up(timeout=MINUTES)
+        self.coldstart.mark("wake")
         self.logger.info("vLLM awake on port %d", VLLM_PORT)
 
     @modal.exit()
     def stop(self):
-        if hasattr(self, "vllm_proc") and self.vllm_proc.poll() is None:
-            self.vllm_proc.terminate()
-            try:
-                self.vllm_proc.wait(timeout=10)
-            except subprocess.TimeoutExpired:
-                self.vllm_proc.kill()
-        if hasattr(self, "_vllm_log"):
-            self._vllm_log.close()
+        if hasattr(self, "supervisor"):
+            self.supervisor.stop()
 
     @modal.method()
     def transcribe(self, audio_bytes: bytes, language: str = "pt",
-                   volume_path: str = "") -> dict:
+                   volume_path: str = "", vad: bool = True,
+                   chunk_seconds: float = CHUNK_SECONDS,
+                   overlap_seconds: float = OVERLAP_SECONDS,
+                   stitch: str = STITCH_MODE, use_cache: bool = True,
+                   stream_decode: bool | None = None, timings: bool = True,
+                   audio_format: str = "auto",
+                   sample_rate: int = TARGET_SR, checkpoint: bool = False,
+                   time_budget_s: float | None = None) -> dict:
         """Transcribe audio via vLLM Whisper. Returns text + metrics.
 
-        Args:
-            audio_bytes: Raw audio bytes (used if volume_path is empty)
-            language: Language code (default: pt)
-            volume_path: If set, read audio from volume instead of bytes
+        Same arguments and result fields as WhisperHTTP.transcribe
+        (modal_whisper_http.py): audio longer than 30s is chunked, volume
+        files are read or streamed from the audio-uploads volume.
         """
-        import base64
-        import soundfile as sf
-        import io
-
-        t0 = time.perf_counter()
-
-        # Read from volume or from bytes
-        if volume_path:
-            full_path = os.path.join(AUDIO_VOLUME_PATH, volume_path)
-            self.logger.info("Reading audio from volume: %s", full_path)
-            with open(full_path, "rb") as f:
-                audio_bytes = f.read()
-
-        # Save to temp file to read with soundfile for duration
-        with tempfile.NamedTemporaryFile(suffix=".wav", delete=False) as f:
-            f.write(audio_bytes)
-            tmp_path = f.name
-
-        try:
-            info = sf.info(tmp_path)
-            audio_duration = info.duration
-
-            # Encode audio as base64 for vLLM
-            audio_b64 = base64.b64encode(audio_bytes).decode()
-
-            payload = {
-                "model": VLLM_MODEL,
-                "messages": [
-                    {
-                        "role": "user",
-                        "content": [
-                            {
-                                "type": "input_audio",
-                                "input_audio": {
-                                    "data": audio_b64,
-                                    "format": "wav",
-                                },
-                            }
-                        ],
-                    }
-                ],
-                "temperature": 0,
-                "top_p": 1.0,
-                "max_tokens": 448,
-            }
-
-            resp = requests.post(
-                f"http://localhost:{VLLM_PORT}/v1/chat/completions",
-                json=payload,
-                timeout=300,
-            )
-            resp.raise_for_status()
-            result = resp.json()
-
-            text = result["choices"][0]["message"]["content"].strip()
-            elapsed = time.perf_counter() - t0
-
-            self.logger.info(
-                "Transcribed %.1fs audio in %.1fs (RTF %.3f)",
-                audio_duration, elapsed, elapsed / audio_duration if audio_duration > 0 else 0,
-            )
+        return self.pipeline.transcribe(
+            audio_bytes, language, volume_path, vad=vad, chunk_seconds=chunk_seconds,
+            overlap_seconds=overlap_seconds, stitch=stitch, use_cache=use_cache,
+            stream_decode=stream_decode, timings=timings, audio_format=audio_format,
+            sample_rate=sample_rate, checkpoint=checkpoint, time_budget_s=time_budget_s,
+        )
 
-            return {
-                "text": text,
-                "language": language,
-                "duration_audio_s": round(audio_duration, 1),
-                "inference_s": round(elapsed, 2),
-                "rtf": round(elapsed / audio_duration, 3) if audio_duration > 0 else 0,
-                "source": "volume" if volume_path else "bytes",
-            }
-        finally:
-            os.unlink(tmp_path)
+    @modal.method()
+    def transcribe_batch(self, files: list[dict], language: str = "pt",
+                         vad: bool = True, chunk_seconds: float = CHUNK_SECONDS,
+                         overlap_seconds: float = OVERLAP_SECONDS,
+                         stitch: str = STITCH_MODE, use_cache: bool = True,
+                         timings: bool = True, audio_format: str = "auto",
+                         sample_rate: int = TARGET_SR) -> dict:
+        """Transcribe many files in one shared chunk queue (as WhisperHTTP.transcribe_batch).
+
+        files: [{"audio_bytes": ..., "name": ...} or {"volume_path": ...}, ...]
+        """
+        return self.pipeline.transcribe_batch(
+            files, language, vad=vad, chunk_seconds=chunk_seconds,
+            overlap_seconds=overlap_seconds, stitch=stitch, use_cache=use_cache,
+            timings=timings, audio_format=audio_format, sample_rate=sample_rate,
+        )
 
     @modal.method()
     def health(self) -> dict:
         """Health check."""
         import torch
 
-        vllm_alive = hasattr(self, "vllm_proc") and self.vllm_proc.poll() is None
+        vllm = self.supervisor.status()
         return {
-            "status": "healthy" if vllm_alive else "degraded",
-            "vllm_alive": vllm_alive,
+            "status": "healthy" if vllm["state"] == "ready" else "degraded",
+            "vllm_alive": vllm["alive"],
+            "vllm": vllm,
             "gpu": torch.cuda.get_device_name(0) if torch.cuda.is_available() else None,
             "model": VLLM_MODEL,
+            "mode": "vllm-snapshot",
+            "scheduler": self.pipeline.scheduler.stats(),
         }
 
 
@@ -322,33 +268,32 @@ class WhisperService:
 
 if __name__ == "__main__":
     import argparse
-    import hashlib
+
+    import volume_upload
 
     parser = argparse.ArgumentParser(description="Call deployed Whisper vLLM service")
     parser.add_argument("--audio", required=True, help="Path to audio file")
     parser.add_argument("--language", default="pt", help="Language code")
     parser.add_argument("--use-volume", action="store_true",
-                        help="Upload audio to Modal Volume first (recommended for large files)")
+                        help="Always go through the Modal Volume (same as --transport volume)")
+    parser.add_argument("--transport", choices=["auto", "bytes", "volume"], default="auto",
+                        help="auto: files >= 16MB via the volume, smaller ones as bytes")
     args = parser.parse_args()
+    if args.use_volume:
+        args.transport = "volume"
 
     t0 = time.time()
-    print(f"Reading {args.audio}...")
-    with open(args.audio, "rb") as f:
-        audio_bytes = f.read()
-    print(f"  {len(audio_bytes) / 1e6:.1f}MB")
+    print(f"Reading {args.audio} ({os.path.getsize(args.audio) / 1e6:.1f}MB)...")
 
     volume_path = ""
-    if args.use_volume:
-        print("Uploading to Modal Volume...")
-        t_upload = time.time()
-        vol = modal.Volume.from_name("audio-uploads", create_if_missing=True)
-        file_hash = hashlib.sha256(audio_bytes).hexdigest()[:12]
-        volume_name = f"{file_hash}_{os.path.basename(args.audio)}"
-        with vol.batch_upload(force=True) as batch:
-            batch.put_file(args.audio, f"/{volume_name}")
-        print(f"  Uploaded in {time.time() - t_upload:.1f}s")
-        volume_path = volume_name
+    if volume_upload.choose_transport(os.path.getsize(args.audio), args.transport) == "volume":
+        print("Uploading to Modal Volume (content-addressed)...")
+        vol = modal.Volume.from_name(volume_upload.VOLUME_NAME, create_if_missing=True)
+        volume_path = volume_upload.upload(vol, args.audio)
         audio_bytes = b""  # Don't send bytes via gRPC
+    else:
+        with open(args.audio, "rb") as f:
+            audio_bytes = f.read()
 
     print("Connecting to deployed service...")
     ServiceCls = modal.Cls.from_name(APP_NAME, "WhisperService")
@@ -362,5 +307,7 @@ if __name__ == "__main__":
     print(f"Inference:      {result['inference_s']}s")
     print(f"Audio duration: {result['duration_audio_s']}s")
     print(f"RTF:            {result['rtf']}")
+    print(f"Chunks:         {result['chunks']}")
+    print(f"Skipped:        {result['skipped_s']}s (non-speech)")
     print(f"Source:         {result['source']}")
     print(f"\nTexto:\n{result['text']}")
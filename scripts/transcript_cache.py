@@ -0,0 +1,154 @@
+"""Content-addressed cache for transcription results.
+
+Entries live as small JSON files on a Modal Volume, with an in-memory LRU in
+front so repeated hits inside one container never touch the filesystem.
+
+Keys are SHA-256 digests of the audio (raw upload bytes, or the decoded PCM
+so the same audio in another container format also hits) combined with every
+parameter that changes the output. Bump CACHE_VERSION whenever the pipeline
+changes what it produces for the same input.
+
+Eviction: entries older than ttl_s are dropped, then the least recently used
+(by mtime, refreshed on every hit) until the store fits max_bytes. It runs
+every EVICT_EVERY writes, in a background thread: the scan stats every
+entry, which no request should wait for. Only the cache's own shard
+directories (key[:2]) are scanned, so whatever else shares the volume --
+transcript_checkpoint.py's checkpoints -- is neither counted nor evicted.
+"""
+
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+
+CACHE_VERSION = 1
+EVICT_EVERY = 50
+
+
+def cache_key(digest: str, **params) -> str:
+    """Combine an audio digest with the output-affecting parameters."""
+    material = json.dumps(
+        {"v": CACHE_VERSION, "audio": digest, **params}, sort_keys=True
+    )
+    return hashlib.sha256(material.encode()).hexdigest()
+
+
+def _is_shard(name: str) -> bool:
+    """Whether a directory under the root is one of the cache's key[:2] shards."""
+    return len(name) == 2 and all(c in "0123456789abcdef" for c in name)
+
+
+class TranscriptCache:
+    def __init__(self, root: str, max_bytes: int, ttl_s: float,
+                 memory_entries: int = 256):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.ttl_s = ttl_s
+        self.memory_entries = memory_entries
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self._writes = 0
+        self._evicting = False
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.root, key[:2], f"{key}.json")
+
+    def get(self, key: str) -> dict | None:
+        with self._lock:
+            if key in self._memory:
+                self._memory.move_to_end(key)
+                return dict(self._memory[key])
+
+        path = self._path(key)
+        try:
+            if time.time() - os.path.getmtime(path) > self.ttl_s:
+                return None
+            with open(path) as f:
+                result = json.load(f)
+            os.utime(path)  # LRU recency
+        except (OSError, ValueError):
+            return None
+
+        self._remember(key, result)
+        return dict(result)
+
+    def put(self, result: dict, *keys: str) -> None:
+        """Store result under every given key (e.g. raw-bytes and PCM keys)."""
+        for key in keys:
+            self._remember(key, result)
+            path = self._path(key)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            # Write-then-rename so readers never see a partial entry
+            fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+            with os.fdopen(fd, "w") as f:
+                json.dump(result, f)
+            os.replace(tmp_path, path)
+
+        with self._lock:
+            self._writes += 1
+            due = self._writes % EVICT_EVERY == 0 and not self._evicting
+            if due:
+                self._evicting = True
+        if due:
+            threading.Thread(target=self._evict_in_background, name="cache-evict",
+                             daemon=True).start()
+
+    def _evict_in_background(self) -> None:
+        try:
+            self.evict()
+        except OSError:
+            pass  # next round retries
+        finally:
+            with self._lock:
+                self._evicting = False
+
+    def evict(self) -> int:
+        """Drop expired entries, then LRU ones until under max_bytes. Returns count removed."""
+        entries = []
+        for dirpath, dirnames, filenames in os.walk(self.root):
+            if dirpath == self.root:
+                dirnames[:] = [d for d in dirnames if _is_shard(d)]
+                continue
+            for name in filenames:
+                path = os.path.join(dirpath, name)
+                try:
+                    st = os.stat(path)
+                except OSError:
+                    continue
+                entries.append((st.st_mtime, st.st_size, path))
+
+        now = time.time()
+        removed = 0
+        total = 0
+        keep = []
+        for mtime, size, path in entries:
+            if now - mtime > self.ttl_s:
+                removed += self._remove(path)
+            else:
+                keep.append((mtime, size, path))
+                total += size
+
+        for mtime, size, path in sorted(keep):
+            if total <= self.max_bytes:
+                break
+            removed += self._remove(path)
+            total -= size
+        return removed
+
+    def _remember(self, key: str, result: dict) -> None:
+        with self._lock:
+            self._memory[key] = result
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.memory_entries:
+                self._memory.popitem(last=False)
+
+    @staticmethod
+    def _remove(path: str) -> int:
+        try:
+            os.unlink(path)
+            return 1
+        except OSError:
+            return 0
@@ -0,0 +1,166 @@
+"""Per-chunk checkpoints for resumable long transcriptions.
+
+A checkpointed job (transcribe(..., checkpoint=True)) writes every finished
+chunk result as a small JSON file under <root>/<job key>/, where the job key
+combines the audio digest, every output-affecting parameter and the chunk
+plan. When the same job runs again -- after a vLLM crash, a container
+timeout, a client retry, or because its time_budget_s ran out -- the stored
+chunks are reused and only the missing ones go to vLLM. Each stored chunk
+also records its span, and is only reused for a chunk with the same span.
+
+The services keep checkpoints on the results-cache volume, under
+CHECKPOINT_DIR, which TranscriptCache's eviction leaves alone: a job stopped
+by its time budget, cancelled or failed keeps its chunks however full the
+cache gets. A checkpoint is deleted as soon as its job's result is in the
+cache; those of jobs nobody came back for expire after ttl_s without a
+saved chunk (CheckpointStore.expire, run every EXPIRE_EVERY opens in a
+background thread).
+
+Saved chunks reach the volume through the commit callback (the volume's
+commit), at most every COMMIT_EVERY_S and always when the job stops, so a
+container that is killed mid-job loses at most that much work.
+"""
+
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+
+CHECKPOINT_DIR = "checkpoints"
+COMMIT_EVERY_S = 10
+CHECKPOINT_TTL_S = 7 * 24 * 3600
+EXPIRE_EVERY = 50
+
+
+class CheckpointStore:
+    def __init__(self, root: str, commit=None, reload=None,
+                 ttl_s: float = CHECKPOINT_TTL_S):
+        """commit: called to persist writes (e.g. modal.Volume.commit); None = no-op.
+        reload: called to see other containers' commits (modal.Volume.reload).
+        ttl_s: checkpoints with no chunk saved for this long are expired.
+        """
+        self.root = root
+        self.commit = commit
+        self.reload = reload
+        self.ttl_s = ttl_s
+        self._lock = threading.Lock()
+        self._opens = 0
+        self._expiring = False
+
+    def open(self, key: str) -> "ChunkCheckpoint":
+        path = os.path.join(self.root, key[:2], key)
+        if self.reload is not None and not os.path.isdir(path):
+            # The job may have been checkpointed by another container
+            try:
+                self.reload()
+            except Exception:
+                pass  # reload refuses while files are open; resume what is visible
+        with self._lock:
+            self._opens += 1
+            due = self._opens % EXPIRE_EVERY == 0 and not self._expiring
+            if due:
+                self._expiring = True
+        if due:
+            threading.Thread(target=self._expire_in_background, name="checkpoint-expire",
+                             daemon=True).start()
+        return ChunkCheckpoint(path, self.commit)
+
+    def expire(self) -> int:
+        """Delete checkpoints whose newest chunk is older than ttl_s. Returns count removed."""
+        now = time.time()
+        removed = 0
+        try:
+            shards = os.listdir(self.root)
+        except FileNotFoundError:
+            return 0
+        for shard in shards:
+            try:
+                keys = os.listdir(os.path.join(self.root, shard))
+            except OSError:
+                continue
+            for key in keys:
+                path = os.path.join(self.root, shard, key)
+                try:
+                    newest = max((e.stat().st_mtime for e in os.scandir(path)),
+                                 default=os.path.getmtime(path))
+                except OSError:
+                    continue
+                if now - newest > self.ttl_s:
+                    shutil.rmtree(path, ignore_errors=True)
+                    removed += 1
+        if removed and self.commit is not None:
+            self.commit()
+        return removed
+
+    def _expire_in_background(self) -> None:
+        try:
+            self.expire()
+        except Exception:
+            pass  # next round retries; a commit can fail while others write
+        finally:
+            with self._lock:
+                self._expiring = False
+
+
+class ChunkCheckpoint:
+    def __init__(self, path: str, commit=None):
+        self.path = path
+        self._commit = commit
+        self._last_commit = time.monotonic()
+        self._lock = threading.Lock()
+        self.done = self._load()  # index -> {"index", "span", "result"}
+
+    def _load(self) -> dict:
+        done = {}
+        try:
+            names = os.listdir(self.path)
+        except FileNotFoundError:
+            return done
+        for name in names:
+            if not name.endswith(".json"):
+                continue
+            try:
+                with open(os.path.join(self.path, name)) as f:
+                    entry = json.load(f)
+            except (OSError, ValueError):
+                continue
+            done[entry["index"]] = entry
+        return done
+
+    def get(self, index: int, span: tuple[float, float]) -> dict | None:
+        """The stored result of chunk index, if it was saved for this same span."""
+        entry = self.done.get(index)
+        if entry is None or entry["span"] != [round(t, 3) for t in span]:
+            return None
+        return entry["result"]
+
+    def save(self, index: int, span: tuple[float, float], result: dict) -> None:
+        entry = {"index": index, "span": [round(t, 3) for t in span], "result": result}
+        os.makedirs(self.path, exist_ok=True)
+        # Write-then-rename so a killed container never leaves a partial entry
+        fd, tmp_path = tempfile.mkstemp(dir=self.path, suffix=".tmp")
+        with os.fdopen(fd, "w") as f:
+            json.dump(entry, f)
+        os.replace(tmp_path, os.path.join(self.path, f"{index:06d}.json"))
+        self.done[index] = entry
+        self.commit(force=False)
+
+    def commit(self, force: bool = True) -> None:
+        """Persist saved chunks; unless forced, at most every COMMIT_EVERY_S."""
+        if self._commit is None:
+            return
+        with self._lock:
+            if not force and time.monotonic() - self._last_commit < COMMIT_EVERY_S:
+                return
+            self._last_commit = time.monotonic()
+        self._commit()
+
+    def clear(self) -> None:
+        """Delete the checkpoint (its job is done); a no-op if nothing was saved."""
+        if not self.done:
+            return
+        shutil.rmtree(self.path, ignore_errors=True)
+        self.done = {}
+        self.commit()
@@ -0,0 +1,271 @@
+"""Asynchronous transcription jobs: submit, poll progress, fetch the result.
+
+A synchronous transcribe call holds its caller (a PHP queue worker, an HTTP
+connection) for as long as the audio takes. A job instead is:
+
+    job_id = submit(store, spawn, request)   # returns at once
+    store.status(job_id)   # {"state", "chunks_done", "chunks_planned", "eta_s", ...}
+    store.result(job_id)   # the transcribe result once state == "done"
+    store.cancel(job_id)   # the worker stops after the chunks in flight
+
+spawn starts the work elsewhere (WhisperHTTP.run_job.spawn in
+modal_whisper_http.py); that worker feeds the pipeline's record stream
+(plan, chunk, ..., summary) through JobStore.run, which keeps the job's
+progress in the store and checks for cancellation between records.
+
+The store is any dict-like mapping shared by submitter, worker and pollers:
+a modal.Dict in the services, a plain dict locally. Each job uses separate
+keys for its progress, worker call id, result and cancel flag, so the
+submitter, the worker and a canceller never overwrite each other's writes.
+
+A worker that dies (container lost, function timeout) never finishes its
+record; with check_call (function_call_error for modal.FunctionCall
+workers) status() notices and marks the job failed instead of leaving it
+"running" for good.
+
+ETA: wall seconds per second of speech measured on this job once a chunk
+has finished, before that the running average of finished jobs (RTF_KEY,
+starting at DEFAULT_RTF), times the speech still to transcribe. A streamed
+volume file has no chunk plan until it is fully decoded, so its
+chunks_planned and eta_s stay None until then. Chunks restored from a
+checkpoint count as done but not towards the measured rate: they cost no
+GPU time.
+
+Images that import this module need `.add_local_python_source("transcription_jobs")`.
+"""
+
+import time
+import uuid
+from typing import Callable, Iterator
+
+STATES = ("queued", "running", "done", "failed", "cancelled")
+FINAL_STATES = ("done", "failed", "cancelled")
+RTF_KEY = "_rtf"
+# Wall seconds per second of speech assumed before any job has finished
+DEFAULT_RTF = 0.05
+# Weight of the newest job in the running RTF average
+RTF_SMOOTHING = 0.2
+# Progress writes go to the store at most this often (the last one always)
+PROGRESS_EVERY_S = 1.0
+
+
+def new_job_id() -> str:
+    return uuid.uuid4().hex
+
+
+def function_call_error(call_id: str) -> str | None:
+    """check_call for modal.FunctionCall workers: None while the call runs, else why it ended."""
+    import modal
+
+    try:
+        modal.FunctionCall.from_id(call_id).get(timeout=0)
+    except modal.exception.FunctionTimeoutError as e:
+        return f"worker timed out: {e}"
+    except TimeoutError:
+        return None  # not finished yet
+    except Exception as e:
+        return f"worker died: {type(e).__name__}: {e}"
+    return "worker ended without finishing the job"
+
+
+def submit(store: "JobStore", spawn: Callable[[str], object], request: dict) -> str:
+    """Register a job and start it; returns the job id without waiting.
+
+    spawn(job_id) starts the worker and returns its handle (a
+    modal.FunctionCall, whose object_id is kept with the job).
+    """
+    job_id = new_job_id()
+    store.create(job_id, request)
+    call = spawn(job_id)
+    store.attach_call(job_id, getattr(call, "object_id", None))
+    return job_id
+
+
+class JobStore:
+    def __init__(self, mapping, check_call: Callable[[str], str | None] | None = None):
+        """mapping: modal.Dict (or a plain dict) shared by all job parties.
+        check_call: worker call id -> None while it runs, else why it ended
+        (function_call_error); None trusts the worker to finish every job.
+        """
+        self.d = mapping
+        self.check_call = check_call
+
+    # --- submitter / pollers ---
+
+    def create(self, job_id: str, request: dict) -> dict:
+        record = {
+            "job_id": job_id,
+            "state": "queued",
+            "submitted_at": time.time(),
+            "started_at": None,
+            "finished_at": None,
+            "request": request,
+            "chunks_done": 0,
+            "chunks_planned": None,
+            "duration_audio_s": None,
+            "speech_s": None,
+            "speech_done_s": 0.0,
+            "eta_s": None,
+            "error": None,
+        }
+        self.d[job_id] = record
+        return record
+
+    def attach_call(self, job_id: str, call_id: str | None) -> None:
+        # Its own key: the worker may already be writing the progress record
+        if call_id is not None:
+            self.d[f"{job_id}:call"] = call_id
+
+    def status(self, job_id: str) -> dict | None:
+        """The job's progress record, with elapsed_s and a fresh eta_s; None if unknown.
+
+        An unfinished job whose worker has ended (check_call) is marked failed.
+        """
+        record = self.d.get(job_id)
+        if record is None:
+            return None
+        call_id = self.d.get(f"{job_id}:call")
+        if record["state"] not in FINAL_STATES:
+            record = self._check_worker(job_id, call_id, record)
+        record = dict(record)
+        record["call_id"] = call_id
+        record["cancel_requested"] = bool(self.d.get(f"{job_id}:cancel", False))
+        now = time.time()
+        start = record["started_at"] or record["submitted_at"]
+        record["elapsed_s"] = round((record["finished_at"] or now) - start, 2)
+        if record["state"] == "queued" and record["speech_s"] is not None:
+            record["eta_s"] = round(self.rtf() * record["speech_s"], 1)
+        elif record["state"] == "running" and record["eta_s"] is not None:
+            # eta_s was computed at the last progress write
+            record["eta_s"] = round(max(0.0, record["eta_s"] - (now - record["updated_at"])), 1)
+        return record
+
+    def _check_worker(self, job_id: str, call_id: str | None, record: dict) -> dict:
+        if self.check_call is None or call_id is None:
+            return record
+        error = self.check_call(call_id)
+        if error is None:
+            return record
+        # The worker may have finished the record since it was read
+        record = self.d.get(job_id)
+        if record["state"] in FINAL_STATES:
+            return record
+        record["error"] = error
+        self._finish(record, "failed")
+        return record
+
+    def result(self, job_id: str) -> dict | None:
+        """The transcribe result of a finished job, None until then."""
+        return self.d.get(f"{job_id}:result")
+
+    def cancel(self, job_id: str) -> bool:
+        """Ask the job to stop; False if it is unknown or already finished."""
+        record = self.d.get(job_id)
+        if record is None or record["state"] in FINAL_STATES:
+            return False
+        self.d[f"{job_id}:cancel"] = True
+        return True
+
+    def rtf(self) -> float:
+        """Running average of wall seconds per second of speech over finished jobs."""
+        return self.d.get(RTF_KEY, DEFAULT_RTF)
+
+    # --- worker ---
+
+    def cancelled(self, job_id: str) -> bool:
+        return bool(self.d.get(f"{job_id}:cancel", False))
+
+    def run(self, job_id: str, records: Iterator[dict]) -> dict | None:
+        """Consume a transcription record stream, keeping the job's progress current.
+
+        Returns the summary (also stored as the job's result), or None when
+        the job was cancelled: the stream is closed, which stops handing out
+        chunks. A failure is recorded and re-raised.
+        """
+        record = self.d.get(job_id) or self.create(job_id, {})
+        if self.cancelled(job_id):
+            self._finish(record, "cancelled")
+            return None
+        record.update(state="running", started_at=time.time())
+        self._write(record)
+
+        progress = _Progress(record, self.rtf())
+        last_write = time.monotonic()
+        r = None
+        try:
+            for r in records:
+                if r["type"] == "summary":
+                    break
+                progress.absorb(r)
+                if time.monotonic() - last_write >= PROGRESS_EVERY_S:
+                    if self.cancelled(job_id):
+                        records.close()
+                        self._finish(record, "cancelled")
+                        return None
+                    self._write(record)
+                    last_write = time.monotonic()
+        except Exception as e:
+            record["error"] = f"{type(e).__name__}: {e}"
+            self._finish(record, "failed")
+            raise
+        if r is None or r["type"] != "summary":
+            record["error"] = "transcription ended without a result"
+            self._finish(record, "failed")
+            raise RuntimeError(f"Job {job_id}: {record['error']}")
+
+        summary = {k: v for k, v in r.items() if k != "type"}
+        progress.absorb_summary(summary)
+        self.d[f"{job_id}:result"] = summary
+        self._finish(record, "done")
+        transcribed_s = (record["speech_s"] or 0.0) - progress.restored_s
+        if transcribed_s > 0 and not summary.get("cached"):
+            measured = (record["finished_at"] - record["started_at"]) / transcribed_s
+            self.d[RTF_KEY] = (1 - RTF_SMOOTHING) * self.rtf() + RTF_SMOOTHING * measured
+        return summary
+
+    def _write(self, record: dict) -> None:
+        record["updated_at"] = time.time()
+        self.d[record["job_id"]] = record
+
+    def _finish(self, record: dict, state: str) -> None:
+        record.update(state=state, finished_at=time.time(), eta_s=0.0 if state == "done" else None)
+        self._write(record)
+
+
+class _Progress:
+    """Folds plan / chunk records into a job's progress record."""
+
+    def __init__(self, record: dict, prior_rtf: float):
+        self.record = record
+        self.prior_rtf = prior_rtf
+        self.t0 = time.monotonic()
+        self.restored_s = 0.0  # speech of chunks restored from a checkpoint
+
+    def absorb(self, r: dict) -> None:
+        record = self.record
+        if r["type"] == "plan":
+            record["chunks_planned"] = r["chunks"]
+            record["duration_audio_s"] = r["duration_audio_s"]
+            record["speech_s"] = round(sum(b - a for a, b in r["spans_s"]), 2)
+        elif r["type"] == "chunk":
+            record["chunks_done"] += 1
+            record["speech_done_s"] = round(record["speech_done_s"] + r["end_s"] - r["start_s"], 2)
+            if r.get("restored"):
+                self.restored_s += r["end_s"] - r["start_s"]
+        self._estimate()
+
+    def absorb_summary(self, summary: dict) -> None:
+        record = self.record
+        record["chunks_planned"] = record["chunks_done"] = summary["chunks"]
+        record["duration_audio_s"] = summary["duration_audio_s"]
+        if record["speech_s"] is None:
+            record["speech_s"] = record["speech_done_s"]
+
+    def _estimate(self) -> None:
+        record = self.record
+        if record["speech_s"] is None:
+            return
+        done = record["speech_done_s"]
+        transcribed = done - self.restored_s
+        rtf = (time.monotonic() - self.t0) / transcribed if transcribed > 0 else self.prior_rtf
+        record["eta_s"] = round(rtf * max(0.0, record["speech_s"] - done), 1)
@@ -0,0 +1,243 @@
+"""Supervisor for a `vllm serve` subprocess, shared by the vLLM-backed services.
+
+Replaces the per-service copies of Popen + TCP-connect polling + reading a
+stderr file:
+
+    - readiness is an HTTP probe of /health with exponential backoff;
+    - server output goes to a bounded in-memory ring buffer (log_tail());
+    - a watchdog thread notices when the server dies and restarts it in place,
+      so a crash costs a server start instead of a container cold start;
+    - every state change is logged with the time spent in the previous state
+      and kept in `transitions`.
+
+States:  stopped -> starting -> ready <-> sleeping (via waking)
+         any -> crashed -> starting (restart) ... -> failed (restart budget spent)
+
+Images that import this module need `.add_local_python_source("vllm_supervisor",
+"http_pool")` plus requests.
+"""
+
+import collections
+import subprocess
+import sys
+import threading
+import time
+
+import requests
+
+LOG_LINES = 2000
+MAX_RESTARTS = 3  # within RESTART_WINDOW_S; beyond that the server is left down
+RESTART_WINDOW_S = 10 * 60
+WATCH_INTERVAL_S = 1.0
+PROBE_INITIAL_S = 0.1
+PROBE_MAX_S = 2.0
+
+
+class VLLMSupervisor:
+    def __init__(self, cmd: list[str], client, name: str = "vLLM", logger=None,
+                 log_lines: int = LOG_LINES, max_restarts: int = MAX_RESTARTS,
+                 echo: bool = False):
+        """
+        Args:
+            cmd: The `vllm serve ...` command line.
+            client: PooledHTTPClient pointed at the server (probes, sleep, wake).
+            name: Label for log lines and errors.
+            logger: logging.Logger for state transitions (print if None).
+            log_lines: Server output lines kept in memory.
+            max_restarts: Automatic restarts allowed within RESTART_WINDOW_S.
+            echo: Also copy server output to this process's stderr.
+        """
+        self.cmd = cmd
+        self.client = client
+        self.name = name
+        self.logger = logger
+        self.max_restarts = max_restarts
+        self.echo = echo
+
+        self.proc = None
+        self.state = "stopped"
+        self.transitions = collections.deque(maxlen=100)
+        self.restarts = []  # wall-clock times of automatic restarts
+        self._log = collections.deque(maxlen=log_lines)
+        self._state_since = time.perf_counter()
+        self._lock = threading.RLock()
+        self._changed = threading.Condition(self._lock)
+        self._watchdog = None
+
+    # --- lifecycle ---------------------------------------------------------
+
+    def start(self, timeout: float = 300) -> None:
+        """Spawn the server and block until /health answers."""
+        with self._lock:
+            self._spawn()
+        self.wait_ready(timeout)
+        if self._watchdog is None:
+            self._watchdog = threading.Thread(
+                target=self._watch, name=f"{self.name}-watchdog", daemon=True,
+            )
+            self._watchdog.start()
+
+    def wait_ready(self, timeout: float = 300) -> None:
+        """Probe GET /health with backoff until it returns 200.
+
+        Raises RuntimeError (with the log tail) if the process exits first,
+        TimeoutError if it is not ready within timeout.
+        """
+        deadline = time.perf_counter() + timeout
+        delay = PROBE_INITIAL_S
+        while True:
+            proc = self.proc
+            if proc.poll() is not None:
+                self._set_state("crashed")
+                raise RuntimeError(
+                    f"{self.name} exited with {proc.returncode}.\n{self.log_tail()}"
+                )
+            try:
+                if self.client.get("/health", timeout=(1, 5)).status_code == 200:
+                    self._set_state("ready")
+                    return
+            except requests.RequestException:
+                pass
+            if time.perf_counter() + delay > deadline:
+                raise TimeoutError(f"{self.name} not ready within {timeout:.0f}s")
+            time.sleep(delay)
+            delay = min(delay * 1.5, PROBE_MAX_S)
+
+    def sleep(self, level: int = 1) -> None:
+        """Offload weights (sleep mode); the process keeps running."""
+        self.client.post(f"/sleep?level={level}").raise_for_status()
+        self._set_state("sleeping")
+
+    def wake_up(self, timeout: float = 60) -> None:
+        self._set_state("waking")
+        self.client.post("/wake_up").raise_for_status()
+        self.wait_ready(timeout)
+
+    def ensure_running(self, timeout: float = 300) -> None:
+        """Return once the server is ready, waiting out an in-place restart.
+
+        Raises RuntimeError when the server is down for good (restart budget
+        spent or stopped).
+        """
+        deadline = time.perf_counter() + timeout
+        with self._changed:
+            # A dead process still marked ready means the watchdog has not
+            # noticed yet; wait for it to take over
+            while self.state != "ready" or not self.alive:
+                if self.state in ("failed", "stopped"):
+                    raise RuntimeError(
+                        f"{self.name} is {self.state} (exit {self.proc and self.proc.returncode}). "
+                        f"Last output:\n{self.log_tail()}"
+                    )
+                if self.state == "sleeping":
+                    raise RuntimeError(f"{self.name} is asleep; call wake_up() first")
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0:
+                    raise TimeoutError(f"{self.name} not ready within {timeout:.0f}s ({self.state})")
+                self._changed.wait(min(remaining, WATCH_INTERVAL_S))
+
+    def stop(self, timeout: float = 10) -> None:
+        self._set_state("stopped")
+        proc = self.proc
+        if proc is not None and proc.poll() is None:
+            proc.terminate()
+            try:
+                proc.wait(timeout=timeout)
+            except subprocess.TimeoutExpired:
+                proc.kill()
+
+    # --- introspection -----------------------------------------------------
+
+    @property
+    def alive(self) -> bool:
+        return self.proc is not None and self.proc.poll() is None
+
+    def log_tail(self, lines: int = 50) -> str:
+        with self._lock:
+            return "".join(list(self._log)[-lines:])
+
+    def status(self) -> dict:
+        """State, restart count and recent transitions, for health endpoints."""
+        with self._lock:
+            return {
+                "state": self.state,
+                "alive": self.alive,
+                "pid": self.proc.pid if self.proc else None,
+                "restarts": len(self.restarts),
+                "state_for_s": round(time.perf_counter() - self._state_since, 1),
+                "transitions": list(self.transitions)[-10:],
+            }
+
+    # --- internals ---------------------------------------------------------
+
+    def _spawn(self) -> None:
+        self._set_state("starting")
+        self.proc = subprocess.Popen(
+            self.cmd, stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
+            text=True, errors="replace", bufsize=1,
+        )
+        threading.Thread(
+            target=self._pump, args=(self.proc,), name=f"{self.name}-log", daemon=True,
+        ).start()
+
+    def _pump(self, proc: subprocess.Popen) -> None:
+        for line in proc.stdout:
+            with self._lock:
+                self._log.append(line)
+            if self.echo:
+                sys.stderr.write(line)
+
+    def _watch(self) -> None:
+        while True:
+            time.sleep(WATCH_INTERVAL_S)
+            with self._lock:
+                if self.state == "stopped":
+                    return
+                if self.state == "failed" or self.proc.poll() is None:
+                    continue
+                self._set_state("crashed")
+                self._emit(f"{self.name} died (exit {self.proc.returncode}). "
+                           f"Last output:\n{self.log_tail(20)}", error=True)
+                now = time.time()
+                recent = [t for t in self.restarts if now - t < RESTART_WINDOW_S]
+                if len(recent) >= self.max_restarts:
+                    self._set_state("failed")
+                    continue
+                self.restarts.append(now)
+                self._spawn()
+            try:
+                self.wait_ready()
+                self._emit(f"{self.name} restarted in place "
+                           f"({len(self.restarts)} restart(s) so far)")
+            except (RuntimeError, TimeoutError) as e:
+                self._emit(f"{self.name} restart failed: {e}", error=True)
+                # Hung or dead again: the next pass restarts or gives up
+                if self.alive:
+                    self.proc.kill()
+                    self.proc.wait()
+
+    def _set_state(self, state: str) -> None:
+        with self._changed:
+            if state == self.state:
+                return
+            now = time.perf_counter()
+            transition = {
+                "from": self.state,
+                "to": state,
+                "after_s": round(now - self._state_since, 2),
+                "at": time.time(),
+            }
+            self.transitions.append(transition)
+            self._emit(f"{self.name}: {transition['from']} -> {state} "
+                       f"after {transition['after_s']:.2f}s")
+            self.state = state
+            self._state_since = now
+            self._changed.notify_all()
+
+    def _emit(self, message: str, error: bool = False) -> None:
+        if self.logger is None:
+            print(message, file=sys.stderr, flush=True)
+        elif error:
+            self.logger.error(message)
+        else:
+            self.logger.info(message)
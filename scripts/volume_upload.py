@@ -0,0 +1,335 @@
+#!/usr/bin/env python3
+"""Content-addressed uploads to the audio-uploads volume.
+
+Client side (the CLI `__main__` blocks, with a modal.Volume handle):
+
+    volume_path = volume_upload.upload(vol, "recording.wav")
+
+stores the file once under cas/<sha[:2]>/<sha256><ext>. The hash is streamed
+from disk and remembered locally by (path, size, mtime), so re-submitting
+an unchanged file neither re-hashes nor re-uploads it -- it costs one
+directory listing. Files of PART_THRESHOLD or more go up as PART_SIZE parts,
+PARALLEL_PARTS at a time, followed by a manifest; parts already on the
+volume are skipped, so an interrupted upload resumes where it stopped.
+choose_transport() picks raw bytes or the volume by size. upload_bytes() does
+the same for content already in memory (a client-side transcode).
+
+Server side (inside the container, volume mounted):
+
+    path = volume_upload.resolve(AUDIO_VOLUME_PATH, volume_path, audio_volume)
+
+returns a local path, reloading the volume if the file was uploaded after
+the container started, and joining a parted upload into the single file on
+first use (hash-checked). store() is upload_bytes() for a container that has
+the volume mounted (e.g. an upload received by a web endpoint).
+
+gc() (or `python3 scripts/volume_upload.py gc`) removes uploads not used for
+max_age_days, then least recently used ones until the volume fits max_bytes.
+
+Images that import this module need `.add_local_python_source("volume_upload")`.
+"""
+
+import hashlib
+import io
+import json
+import os
+import shutil
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+VOLUME_NAME = "audio-uploads"
+CAS_DIR = "cas"
+PART_SIZE = 64 * 1024**2
+PART_THRESHOLD = 256 * 1024**2
+PARALLEL_PARTS = 4
+MANIFEST_SUFFIX = ".manifest.json"
+USED_SUFFIX = ".used"
+# Smaller files travel as call arguments; larger ones via the volume
+VOLUME_MIN_BYTES = 16 * 1024**2
+# Refresh an upload's last-used marker at most this often
+TOUCH_INTERVAL_S = 24 * 3600
+GC_MAX_AGE_DAYS = 30
+GC_MAX_BYTES = 50 * 1024**3
+HASH_CACHE_PATH = os.path.expanduser("~/.cache/elco-machina/upload-hashes.json")
+
+
+# ---------------------------------------------------------------------------
+# Client side
+# ---------------------------------------------------------------------------
+
+def choose_transport(size: int, transport: str = "auto") -> str:
+    """"bytes" or "volume" for a payload of size bytes; "auto" decides by size."""
+    if transport != "auto":
+        return transport
+    return "volume" if size >= VOLUME_MIN_BYTES else "bytes"
+
+
+def file_sha256(path: str) -> str:
+    """Streamed sha256 of a file, cached by (absolute path, size, mtime)."""
+    st = os.stat(path)
+    key = f"{os.path.abspath(path)}:{st.st_size}:{st.st_mtime_ns}"
+    try:
+        with open(HASH_CACHE_PATH) as f:
+            cache = json.load(f)
+    except (OSError, ValueError):
+        cache = {}
+    if key in cache:
+        return cache[key]
+
+    with open(path, "rb") as f:
+        digest = hashlib.file_digest(f, "sha256").hexdigest()
+    cache[key] = digest
+    try:
+        os.makedirs(os.path.dirname(HASH_CACHE_PATH), exist_ok=True)
+        tmp = f"{HASH_CACHE_PATH}.{os.getpid()}.tmp"
+        with open(tmp, "w") as f:
+            json.dump(cache, f)
+        os.replace(tmp, HASH_CACHE_PATH)
+    except OSError:
+        pass
+    return digest
+
+
+def cas_path(digest: str, ext: str = "") -> str:
+    """Volume path (relative to the volume root) of a content-addressed file."""
+    return f"{CAS_DIR}/{digest[:2]}/{digest}{ext.lower()}"
+
+
+def upload(vol, path: str, log=print) -> str:
+    """Upload path to vol unless its content is already there.
+
+    Returns the volume path to pass as volume_path (the file itself, or the
+    manifest of a parted upload the server has not joined yet).
+    """
+    t0 = time.time()
+    digest = file_sha256(path)
+    size = os.path.getsize(path)
+    log(f"  sha256 {digest[:12]} ({size / 1e6:.1f}MB) in {time.time() - t0:.1f}s")
+    return _upload(vol, path, size, digest, os.path.splitext(path)[1], log)
+
+
+def upload_bytes(vol, data: bytes, ext: str, log=print) -> str:
+    """upload() for content held in memory; ext is the file extension to store it under."""
+    digest = hashlib.sha256(data).hexdigest()
+    log(f"  sha256 {digest[:12]} ({len(data) / 1e6:.1f}MB)")
+    return _upload(vol, data, len(data), digest, ext, log)
+
+
+def _upload(vol, source, size: int, digest: str, ext: str, log) -> str:
+    """source is a file path or the bytes themselves."""
+    target = cas_path(digest, ext)
+    entries = _listdir(vol, os.path.dirname(target))
+    if entries.get(target, {}).get("size") == size:
+        log("  Already on volume, upload skipped")
+        _touch(vol, target, entries)
+        return target
+    manifest = target + MANIFEST_SUFFIX
+    if manifest in entries:
+        log("  Already on volume (parts), upload skipped")
+        _touch(vol, target, entries)
+        return manifest
+
+    t_upload = time.time()
+    if size < PART_THRESHOLD:
+        with vol.batch_upload(force=True) as batch:
+            batch.put_file(source if isinstance(source, str) else io.BytesIO(source),
+                           "/" + target)
+        result = target
+    else:
+        _upload_parts(vol, source, target, size, digest, log)
+        result = manifest
+    log(f"  Uploaded {size / 1e6:.1f}MB in {time.time() - t_upload:.1f}s")
+    return result
+
+
+def _listdir(vol, directory: str, recursive: bool = False) -> dict:
+    """{relative path: {"size", "mtime"}} of the files under directory (none if missing)."""
+    from modal.exception import NotFoundError
+    from modal.volume import FileEntryType
+
+    try:
+        entries = vol.listdir(directory, recursive=recursive)
+    except NotFoundError:
+        return {}
+    return {
+        e.path.lstrip("/"): {"size": e.size, "mtime": e.mtime}
+        for e in entries if e.type == FileEntryType.FILE
+    }
+
+
+def _touch(vol, target: str, entries: dict) -> None:
+    """Refresh the last-used marker gc() sorts by (at most once per TOUCH_INTERVAL_S)."""
+    marker = target + USED_SUFFIX
+    if marker in entries and time.time() - entries[marker]["mtime"] < TOUCH_INTERVAL_S:
+        return
+    with vol.batch_upload(force=True) as batch:
+        batch.put_file(io.BytesIO(str(int(time.time())).encode()), "/" + marker)
+
+
+def _upload_parts(vol, source, target: str, size: int, digest: str, log) -> None:
+    parts_dir = target + ".parts"
+    present = _listdir(vol, parts_dir)
+    parts = []
+    for i, offset in enumerate(range(0, size, PART_SIZE)):
+        part_size = min(PART_SIZE, size - offset)
+        name = f"{parts_dir}/{i:05d}"
+        parts.append({"name": name, "offset": offset, "size": part_size,
+                      "done": present.get(name, {}).get("size") == part_size})
+    todo = [p for p in parts if not p["done"]]
+    log(f"  {len(parts)} part(s), {len(parts) - len(todo)} already uploaded")
+
+    def put(part: dict) -> None:
+        if isinstance(source, str):
+            with open(source, "rb") as f:
+                f.seek(part["offset"])
+                data = f.read(part["size"])
+        else:
+            data = source[part["offset"]:part["offset"] + part["size"]]
+        with vol.batch_upload(force=True) as batch:
+            batch.put_file(io.BytesIO(data), "/" + part["name"])
+        log(f"  part {part['name'].rsplit('/', 1)[1]} done")
+
+    with ThreadPoolExecutor(PARALLEL_PARTS) as pool:
+        list(pool.map(put, todo))
+
+    manifest = {
+        "sha256": digest,
+        "size": size,
+        "parts": [{"name": p["name"], "size": p["size"]} for p in parts],
+    }
+    # Written last: a manifest means every part is on the volume
+    with vol.batch_upload(force=True) as batch:
+        batch.put_file(io.BytesIO(json.dumps(manifest).encode()), "/" + target + MANIFEST_SUFFIX)
+
+
+def gc(vol, max_age_days: float = GC_MAX_AGE_DAYS, max_bytes: int = GC_MAX_BYTES,
+       dry_run: bool = False, log=print) -> dict:
+    """Delete uploads unused for max_age_days, then LRU ones down to max_bytes.
+
+    An upload's last use is its newest file (data, parts, manifest or the
+    .used marker upload() refreshes); files outside cas/ (older uploads) are
+    judged by their own mtime.
+    """
+    uploads = {}
+    for rel, entry in _listdir(vol, "/", recursive=True).items():
+        if rel.startswith(CAS_DIR + "/") and rel.count("/") >= 2:
+            # cas/ab/<sha><ext>[.parts/00000 | .manifest.json | .used]
+            name = rel.split("/")[2]
+            key = name.split(".")[0]
+            target = rel.split(".parts/")[0] + ".parts" if ".parts/" in rel else rel
+        else:
+            key = target = rel
+        item = uploads.setdefault(key, {"targets": set(), "size": 0, "used": 0})
+        item["targets"].add(target)
+        item["size"] += entry["size"]
+        item["used"] = max(item["used"], entry["mtime"])
+
+    now = time.time()
+    total = sum(u["size"] for u in uploads.values())
+    doomed = []
+    for item in sorted(uploads.values(), key=lambda u: u["used"]):
+        if now - item["used"] > max_age_days * 86400 or total > max_bytes:
+            doomed.append(item)
+            total -= item["size"]
+
+    for item in doomed:
+        for target in sorted(item["targets"]):
+            log(f"  {'would remove' if dry_run else 'remove'} {target}")
+            if not dry_run:
+                vol.remove_file("/" + target, recursive=target.endswith(".parts"))
+    freed = sum(u["size"] for u in doomed)
+    log(f"GC: {len(doomed)} of {len(uploads)} upload(s), {freed / 1e6:.1f}MB"
+        f"{' (dry run)' if dry_run else ''}; {total / 1e6:.1f}MB kept")
+    return {"uploads": len(uploads), "removed": len(doomed), "freed_bytes": freed,
+            "kept_bytes": total}
+
+
+# ---------------------------------------------------------------------------
+# Server side
+# ---------------------------------------------------------------------------
+
+def store(root: str, data: bytes, ext: str, volume=None) -> str:
+    """Write data to the mounted volume (content-addressed); returns its volume path."""
+    target = cas_path(hashlib.sha256(data).hexdigest(), ext)
+    path = os.path.join(root, target)
+    if os.path.exists(path) and os.path.getsize(path) == len(data):
+        return target
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = f"{path}.{uuid.uuid4().hex[:8]}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(data)
+    os.replace(tmp, path)
+    if volume is not None:
+        volume.commit()
+    return target
+
+
+def resolve(root: str, volume_path: str, volume=None) -> str:
+    """Local path of an upload on the mounted volume.
+
+    Reloads the volume when the file is not visible yet (uploaded after the
+    container started) and joins a parted upload on first use; the joined
+    file is committed, so later calls and clients find it directly.
+    """
+    path = os.path.join(root, volume_path.lstrip("/"))
+    if not os.path.exists(path) and volume is not None:
+        try:
+            volume.reload()
+        except Exception:
+            # Files held open by another request block a reload
+            pass
+    if not path.endswith(MANIFEST_SUFFIX):
+        return path
+
+    target = path[:-len(MANIFEST_SUFFIX)]
+    if not os.path.exists(path):
+        # Joined already, maybe by a concurrent request
+        return target
+    with open(path) as f:
+        manifest = json.load(f)
+
+    digest = hashlib.sha256()
+    tmp = f"{target}.{uuid.uuid4().hex[:8]}.tmp"
+    with open(tmp, "wb") as out:
+        for part in manifest["parts"]:
+            with open(os.path.join(root, part["name"]), "rb") as f:
+                while block := f.read(1 << 20):
+                    digest.update(block)
+                    out.write(block)
+    if digest.hexdigest() != manifest["sha256"]:
+        os.remove(tmp)
+        raise ValueError(f"Parted upload {volume_path} does not match its sha256")
+    os.replace(tmp, target)
+    shutil.rmtree(target + ".parts", ignore_errors=True)
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+    if volume is not None:
+        volume.commit()
+    return target
+
+
+if __name__ == "__main__":
+    import argparse
+
+    import modal
+
+    parser = argparse.ArgumentParser(description="Content-addressed audio-uploads volume")
+    sub = parser.add_subparsers(dest="command", required=True)
+    p_upload = sub.add_parser("upload", help="Upload files (skipped if already there)")
+    p_upload.add_argument("paths", nargs="+")
+    p_gc = sub.add_parser("gc", help="Remove old / least recently used uploads")
+    p_gc.add_argument("--max-age-days", type=float, default=GC_MAX_AGE_DAYS)
+    p_gc.add_argument("--max-gb", type=float, default=GC_MAX_BYTES / 1024**3)
+    p_gc.add_argument("--dry-run", action="store_true")
+    args = parser.parse_args()
+
+    vol = modal.Volume.from_name(VOLUME_NAME, create_if_missing=True)
+    if args.command == "upload":
+        for path in args.paths:
+            print(f"{path}:")
+            print(upload(vol, path))
+    else:
+        gc(vol, args.max_age_days, int(args.max_gb * 1024**3), args.dry_run)
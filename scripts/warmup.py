@@ -0,0 +1,122 @@
+"""Warm-up profiles, run in @modal.enter(snap=True) before vLLM is put to sleep.
+
+Whatever the first real request would otherwise pay -- lazy module imports,
+lazily created HTTP clients, vLLM's first passes at each shape and batch
+size -- is paid here instead, so the snapshot captures a warm process. A
+profile lists what to send: speech-like audio at realistic lengths, rates
+and formats (or realistic texts), the batch width production runs at, and
+the modules the request path imports lazily. The services push the corpus
+through their own request code, so it is the real path that gets warm.
+
+Pure CPU (numpy, soundfile); also used by bench_whisper_pipeline.py.
+
+Images that import this module need `.add_local_python_source("warmup")`.
+"""
+
+import importlib
+import io
+import time
+
+import numpy as np
+
+WHISPER_WARMUP = {
+    # (seconds, sample rate, channels, format): the 16k mono WAV fast path, a
+    # stereo 44.1k FLAC through soundfile + soxr, one full 30s window, and a
+    # recording long enough for several VAD-placed cuts
+    "clips": [
+        (1.5, 16000, 1, "wav"),
+        (12, 44100, 2, "flac"),
+        (30, 16000, 1, "wav"),
+        (75, 48000, 1, "flac"),
+    ],
+    # One batch of short files, one chunk each, as wide as --max-num-seqs
+    "batch_files": 16,
+    "batch_clip_s": 6,
+    # A FLAC file through the streaming (volume) decode path
+    "stream_s": 45,
+    "imports": ["soundfile", "soxr", "httpx", "h11", "anyio"],
+}
+
+TTS_WARMUP = {
+    "texts": [
+        "Olá, tudo bem?",
+        "Bom dia. A audiência foi remarcada para a próxima terça-feira, às quatorze horas.",
+        "Conforme combinado na reunião de ontem, encaminho em anexo a minuta do contrato "
+        "com as alterações sugeridas pelo cliente. Peço que revise principalmente as "
+        "cláusulas de rescisão e de multa antes de sexta-feira.",
+    ],
+    "language": "Portuguese",
+    # Used when the voice-refs volume has no .wav + .txt pair
+    "ref_s": 8,
+    "ref_text": "Este é um áudio de referência sintético usado apenas para aquecer o modelo.",
+    "imports": ["soundfile", "soxr", "httpx", "h11", "anyio"],
+}
+
+VOICEDESIGN_WARMUP = {
+    "texts": TTS_WARMUP["texts"][:2],
+    "instructions": "A calm, middle-aged male voice with a warm, clear tone.",
+    "language": "Portuguese",
+}
+
+
+def synth_speech(seconds: float, sr: int, channels: int = 1, seed: int = 0) -> np.ndarray:
+    """Speech-like float32 audio: voiced syllables in words and phrases, with pauses.
+
+    Each syllable is a few harmonics of a 90-260 Hz pitch under a Hann
+    envelope; words are 1-4 syllables, phrases 3-12 words, separated by
+    0.3-1.2s pauses over a -55 dBFS noise floor. Deterministic for a seed.
+    """
+    rng = np.random.default_rng(seed)
+    total = int(seconds * sr)
+    audio = rng.normal(0, 10 ** (-55 / 20), total).astype(np.float32)
+
+    pos = int(rng.uniform(0.2, 0.6) * sr)
+    while pos < total:
+        for _ in range(rng.integers(3, 13)):
+            for _ in range(rng.integers(1, 5)):
+                n = int(rng.uniform(0.08, 0.3) * sr)
+                if pos + n >= total:
+                    break
+                t = np.arange(n, dtype=np.float32) / sr
+                f0 = rng.uniform(90, 260)
+                tone = sum(
+                    np.sin(2 * np.pi * f0 * k * t) / k for k in range(1, 5)
+                ).astype(np.float32)
+                audio[pos:pos + n] += 0.25 * np.hanning(n).astype(np.float32) * tone
+                pos += n
+            pos += int(rng.uniform(0.04, 0.15) * sr)
+        pos += int(rng.uniform(0.3, 1.2) * sr)
+
+    np.clip(audio, -1.0, 1.0, out=audio)
+    if channels == 1:
+        return audio
+    # Second channel slightly delayed and attenuated, like a stereo room mic
+    delayed = np.concatenate([np.zeros(sr // 200, np.float32), audio[:-(sr // 200)]])
+    return np.stack([audio, 0.8 * delayed], axis=1)
+
+
+def encode_clip(seconds: float, sr: int, channels: int, fmt: str, seed: int = 0) -> bytes:
+    """synth_speech encoded as an upload would arrive ("wav" = 16-bit PCM, "flac")."""
+    import soundfile as sf
+
+    buf = io.BytesIO()
+    subtype = "PCM_16" if fmt == "wav" else None
+    sf.write(buf, synth_speech(seconds, sr, channels, seed), sr,
+             format=fmt.upper(), subtype=subtype)
+    return buf.getvalue()
+
+
+def corpus(clips: list[tuple]) -> list[tuple[str, bytes]]:
+    """(name, file bytes) for each (seconds, sr, channels, format) of a profile."""
+    return [
+        (f"warmup_{i}_{seconds:g}s_{sr}_{fmt}", encode_clip(seconds, sr, channels, fmt, seed=i))
+        for i, (seconds, sr, channels, fmt) in enumerate(clips)
+    ]
+
+
+def prime_imports(modules: list[str]) -> float:
+    """Import every module the request path would import lazily; returns seconds."""
+    t0 = time.perf_counter()
+    for name in modules:
+        importlib.import_module(name)
+    return time.perf_counter() - t0
@@ -0,0 +1,19 @@
+"""Request defaults of the Whisper services, with no dependencies.
+
+The Modal apps (modal_whisper_http.py, modal_whisper_vllm.py,
+modal_whisper_engine.py) evaluate these as argument and Form() defaults when
+their class bodies run -- also when a script runs as a local client, where
+numpy or soundfile may be missing and the whisper_image.imports() block
+imports nothing. So they live here rather than in whisper_pipeline /
+audio_io, which take them from this module.
+
+Images that import this module need `.add_local_python_source("whisper_defaults")`.
+"""
+
+TARGET_SR = 16000  # Whisper's input rate; audio_io.TARGET_SR
+CHUNK_SECONDS = 30  # vLLM Whisper's per-prompt limit
+OVERLAP_SECONDS = 2
+# Transcript stitching across overlapping chunks: timestamps | align | concat
+STITCH_MODE = "timestamps"
+# Audio per container in transcribe_long (whisper_mapreduce.py)
+SEGMENT_SECONDS = 600
@@ -0,0 +1,154 @@
+"""In-process vLLM backend for WhisperPipeline (no `vllm serve`, no HTTP hop).
+
+EngineWhisperPipeline overrides the backend hooks of WhisperPipeline
+(whisper_service.py) to drive a vllm.LLM living in the same process: each
+chunk's PCM view becomes a float32 NumPy array handed to llm.generate() as
+the encoder's audio input, so there is no WAV encode, multipart upload,
+request parsing or second decode per chunk. Cache, decode, VAD planning,
+stitching, batches and warm-up are the shared pipeline, so results keep the
+same schema; modal_whisper_engine.py is the service around it.
+
+Differences from the HTTP backend:
+    - plain transcription prompts, so chunks carry no word/segment
+      timestamps and stitch="timestamps" falls back to aligning words;
+    - llm.generate() is blocking and not reentrant: chunks are grouped up to
+      MAX_CONCURRENT_CHUNKS (--max-num-seqs) per call, one call at a time
+      per container, and results of a group arrive together; concurrent
+      requests take turns at generate() round-robin (the pipeline's
+      FairScheduler with one slot), so a dictation waits for at most one
+      group of a long file;
+    - "http_container" is {} and the vLLM queue/inference times come
+      from the RequestOutput metrics instead of /metrics.
+
+Images that import this module need `.add_local_python_source("whisper_engine")`
+on top of what whisper_service.py lists, and vllm.
+"""
+
+import asyncio
+import threading
+import time
+from itertools import islice
+from typing import AsyncIterator, Iterator
+
+import numpy as np
+
+from audio_io import TARGET_SR
+from fair_scheduler import FairScheduler, new_request_key
+from whisper_service import MAX_CONCURRENT_CHUNKS, WhisperPipeline
+
+# Decoder budget per 30s chunk; --max-model-len 448 minus the prompt tokens
+MAX_TOKENS = 440
+
+
+def _decoder_prompt(language: str) -> str:
+    return f"<|startoftranscript|><|{language}|><|transcribe|><|notimestamps|>"
+
+
+class EngineWhisperPipeline(WhisperPipeline):
+    def __init__(self, llm, cache, coldstart, logger, model: str, mode: str,
+                 resolve_volume_path, checkpoints=None):
+        """llm: a vllm.LLM for a Whisper checkpoint, created in the snap=True enter."""
+        from vllm import SamplingParams
+
+        super().__init__(None, None, cache, coldstart, logger, model=model,
+                         mode=mode, resolve_volume_path=resolve_volume_path,
+                         checkpoints=checkpoints)
+        self.llm = llm
+        self.sampling = SamplingParams(temperature=0, max_tokens=MAX_TOKENS)
+        # One generate() call at a time; requests take turns
+        self.scheduler = FairScheduler(1)
+        # Updated from the worker threads of concurrent requests
+        self._metrics_lock = threading.Lock()
+        self._metrics = {"queue_s": 0.0, "inference_s": 0.0, "requests": 0}
+        self._metrics_seen = False
+
+    # --- backend: vllm.LLM in this process ---
+
+    def _dispatch(self, chunks, language: str) -> Iterator[dict]:
+        """Transcribe (index, chunk) pairs, MAX_CONCURRENT_CHUNKS per generate() call."""
+        chunk_iter = iter(chunks)
+        key = new_request_key()
+        while group := list(islice(chunk_iter, MAX_CONCURRENT_CHUNKS)):
+            yield from self._generate(group, language, key)
+
+    async def _adispatch(self, chunks, language: str) -> AsyncIterator[dict]:
+        """Async _dispatch: each generate() call runs in a worker thread.
+
+        The chunk iterator is advanced in the worker thread too, since for
+        volume files it decodes and plans the audio as it goes.
+        """
+        chunk_iter = iter(chunks)
+        key = new_request_key()
+        while group := await asyncio.to_thread(
+                lambda: list(islice(chunk_iter, MAX_CONCURRENT_CHUNKS))):
+            for r in await asyncio.to_thread(self._generate, group, language, key):
+                yield r
+
+    def _ensure_ready(self) -> None:
+        pass  # the engine lives and dies with this process
+
+    def _transport_stats(self) -> dict:
+        return {}
+
+    def _queue_metrics(self) -> dict | None:
+        with self._metrics_lock:
+            return dict(self._metrics) if self._metrics_seen else None
+
+    async def _aclose(self) -> None:
+        pass
+
+    def _generate(self, group: list[tuple[int, tuple[bytes, memoryview]]],
+                  language: str, key) -> list[dict]:
+        """One llm.generate() over a group of (index, (wav header, PCM view)) chunks.
+
+        key: the request's scheduler key (fair_scheduler.new_request_key()).
+        """
+        t_encode = time.perf_counter()
+        prompts = []
+        for _, (_, pcm) in group:
+            audio = np.frombuffer(pcm, dtype="<i2").astype(np.float32) / 32768.0
+            prompts.append({
+                "encoder_prompt": {
+                    "prompt": "",
+                    "multi_modal_data": {"audio": (audio, TARGET_SR)},
+                },
+                "decoder_prompt": _decoder_prompt(language),
+            })
+        encode_s = (time.perf_counter() - t_encode) / len(group)
+
+        with self.scheduler.slot(key):
+            t0 = time.perf_counter()
+            try:
+                outputs = self.llm.generate(prompts, self.sampling, use_tqdm=False)
+            except Exception as e:
+                first, last = group[0][0], group[-1][0]
+                raise RuntimeError(f"Chunks {first}-{last} failed: {e}") from e
+            latency_s = time.perf_counter() - t0
+        self._absorb_metrics(outputs)
+
+        return [
+            {
+                "index": index,
+                "text": output.outputs[0].text.strip(),
+                "words": [],
+                "segments": [],
+                "latency_s": latency_s,
+                "attempts": 1,
+                "encode_s": encode_s,
+                "bytes_sent": 0,
+                "bytes_received": 0,
+            }
+            for (index, _), output in zip(group, outputs)
+        ]
+
+    def _absorb_metrics(self, outputs) -> None:
+        """Add the per-request queue/inference times vLLM recorded, when it did."""
+        with self._metrics_lock:
+            for output in outputs:
+                m = getattr(output, "metrics", None)
+                if m is None or m.first_scheduled_time is None or m.finished_time is None:
+                    continue
+                self._metrics_seen = True
+                self._metrics["queue_s"] += m.time_in_queue or 0.0
+                self._metrics["inference_s"] += m.finished_time - m.first_scheduled_time
+                self._metrics["requests"] += 1
@@ -0,0 +1,156 @@
+"""Split / merge halves of the multi-container transcription of one long file.
+
+A single WhisperHTTP container works through a recording chunk by chunk, so
+a multi-hour file takes time proportional to its length. transcribe_long
+(modal_whisper_http.py) instead runs on a CPU container next to the
+audio-uploads volume and:
+
+    1. split_recording -- decodes the file once (streamed), plans chunk spans
+       with the pipeline's VAD, groups consecutive spans into segments of
+       about segment_seconds that start and end at pauses, and writes each
+       segment to the volume as 16 kHz pcm_s16le;
+    2. spawns one WhisperHTTP.transcribe per segment, each on its own
+       container (the segment re-plans its chunks; the VAD gives the same
+       cuts away from its edges);
+    3. merge_segments -- stitches the segment transcripts in order and builds
+       the report: per-segment timing and the GPU-seconds spent.
+
+A segment only ends inside speech when no pause turns up within
+SEGMENT_MAX_FACTOR x segment_seconds; such boundaries overlap like chunk
+overlaps do and are merged by aligning the repeated words.
+
+Images that import this module need `.add_local_python_source("whisper_mapreduce",
+"whisper_pipeline", "whisper_defaults", "audio_io")` plus numpy, soundfile and soxr.
+"""
+
+import os
+import tempfile
+import time
+
+import audio_io
+from whisper_defaults import SEGMENT_SECONDS
+from whisper_pipeline import CHUNK_SECONDS, OVERLAP_SECONDS, stitch_chunks, stream_chunks
+
+# A segment may grow up to this many times segment_seconds waiting for a pause
+SEGMENT_MAX_FACTOR = 1.5
+SEGMENTS_DIR = "segments"
+COPY_BLOCK = 4 << 20
+
+
+def group_segments(spans_s: list[tuple[float, float]],
+                   segment_seconds: float = SEGMENT_SECONDS) -> list[tuple[float, float]]:
+    """Group chunk spans (seconds) into consecutive segments of about segment_seconds.
+
+    A segment is closed at the first pause (next span starting at or after
+    the current end) once it is segment_seconds long, or unconditionally
+    before it would exceed SEGMENT_MAX_FACTOR x segment_seconds.
+    """
+    if segment_seconds <= CHUNK_SECONDS:
+        raise ValueError(f"segment_seconds must be more than {CHUNK_SECONDS}")
+    segments = []
+    start = end = None
+    for a, b in spans_s:
+        if start is None:
+            start, end = a, b
+            continue
+        full = end - start >= segment_seconds and a >= end
+        if full or b - start > segment_seconds * SEGMENT_MAX_FACTOR:
+            segments.append((start, end))
+            start = a
+        end = max(end, b)
+    if start is not None:
+        segments.append((start, end))
+    return segments
+
+
+def split_recording(path: str, out_dir: str, segment_seconds: float = SEGMENT_SECONDS,
+                    vad: bool = True, chunk_seconds: float = CHUNK_SECONDS,
+                    overlap_seconds: float = OVERLAP_SECONDS,
+                    audio_format: str = "auto",
+                    sample_rate: int = audio_io.TARGET_SR) -> dict:
+    """Decode and plan path, then write its segments to out_dir as pcm_s16le.
+
+    The decoded PCM is spooled to a local temp file while it is planned, so
+    the recording is decoded once and memory stays flat. Returns
+    {"duration_s", "skipped_s", "spans", "segments": [{"index", "start_s",
+    "end_s", "path"}, ...], "timings"}.
+    """
+    sr = audio_io.TARGET_SR
+    timings = {}
+    plan = {"spans_s": [], "skipped_s": 0.0}
+    t0 = time.perf_counter()
+    with tempfile.TemporaryFile() as pcm:
+        def blocks():
+            for block in audio_io.iter_decode_file(
+                path, sr, timings=timings, audio_format=audio_format,
+                sample_rate=sample_rate,
+            ):
+                pcm.write(block)
+                yield block
+
+        for _ in stream_chunks(blocks(), plan, vad, chunk_seconds, overlap_seconds,
+                               timings=timings):
+            pass
+        timings["decode_plan_s"] = time.perf_counter() - t0
+
+        t_split = time.perf_counter()
+        os.makedirs(out_dir, exist_ok=True)
+        segments = []
+        for index, (start_s, end_s) in enumerate(group_segments(plan["spans_s"], segment_seconds)):
+            segment_path = os.path.join(out_dir, f"{index:04d}.pcm")
+            pcm.seek(round(start_s * sr) * 2)
+            remaining = (round(end_s * sr) - round(start_s * sr)) * 2
+            with open(segment_path, "wb") as f:
+                while remaining > 0 and (block := pcm.read(min(remaining, COPY_BLOCK))):
+                    f.write(block)
+                    remaining -= len(block)
+            segments.append({
+                "index": index, "start_s": start_s, "end_s": end_s, "path": segment_path,
+            })
+        timings["split_s"] = time.perf_counter() - t_split
+
+    return {
+        "duration_s": plan["duration_s"],
+        "skipped_s": plan["skipped_s"],
+        "spans": len(plan["spans_s"]),
+        "segments": segments,
+        "timings": timings,
+    }
+
+
+def merge_segments(split: dict, results: list[dict], walls: list[float]) -> dict:
+    """Stitch per-segment transcribe results (in segment order) into one result.
+
+    walls are the seconds from spawn to result of each segment as seen by
+    the orchestrator (queueing and cold start included); "gpu_s" sums the
+    time each segment's container spent on it.
+    """
+    segments = split["segments"]
+    text, overlaps_merged = stitch_chunks(
+        [{"text": r["text"], "words": [], "segments": []} for r in results],
+        [(s["start_s"], s["end_s"]) for s in segments], "align",
+    )
+    report = [
+        {
+            "index": s["index"],
+            "start_s": round(s["start_s"], 2),
+            "end_s": round(s["end_s"], 2),
+            "chunks": r["chunks"],
+            "total_s": r["total_s"],
+            "inference_s": r["inference_s"],
+            "wall_s": round(wall, 2),
+            "cached": r["cached"],
+            "cold_start": r.get("cold_start", False),
+        }
+        for s, r, wall in zip(segments, results, walls)
+    ]
+    return {
+        "text": text,
+        "duration_audio_s": round(split["duration_s"], 1),
+        "skipped_s": round(split["skipped_s"], 1),
+        "chunks": sum(r["chunks"] for r in results),
+        "segments": report,
+        "overlaps_merged": overlaps_merged,
+        "gpu_s": round(sum(r["total_s"] for r in results), 2),
+        "max_segment_wall_s": round(max(walls, default=0.0), 2),
+    }
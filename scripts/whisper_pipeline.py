@@ -0,0 +1,355 @@
+"""Whisper chunking and stitching, shared by the Whisper services.
+
+Pure CPU code (numpy + audio_io), no Modal or vLLM imports, so it also runs
+in the offline benchmark (bench_whisper_pipeline.py) on any Linux box.
+
+    plan_chunks / fixed_spans -- where to cut 16kHz audio into <=30s chunks
+    chunk_audio               -- plan + lazy (WAV header, memoryview) chunks
+    stream_chunks             -- the same over a stream of decoded blocks
+    stitch_chunks             -- join chunk transcripts, dropping overlap repeats
+
+Images that import this module need `.add_local_python_source("whisper_pipeline",
+"whisper_defaults", "audio_io")` plus numpy.
+"""
+
+import time
+from typing import Iterator
+
+import numpy as np
+
+import audio_io
+# CHUNK_SECONDS (vLLM Whisper's per-prompt limit), OVERLAP_SECONDS, STITCH_MODE
+from whisper_defaults import CHUNK_SECONDS, OVERLAP_SECONDS, STITCH_MODE
+
+# Energy VAD used by the chunk planner
+VAD_FRAME_MS = 30
+VAD_MARGIN_DB = 12.0  # speech must be this far above the noise floor
+VAD_MIN_DBFS = -60.0  # never treat quieter frames as speech
+VAD_MIN_SILENCE_S = 0.3  # shorter pauses are kept inside a speech region
+VAD_MIN_SPEECH_S = 0.15  # shorter bursts are treated as noise
+VAD_PAD_S = 0.2  # context kept around each speech region
+VAD_CUT_SEARCH_S = 5  # how far before the window limit to look for a pause
+VAD_BLOCK_FRAMES = 4096  # frames per energy block (~2 min of audio)
+
+# Streaming chunker (constant memory, inference starts before decode ends)
+STREAM_WINDOW_S = 300  # audio planned at once by the streaming chunker
+STREAM_CARRY_GUARD_S = 2  # window tail always re-planned with the next window
+
+STITCH_WORDS_PER_S = 5  # upper bound on speech rate, sizes the alignment window
+
+
+
+def _speech_regions(mask) -> list[tuple[int, int]]:
+    """Return [start, end) frame runs where mask is True."""
+    edges = np.diff(np.concatenate(([0], mask.astype(np.int8), [0])))
+    starts = np.flatnonzero(edges == 1)
+    ends = np.flatnonzero(edges == -1)
+    return list(zip(starts.tolist(), ends.tolist()))
+
+
+def _frame_energy_db(audio_array, sr: int):
+    """Per-frame energy (dBFS) and the adaptive speech threshold for it.
+
+    Accepts int16 or float32 samples. Works through VAD_BLOCK_FRAMES rows at a
+    time so no full-length float copy of the audio is ever made.
+    """
+    frame = sr * VAD_FRAME_MS // 1000
+    n_full = len(audio_array) // frame
+    frames = audio_array[:n_full * frame].reshape(n_full, frame)
+    tail = audio_array[n_full * frame:]
+
+    power = np.empty(n_full + (1 if len(tail) or not n_full else 0))
+    for row in range(0, n_full, VAD_BLOCK_FRAMES):
+        block = audio_io.to_float32(frames[row:row + VAD_BLOCK_FRAMES])
+        power[row:row + len(block)] = np.einsum("ij,ij->i", block, block) / frame
+    if len(power) > n_full:
+        block = audio_io.to_float32(tail)
+        power[-1] = float(np.dot(block, block)) / frame
+    energy_db = 10 * np.log10(power + 1e-10)
+
+    # Threshold sits above the noise floor but below the speech level, so
+    # recordings without any pause are not classified as all-silence.
+    floor_db, level_db = np.percentile(energy_db, [10, 90])
+    threshold = max(
+        VAD_MIN_DBFS,
+        min(floor_db + VAD_MARGIN_DB, level_db - VAD_MARGIN_DB),
+    )
+    return energy_db, threshold
+
+
+def plan_chunks(audio_array, sr: int, chunk_seconds: float = CHUNK_SECONDS,
+                 overlap_seconds: float = OVERLAP_SECONDS,
+                 ) -> tuple[list[tuple[int, int]], float]:
+    """Plan chunk spans that cut at pauses and skip non-speech audio.
+
+    Speech is detected with a frame-energy VAD. Consecutive speech regions are
+    packed greedily into windows of at most chunk_seconds; the gaps between
+    windows are never sent to vLLM. A region longer than the window is cut at
+    the quietest frame near the limit, and only when that cut lands inside
+    speech does the next chunk repeat overlap_seconds of audio.
+
+    Returns (spans, skipped_s) with spans as (start, end) sample offsets.
+    """
+    energy_db, threshold = _frame_energy_db(audio_array, sr)
+    frames_per_s = 1000 / VAD_FRAME_MS
+    mask = energy_db > threshold
+
+    # Close short pauses, drop blips, then pad word edges
+    regions = _speech_regions(mask)
+    min_silence = int(VAD_MIN_SILENCE_S * frames_per_s)
+    for (_, prev_end), (next_start, _) in zip(regions, regions[1:]):
+        if next_start - prev_end < min_silence:
+            mask[prev_end:next_start] = True
+    min_speech = int(VAD_MIN_SPEECH_S * frames_per_s)
+    for start, end in _speech_regions(mask):
+        if end - start < min_speech:
+            mask[start:end] = False
+    pad = int(VAD_PAD_S * frames_per_s)
+    if pad:
+        mask = np.convolve(mask, np.ones(2 * pad + 1), mode="same") > 0
+
+    max_frames = int(chunk_seconds * frames_per_s)
+    overlap_frames = min(int(overlap_seconds * frames_per_s), max_frames // 4)
+    search_frames = min(int(VAD_CUT_SEARCH_S * frames_per_s), max_frames // 4)
+
+    spans = []
+    cur_start = cur_end = None
+    for start, end in _speech_regions(mask):
+        if cur_start is not None and end - cur_start <= max_frames:
+            cur_end = end
+            continue
+        if cur_start is not None:
+            spans.append((cur_start, cur_end))
+        cur_start, cur_end = start, end
+        while cur_end - cur_start > max_frames:
+            lo = cur_start + max_frames - search_frames
+            cut = lo + int(np.argmin(energy_db[lo:cur_start + max_frames]))
+            spans.append((cur_start, cut))
+            if energy_db[cut] > threshold:
+                cur_start = cut - overlap_frames
+            else:
+                cur_start = cut
+    if cur_start is not None:
+        spans.append((cur_start, cur_end))
+
+    frame = sr * VAD_FRAME_MS // 1000
+    total = len(audio_array)
+    spans = [(min(s * frame, total), min(e * frame, total)) for s, e in spans]
+    spans = [(s, e) for s, e in spans if e > s]
+
+    covered = 0
+    covered_until = 0
+    for s, e in spans:
+        covered += max(0, e - max(s, covered_until))
+        covered_until = max(covered_until, e)
+    skipped_s = (total - covered) / sr
+    return spans, skipped_s
+
+
+def fixed_spans(total_samples: int, sr: int, chunk_seconds: float = CHUNK_SECONDS,
+                 overlap_seconds: float = OVERLAP_SECONDS) -> list[tuple[int, int]]:
+    """Fixed chunk_seconds windows with overlap_seconds overlap (no VAD)."""
+    chunk_samples = int(chunk_seconds * sr)
+    step = chunk_samples - int(overlap_seconds * sr)
+    spans = []
+    start = 0
+    while True:
+        end = min(start + chunk_samples, total_samples)
+        spans.append((start, end))
+        if end == total_samples:
+            return spans
+        start += step
+
+
+def chunk_audio(audio_array, vad: bool = True,
+                 chunk_seconds: float = CHUNK_SECONDS,
+                 overlap_seconds: float = OVERLAP_SECONDS,
+                 timings: dict | None = None,
+                 ) -> tuple[Iterator[tuple[bytes, memoryview]], float, dict]:
+    """Split decoded 16kHz mono int16 audio into WAV chunks of at most chunk_seconds.
+
+    The audio is decoded to int16 once (audio_io.decode_audio(..., dtype="int16"),
+    a zero-copy view for 16kHz mono PCM WAV uploads). Chunks are produced
+    lazily as (WAV header, memoryview of that buffer) pairs, so nothing is
+    re-encoded per chunk and only chunks in flight are ever turned into
+    request bodies.
+
+    Returns (chunk iterator, duration, plan) where plan holds the chunk
+    spans in seconds and how many seconds of non-speech were skipped.
+    Planning time is added to timings["plan_s"] when timings is given.
+    """
+    sr = audio_io.TARGET_SR
+    total_samples = len(audio_array)
+    audio_duration = total_samples / sr
+
+    t0 = time.perf_counter()
+    if vad:
+        spans, skipped_s = plan_chunks(audio_array, sr, chunk_seconds, overlap_seconds)
+    else:
+        spans = fixed_spans(total_samples, sr, chunk_seconds, overlap_seconds)
+        skipped_s = 0.0
+    if timings is not None:
+        timings["plan_s"] = time.perf_counter() - t0
+
+    chunks = audio_io.iter_wav_chunks(audio_array, spans, sr)
+
+    plan = {
+        "spans_s": [(start / sr, end / sr) for start, end in spans],
+        "skipped_s": skipped_s,
+    }
+    return chunks, audio_duration, plan
+
+
+def stream_chunks(blocks: Iterator, plan: dict, vad: bool = True,
+                   chunk_seconds: float = CHUNK_SECONDS,
+                   overlap_seconds: float = OVERLAP_SECONDS,
+                   timings: dict | None = None,
+                   ) -> Iterator[tuple[bytes, memoryview]]:
+    """chunk_audio over a stream of decoded int16 blocks, in constant memory.
+
+    Blocks are buffered into planning windows of about STREAM_WINDOW_S and
+    each window is planned with the same VAD (or fixed spans). The last span
+    of a window may continue into the next block, so it is held back and the
+    window's tail from that span's start is carried into the next window.
+    Only the window being planned and the ones referenced by chunks still in
+    flight are alive at any time.
+
+    plan["spans_s"] grows as chunks are yielded (always before the chunk is);
+    plan["skipped_s"] and plan["duration_s"] are final once the stream ends.
+    Planning time accumulates in timings["plan_s"] when timings is given.
+    """
+    sr = audio_io.TARGET_SR
+    window_samples = int(STREAM_WINDOW_S * sr)
+    guard = int(STREAM_CARRY_GUARD_S * sr)
+
+    buf = np.zeros(0, dtype=np.int16)
+    offset = 0  # absolute sample index of buf[0]
+    covered = 0
+    covered_until = 0
+    block_iter = iter(blocks)
+    final = False
+    while not final:
+        pending = [buf]
+        size = len(buf)
+        while size < window_samples:
+            block = next(block_iter, None)
+            if block is None:
+                final = True
+                break
+            pending.append(block)
+            size += len(block)
+        buf = np.concatenate(pending) if len(pending) > 1 else buf
+        if not len(buf):
+            break
+
+        t_plan = time.perf_counter()
+        if vad:
+            spans, _ = plan_chunks(buf, sr, chunk_seconds, overlap_seconds)
+        else:
+            spans = fixed_spans(len(buf), sr, chunk_seconds, overlap_seconds)
+        if timings is not None:
+            timings["plan_s"] = timings.get("plan_s", 0.0) + time.perf_counter() - t_plan
+
+        carry = len(buf)
+        if not final:
+            # The guard keeps speech starting right at the window edge (and
+            # its leading pad) for the next window's VAD
+            carry = len(buf) - guard
+            if spans and spans[-1][1] > carry:
+                carry = spans.pop()[0]
+
+        for start, end in spans:
+            plan["spans_s"].append(((offset + start) / sr, (offset + end) / sr))
+            covered += max(0, offset + end - max(offset + start, covered_until))
+            covered_until = max(covered_until, offset + end)
+        yield from audio_io.iter_wav_chunks(buf, spans, sr)
+
+        if final:
+            offset += len(buf)
+            break
+        # Chunks in flight keep the old window alive; the next concatenate
+        # leaves it to be freed once they finish
+        buf = buf[carry:]
+        offset += carry
+
+    plan["duration_s"] = offset / sr
+    plan["skipped_s"] = (offset - covered) / sr
+
+
+def _normalize_word(word: str) -> str:
+    return "".join(ch for ch in word.lower() if ch.isalnum())
+
+
+def _chunk_words(result: dict, offset_s: float) -> list[tuple[str, float | None]]:
+    """Words of a chunk as (text, absolute start) -- start is None without word timestamps."""
+    if result["words"]:
+        return [
+            (w["word"].strip(), offset_s + w["start"])
+            for w in result["words"] if w["word"].strip()
+        ]
+    return [(word, None) for word in result["text"].split()]
+
+
+def _align_overlap(prev: list, nxt: list, window: int) -> tuple[int, int]:
+    """Find the words repeated across a chunk boundary.
+
+    Looks for the longest run of identical (normalized) words between the
+    tail of prev and the head of nxt, both limited to window words. Returns
+    (prev_keep, next_skip): keep prev[:prev_keep] and nxt[next_skip:]. Words
+    after the run in prev and before it in nxt are the garbled edges of the
+    cut and are dropped with it. Runs shorter than 2 words are ignored.
+    """
+    tail_start = max(0, len(prev) - window)
+    a = [_normalize_word(w) for w, _ in prev[tail_start:]]
+    b = [_normalize_word(w) for w, _ in nxt[:window]]
+
+    best_len = best_i = best_j = 0
+    row = [0] * (len(b) + 1)
+    for i in range(1, len(a) + 1):
+        new_row = [0] * (len(b) + 1)
+        for j in range(1, len(b) + 1):
+            if a[i - 1] and a[i - 1] == b[j - 1]:
+                new_row[j] = row[j - 1] + 1
+                if new_row[j] > best_len:
+                    best_len, best_i, best_j = new_row[j], i, j
+        row = new_row
+
+    if best_len < 2:
+        return len(prev), 0
+    return tail_start + best_i, best_j
+
+
+def stitch_chunks(chunk_results: list[dict], spans_s: list[tuple[float, float]],
+                   mode: str = STITCH_MODE) -> tuple[str, int]:
+    """Join chunk texts, removing words duplicated by overlapping chunks.
+
+    Modes:
+        timestamps -- split each overlap at its midpoint using word timestamps,
+                      falling back to align when a chunk has none.
+        align      -- drop the longest run of words repeated across the cut.
+        concat     -- plain join (previous behaviour).
+
+    Returns (text, number of overlaps merged).
+    """
+    pieces = []
+    merged = 0
+    for i, result in enumerate(chunk_results):
+        words = _chunk_words(result, spans_s[i][0])
+        overlap_s = spans_s[i - 1][1] - spans_s[i][0] if i else 0.0
+        if mode != "concat" and overlap_s > 0 and pieces:
+            prev = pieces[-1]
+            timed = all(t is not None for _, t in prev + words)
+            if mode == "timestamps" and timed:
+                boundary = spans_s[i][0] + overlap_s / 2
+                pieces[-1] = [w for w in prev if w[1] < boundary]
+                words = [w for w in words if w[1] >= boundary]
+            else:
+                window = int(overlap_s * STITCH_WORDS_PER_S) + 2
+                keep, skip = _align_overlap(prev, words, window)
+                pieces[-1] = prev[:keep]
+                words = words[skip:]
+            merged += 1
+        pieces.append(words)
+
+    text = " ".join(word for piece in pieces for word, _ in piece)
+    return text, merged
@@ -0,0 +1,1254 @@
+"""Request path shared by the vLLM Whisper services.
+
+WhisperPipeline holds everything between a service's @modal.method /
+web endpoint wrappers and the `vllm serve` /v1/audio/transcriptions API:
+results cache, decode, VAD chunk planning (whisper_pipeline.py), concurrent
+binary multipart chunk dispatch with per-chunk retry, stitching, timings,
+batches and the warm-up profile. modal_whisper_http.py and
+modal_whisper_vllm.py each create one in @modal.enter(snap=True):
+
+    self.pipeline = WhisperPipeline(self.vllm, self.supervisor, self.cache,
+                                    self.coldstart, self.logger, model=...,
+                                    mode=..., resolve_volume_path=...)
+
+so both return the same result schema and differ only in how vLLM is
+configured -- which is what a benchmark between them should see.
+whisper_engine.py subclasses it to run chunks on an in-process vllm.LLM
+instead, overriding only the backend hooks (_dispatch, _ensure_ready, ...).
+
+Concurrent requests in one container share the vLLM server through a
+FairScheduler (fair_scheduler.py): at most MAX_CONCURRENT_CHUNKS chunks in
+flight in total, handed out round-robin across requests.
+
+Images that import this module need `.add_local_python_source("whisper_service",
+"whisper_pipeline", "whisper_defaults", "audio_io", "fair_scheduler", "transcript_cache",
+"volume_upload", "warmup")`
+plus numpy, soundfile, soxr, requests and httpx (and fastapi for the web helpers:
+read_upload, atranscribe, astream_response).
+"""
+
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import AsyncIterator, Iterator
+
+import httpx
+import numpy as np
+import requests
+
+import audio_io
+import warmup
+from fair_scheduler import FairScheduler, new_request_key
+from transcript_cache import cache_key
+from whisper_pipeline import (
+    CHUNK_SECONDS,
+    OVERLAP_SECONDS,
+    STITCH_MODE,
+    VAD_MIN_DBFS,
+    chunk_audio,
+    stitch_chunks,
+    stream_chunks,
+)
+
+MAX_CONCURRENT_CHUNKS = 16  # matches --max-num-seqs
+CHUNK_RETRIES = 2
+
+# Web endpoints read multipart uploads this much at a time
+UPLOAD_READ_BLOCK = 1 << 20
+
+# Summary fields describing one run, not the transcript: kept out of the cache
+# ("http" is the name older entries carry http_container under)
+_PER_REQUEST_FIELDS = ("type", "http", "http_container", "chunk_latencies_s", "max_in_flight")
+
+# Volume files at least this big are decoded as a stream by default
+STREAM_DECODE_MIN_BYTES = 64 * 1024**2
+
+# Flipped off the first time the server says it cannot do response_format=verbose_json
+_verbose_json_supported = True
+# Words in a 400 body that mean the verbose form fields, not the chunk, were rejected
+VERBOSE_REJECTION_MARKERS = ("response_format", "verbose_json", "timestamp_granularities")
+
+logger = logging.getLogger(__name__)
+
+
+async def read_upload(file) -> bytes:
+    """Read a multipart upload (fastapi.UploadFile) in blocks without blocking the event loop."""
+    buf = bytearray()
+    while block := await file.read(UPLOAD_READ_BLOCK):
+        buf += block
+    return bytes(buf)
+
+
+def format_record(record: dict, format: str) -> str:
+    """One stream record as an NDJSON line or an SSE event."""
+    if format == "sse":
+        return f"event: {record['type']}\ndata: {json.dumps(record)}\n\n"
+    return json.dumps(record) + "\n"
+
+
+def _chunk_form(index: int, wav: bytes, language: str, model: str,
+                verbose: bool) -> tuple[dict, dict]:
+    """Multipart (files, data) for one /v1/audio/transcriptions request."""
+    data = {
+        "model": model,
+        "language": language,
+        "temperature": "0",
+    }
+    if verbose:
+        data["response_format"] = "verbose_json"
+        data["timestamp_granularities[]"] = ["segment", "word"]
+    files = {"file": (f"chunk_{index}.wav", wav, "audio/wav")}
+    return files, data
+
+
+class _ChunkRequest:
+    """One chunk's /v1/audio/transcriptions request and its retry rules.
+
+    Shared by _transcribe_chunk and _atranscribe_chunk, which differ only in
+    how they POST and sleep. Asks for verbose_json (segment + word
+    timestamps) so neighbouring chunks can be stitched by time; servers that
+    reject it are asked for plain json from then on.
+    """
+
+    def __init__(self, index: int, chunk: tuple[bytes, memoryview], language: str,
+                 model: str):
+        self.index = index
+        self.language = language
+        self.model = model
+        # Header + PCM view -> request body, once (retries resend the same bytes)
+        t_encode = time.perf_counter()
+        self.wav = b"".join(chunk)
+        self.encode_s = time.perf_counter() - t_encode
+        self.attempt = 0
+
+    def form(self) -> tuple[dict, dict]:
+        """(files, data) for the next attempt."""
+        self.attempt += 1
+        self.t0 = time.perf_counter()
+        self.verbose = _verbose_json_supported
+        return _chunk_form(self.index, self.wav, self.language, self.model, self.verbose)
+
+    def rejected_verbose(self, resp) -> bool:
+        """Whether a response says the server cannot do verbose_json.
+
+        Only a 400 whose body names the verbose form fields counts: a bad
+        language or an undecodable chunk is a 400 too, and is raised as
+        such. Switches later requests to plain json; this one is resent at
+        once, without counting as an attempt.
+        """
+        global _verbose_json_supported
+        if not (self.verbose and resp.status_code == 400):
+            return False
+        body = resp.text.lower()
+        if not any(marker in body for marker in VERBOSE_REJECTION_MARKERS):
+            return False
+        if _verbose_json_supported:
+            _verbose_json_supported = False
+            logger.warning(
+                "Server rejected response_format=verbose_json (%s); sending plain json, "
+                "stitch=timestamps falls back to align", resp.text[:200],
+            )
+        self.attempt -= 1
+        return True
+
+    def retry_delay(self, status: int | None, error: Exception) -> float:
+        """Seconds to wait before resending after a failed attempt.
+
+        Transport errors and 5xx are transient; anything else, or running
+        out of CHUNK_RETRIES, raises.
+        """
+        transient = status is None or status >= 500
+        if not transient or self.attempt > CHUNK_RETRIES:
+            raise RuntimeError(
+                f"Chunk {self.index} failed after {self.attempt} attempt(s): {error}"
+            ) from error
+        return 0.5 * 2 ** (self.attempt - 1)
+
+    def result(self, resp) -> dict:
+        body = resp.json()
+        return {
+            "index": self.index,
+            "text": body.get("text", "").strip(),
+            "words": body.get("words") or [],
+            "segments": body.get("segments") or [],
+            "latency_s": time.perf_counter() - self.t0,
+            "attempts": self.attempt,
+            "encode_s": self.encode_s,
+            "bytes_sent": len(self.wav),
+            "bytes_received": len(resp.content),
+        }
+
+
+def _transcribe_chunk(client: "PooledHTTPClient", index: int,
+                      chunk: tuple[bytes, memoryview], language: str, model: str) -> dict:
+    """POST one chunk to vLLM. Retries this chunk only, on transient errors."""
+    request = _ChunkRequest(index, chunk, language, model)
+    while True:
+        files, data = request.form()
+        try:
+            resp = client.post("/v1/audio/transcriptions", files=files, data=data)
+            if request.rejected_verbose(resp):
+                continue
+            resp.raise_for_status()
+        except requests.RequestException as e:
+            status = getattr(e.response, "status_code", None)
+            time.sleep(request.retry_delay(status, e))
+            continue
+        return request.result(resp)
+
+
+async def _atranscribe_chunk(client: "PooledHTTPClient", index: int,
+                             chunk: tuple[bytes, memoryview], language: str,
+                             model: str) -> dict:
+    """Async _transcribe_chunk over the pooled httpx client (same retry rules)."""
+    request = _ChunkRequest(index, chunk, language, model)
+    while True:
+        files, data = request.form()
+        try:
+            resp = await client.apost("/v1/audio/transcriptions", files=files, data=data)
+            if request.rejected_verbose(resp):
+                continue
+            resp.raise_for_status()
+        except (httpx.HTTPStatusError, httpx.TransportError) as e:
+            status = e.response.status_code if isinstance(e, httpx.HTTPStatusError) else None
+            await asyncio.sleep(request.retry_delay(status, e))
+            continue
+        return request.result(resp)
+
+
+def _iter_transcribe_chunks(client: "PooledHTTPClient", chunks, language: str, model: str,
+                            max_in_flight: int = MAX_CONCURRENT_CHUNKS,
+                            scheduler: "FairScheduler | None" = None) -> Iterator[dict]:
+    """Transcribe chunks concurrently, at most max_in_flight at a time.
+
+    chunks yields (index, chunk) pairs. They are pulled lazily, so a
+    generator is never materialized ahead of the in-flight window. Results
+    are yielded as soon as each chunk finishes (completion order; see "index").
+    With a scheduler, each chunk also waits for a slot shared with the
+    container's other requests.
+    """
+    chunk_iter = iter(chunks)
+    key = new_request_key()
+
+    def transcribe(index: int, chunk: tuple[bytes, memoryview]) -> dict:
+        if scheduler is None:
+            return _transcribe_chunk(client, index, chunk, language, model)
+        with scheduler.slot(key):
+            return _transcribe_chunk(client, index, chunk, language, model)
+
+    with ThreadPoolExecutor(max_workers=max_in_flight) as pool:
+        pending = set()
+        exhausted = False
+        while pending or not exhausted:
+            while not exhausted and len(pending) < max_in_flight:
+                try:
+                    index, chunk = next(chunk_iter)
+                except StopIteration:
+                    exhausted = True
+                    break
+                pending.add(pool.submit(transcribe, index, chunk))
+            if not pending:
+                break
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            # Finished chunks go out before a failure among them is raised
+            for future in sorted(done, key=lambda f: f.exception() is not None):
+                yield future.result()
+
+
+async def _aiter_transcribe_chunks(client: "PooledHTTPClient", chunks, language: str,
+                                   model: str, max_in_flight: int = MAX_CONCURRENT_CHUNKS,
+                                   scheduler: "FairScheduler | None" = None
+                                   ) -> AsyncIterator[dict]:
+    """Async _iter_transcribe_chunks: tasks on the event loop instead of threads.
+
+    Same lazy, bounded submission, scheduling and completion-order results.
+    If a chunk fails, the chunks still in flight are cancelled before the
+    error propagates.
+    """
+    chunk_iter = iter(chunks)
+    key = new_request_key()
+
+    async def transcribe(index: int, chunk: tuple[bytes, memoryview]) -> dict:
+        if scheduler is None:
+            return await _atranscribe_chunk(client, index, chunk, language, model)
+        async with scheduler.aslot(key):
+            return await _atranscribe_chunk(client, index, chunk, language, model)
+
+    pending = set()
+    exhausted = False
+    try:
+        while pending or not exhausted:
+            while not exhausted and len(pending) < max_in_flight:
+                try:
+                    index, chunk = next(chunk_iter)
+                except StopIteration:
+                    exhausted = True
+                    break
+                pending.add(asyncio.create_task(transcribe(index, chunk)))
+            if not pending:
+                break
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in sorted(done, key=lambda t: t.cancelled() or t.exception() is not None):
+                yield task.result()
+    finally:
+        for task in pending:
+            task.cancel()
+        # Let them unwind (scheduler slots released) before the generator returns
+        await asyncio.gather(*pending, return_exceptions=True)
+
+
+def _cache_params(language: str, vad: bool, chunk_seconds: float,
+                  overlap_seconds: float, stitch: str, model: str) -> dict:
+    """Validate the request options; return the ones that key the results cache."""
+    if stitch not in ("timestamps", "align", "concat"):
+        raise ValueError(f"Unknown stitch mode: {stitch}")
+    if not 0 < chunk_seconds <= CHUNK_SECONDS:
+        raise ValueError(f"chunk_seconds must be in (0, {CHUNK_SECONDS}]")
+    if not 0 <= overlap_seconds < chunk_seconds / 2:
+        raise ValueError("overlap_seconds must be less than half of chunk_seconds")
+    return {
+        "language": language, "model": model, "vad": vad,
+        "chunk_seconds": chunk_seconds, "overlap_seconds": overlap_seconds,
+        "stitch": stitch,
+    }
+
+
+def _raw_params(audio_format: str, sample_rate: int) -> dict:
+    """Extra cache-key params for headerless PCM: the same bytes at another
+    rate or sample type are different audio. Empty for canonical pcm_s16le,
+    whose bytes are exactly the decoded PCM."""
+    if audio_format not in audio_io.RAW_FORMATS:
+        return {}
+    if audio_format == "pcm_s16le" and sample_rate == audio_io.TARGET_SR:
+        return {}
+    return {"raw": f"{audio_format}@{sample_rate}"}
+
+
+def _single_chunk(audio_array, vad: bool) -> tuple[list, float, dict]:
+    """chunk_audio for a clip that fits one window: the whole clip as one chunk.
+
+    VAD planning is skipped; with vad, digital silence (peak below
+    VAD_MIN_DBFS) still yields no chunk rather than a hallucinated line.
+    """
+    sr = audio_io.TARGET_SR
+    n = len(audio_array)
+    duration = n / sr
+    silent = n == 0 or vad and (
+        int(np.abs(audio_array, dtype=np.int32).max()) < 32768 * 10 ** (VAD_MIN_DBFS / 20)
+    )
+    if silent:
+        return [], duration, {"spans_s": [], "skipped_s": duration}
+    chunks = list(audio_io.iter_wav_chunks(audio_array, [(0, n)], sr))
+    return chunks, duration, {"spans_s": [(0.0, duration)], "skipped_s": 0.0}
+
+
+def _stitch_used(mode: str, chunk_results: list[dict]) -> str:
+    """The stitch mode stitch_chunks really applied: timestamps needs word
+    timestamps on every chunk with text, and aligns words otherwise."""
+    if mode == "timestamps" and any(r["text"] and not r["words"] for r in chunk_results):
+        return "align"
+    return mode
+
+
+def _without(record: dict, keys) -> dict:
+    return {k: v for k, v in record.items() if k not in keys}
+
+
+def _final_record(records) -> dict:
+    """Drain a record stream; return its summary without the "type" tag."""
+    for record in records:
+        pass
+    return {k: v for k, v in record.items() if k != "type"}
+
+
+def _vllm_queue_metrics(client: "PooledHTTPClient") -> dict | None:
+    """Cumulative request queue/inference time counters from vLLM's /metrics.
+
+    Returns {"queue_s", "inference_s", "requests"} summed over all requests the
+    server has finished, or None when the server does not export them.
+    """
+    wanted = {
+        "vllm:request_queue_time_seconds_sum": "queue_s",
+        "vllm:request_inference_time_seconds_sum": "inference_s",
+        "vllm:request_queue_time_seconds_count": "requests",
+    }
+    try:
+        resp = client.get("/metrics", timeout=2)
+        resp.raise_for_status()
+    except requests.RequestException:
+        return None
+    values = {}
+    for line in resp.text.splitlines():
+        name = line.split("{", 1)[0].split(" ", 1)[0]
+        if name in wanted:
+            values[wanted[name]] = values.get(wanted[name], 0.0) + float(line.rsplit(" ", 1)[1])
+    return values if len(values) == len(wanted) else None
+
+
+def _add_time(timings: dict | None, key: str, since: float) -> None:
+    """Accumulate perf_counter() - since under timings[key] (no-op when off)."""
+    if timings is not None:
+        timings[key] = timings.get(key, 0.0) + time.perf_counter() - since
+
+
+def _round_floats(timings: dict) -> dict:
+    return {
+        k: _round_floats(v) if isinstance(v, dict)
+        else round(v, 4) if isinstance(v, float) else v
+        for k, v in timings.items()
+    }
+
+
+def _percentile_summary(values: list[float]) -> dict:
+    """min / p50 / max of values, rounded for the response."""
+    ordered = sorted(values) or [0.0]
+    return {
+        "min": round(ordered[0], 3),
+        "p50": round(ordered[len(ordered) // 2], 3),
+        "max": round(ordered[-1], 3),
+    }
+
+
+def _stats_delta(before: dict, after: dict) -> dict:
+    """Connection-pool counters accrued between two PooledHTTPClient.stats() calls
+    (container-wide: every request using the pool in between is counted)."""
+    return {k: after[k] - before[k] for k in after}
+
+
+class WhisperPipeline:
+    def __init__(self, vllm, supervisor, cache, coldstart, logger, model: str,
+                 mode: str, resolve_volume_path, checkpoints=None):
+        """
+        Args:
+            vllm: PooledHTTPClient pointed at the `vllm serve` process.
+            supervisor: Its VLLMSupervisor (ensure_running() before dispatch).
+            cache: TranscriptCache for results.
+            coldstart: ColdStartTimeline; the first result served carries it.
+            logger: logging.Logger.
+            model: Served model name (request field, part of the cache key).
+            mode: The results' "mode" tag.
+            resolve_volume_path: volume_path -> local path of the uploaded
+                file (volume_upload.resolve bound to the service's mount).
+            checkpoints: CheckpointStore for checkpoint=True requests
+                (transcript_checkpoint.py); None rejects them.
+        """
+        self.vllm = vllm
+        self.supervisor = supervisor
+        self.cache = cache
+        self.coldstart = coldstart
+        self.logger = logger
+        self.model = model
+        self.mode = mode
+        self.resolve_volume_path = resolve_volume_path
+        self.checkpoints = checkpoints
+        # Chunks of all this container's requests share --max-num-seqs slots, round-robin
+        self.scheduler = FairScheduler(MAX_CONCURRENT_CHUNKS)
+
+    # --- backend: `vllm serve` over HTTP (whisper_engine.py overrides these) ---
+
+    def _dispatch(self, chunks, language: str) -> Iterator[dict]:
+        """Transcribe (index, chunk) pairs concurrently; results in completion order."""
+        if isinstance(chunks, list) and len(chunks) == 1:
+            # Dictation clip (_single_chunk): one request, no worker pool
+            index, chunk = chunks[0]
+            with self.scheduler.slot(new_request_key()):
+                return iter([_transcribe_chunk(self.vllm, index, chunk, language, self.model)])
+        return _iter_transcribe_chunks(self.vllm, chunks, language, self.model,
+                                       scheduler=self.scheduler)
+
+    def _adispatch(self, chunks, language: str) -> AsyncIterator[dict]:
+        return _aiter_transcribe_chunks(self.vllm, chunks, language, self.model,
+                                        scheduler=self.scheduler)
+
+    def _ensure_ready(self) -> None:
+        self.supervisor.ensure_running()
+
+    def _transport_stats(self) -> dict:
+        """Cumulative transport counters of the container's connection pool.
+
+        Results carry the delta over their run as "http_container": with
+        concurrent requests it includes their traffic too, like vllm_queue_s.
+        """
+        return self.vllm.stats()
+
+    def _queue_metrics(self) -> dict | None:
+        """Cumulative {"queue_s", "inference_s", "requests"}, or None if unknown."""
+        return _vllm_queue_metrics(self.vllm)
+
+    async def _aclose(self) -> None:
+        """Drop async clients bound to the current event loop."""
+        await self.vllm.aclose()
+
+    # --- request path ---
+
+    def transcribe(self, audio_bytes: bytes, language: str = "pt",
+                   volume_path: str = "", vad: bool = True,
+                   chunk_seconds: float = CHUNK_SECONDS,
+                   overlap_seconds: float = OVERLAP_SECONDS,
+                   stitch: str = STITCH_MODE, use_cache: bool = True,
+                   stream_decode: bool | None = None, timings: bool = True,
+                   audio_format: str = "auto",
+                   sample_rate: int = audio_io.TARGET_SR, checkpoint: bool = False,
+                   time_budget_s: float | None = None) -> dict:
+        """The services' transcribe() (arguments documented there)."""
+        return _final_record(self.iter_transcribe(
+            audio_bytes, language, volume_path, vad=vad, chunk_seconds=chunk_seconds,
+            overlap_seconds=overlap_seconds, stitch=stitch, use_cache=use_cache,
+            stream_decode=stream_decode, timings=timings, audio_format=audio_format,
+            sample_rate=sample_rate, checkpoint=checkpoint, time_budget_s=time_budget_s,
+        ))
+
+    def iter_transcribe(self, audio_bytes: bytes, language: str = "pt",
+                        volume_path: str = "", vad: bool = True,
+                        chunk_seconds: float = CHUNK_SECONDS,
+                        overlap_seconds: float = OVERLAP_SECONDS,
+                        stitch: str = STITCH_MODE, use_cache: bool = True,
+                        stream_decode: bool | None = None, timings: bool = True,
+                        audio_format: str = "auto",
+                        sample_rate: int = audio_io.TARGET_SR, checkpoint: bool = False,
+                        time_budget_s: float | None = None) -> Iterator[dict]:
+        """transcribe() as its record stream (plan, chunks, summary), e.g. for job progress.
+
+        Closing the stream early stops handing out chunks.
+        """
+        resume = {"checkpoint": checkpoint, "time_budget_s": time_budget_s}
+        source = "bytes"
+        if volume_path:
+            full_path = self.resolve_volume_path(volume_path)
+            if stream_decode is None:
+                stream_decode = os.path.getsize(full_path) >= STREAM_DECODE_MIN_BYTES
+            if stream_decode:
+                records = self._iter_job(self._prepare_file(
+                    full_path, language, vad, chunk_seconds, overlap_seconds,
+                    stitch, use_cache, timings, audio_format, sample_rate, **resume,
+                ))
+                source = "volume-stream"
+            else:
+                self.logger.info("Reading audio from volume: %s", full_path)
+                with open(full_path, "rb") as f:
+                    audio_bytes = f.read()
+                source = "volume"
+        if source != "volume-stream":
+            records = self._iter_transcribe(
+                audio_bytes, language, vad=vad, chunk_seconds=chunk_seconds,
+                overlap_seconds=overlap_seconds, stitch=stitch, use_cache=use_cache,
+                timings=timings, audio_format=audio_format, sample_rate=sample_rate,
+                **resume,
+            )
+        for record in records:
+            if record["type"] == "summary":
+                record["source"] = source
+            yield record
+
+    async def atranscribe(self, audio_bytes: bytes, language: str = "pt", **options) -> dict:
+        """The services' web_transcribe: aiter_transcribe's summary, untagged."""
+        async for record in self.aiter_transcribe(audio_bytes, language, **options):
+            pass
+        del record["type"]
+        return record
+
+    async def astream_response(self, audio_bytes: bytes, format: str = "ndjson",
+                               language: str = "pt", **options):
+        """The services' web_transcribe_stream: aiter_transcribe as a
+        StreamingResponse of NDJSON lines or SSE events."""
+        from fastapi.responses import StreamingResponse
+
+        records = self.aiter_transcribe(audio_bytes, language, **options)
+        # Decode/validation errors surface as a normal HTTP error, not a cut stream
+        first = await anext(records)
+
+        async def lines():
+            yield format_record(first, format)
+            async for record in records:
+                yield format_record(record, format)
+
+        media_type = "text/event-stream" if format == "sse" else "application/x-ndjson"
+        return StreamingResponse(lines(), media_type=media_type)
+
+    def transcribe_batch(self, files: list[dict], language: str = "pt",
+                         vad: bool = True, chunk_seconds: float = CHUNK_SECONDS,
+                         overlap_seconds: float = OVERLAP_SECONDS,
+                         stitch: str = STITCH_MODE, use_cache: bool = True,
+                         timings: bool = True, audio_format: str = "auto",
+                         sample_rate: int = audio_io.TARGET_SR) -> dict:
+        """The services' transcribe_batch(); files as documented there."""
+        items = []
+        for i, item in enumerate(files):
+            volume_path = item.get("volume_path", "")
+            if volume_path:
+                try:
+                    with open(self.resolve_volume_path(volume_path), "rb") as f:
+                        audio_bytes = f.read()
+                except (OSError, ValueError) as e:
+                    audio_bytes = b""
+                    self.logger.warning("Batch file unreadable on volume: %s (%s)", volume_path, e)
+            else:
+                audio_bytes = item.get("audio_bytes", b"")
+            items.append((item.get("name") or volume_path or f"file_{i}", audio_bytes))
+
+        result = self._do_transcribe_batch(
+            items, language, vad=vad, chunk_seconds=chunk_seconds,
+            overlap_seconds=overlap_seconds, stitch=stitch, use_cache=use_cache,
+            timings=timings, audio_format=audio_format, sample_rate=sample_rate,
+        )
+        for item, file_result in zip(files, result["results"]):
+            file_result["source"] = "volume" if item.get("volume_path") else "bytes"
+        return result
+
+    def run_warmup(self) -> None:
+        """Push WHISPER_WARMUP (warmup.py) through the real request path.
+
+        Single files of each length/format (sync path, then the async path
+        once), one batch as wide as --max-num-seqs, and a streamed file.
+        The cache is bypassed so nothing synthetic gets stored.
+        """
+        profile = warmup.WHISPER_WARMUP
+        self.logger.info("Warm-up imports: %.2fs", warmup.prime_imports(profile["imports"]))
+        for name, audio_bytes in warmup.corpus(profile["clips"]):
+            result = self._do_transcribe(audio_bytes, use_cache=False)
+            self.logger.info(
+                "Warm-up %s: %d chunk(s) in %.2fs",
+                name, result["chunks"], result["total_s"],
+            )
+        asyncio.run(self._awarmup(audio_bytes))
+
+        batch = warmup.corpus(
+            [(profile["batch_clip_s"], audio_io.TARGET_SR, 1, "wav")] * profile["batch_files"]
+        )
+        result = self._do_transcribe_batch(
+            batch, "pt", True, CHUNK_SECONDS, OVERLAP_SECONDS, STITCH_MODE, use_cache=False,
+        )
+        self.logger.info(
+            "Warm-up batch: %d file(s) in %.2fs", result["files"], result["inference_s"],
+        )
+
+        with tempfile.NamedTemporaryFile(suffix=".flac") as f:
+            f.write(warmup.encode_clip(profile["stream_s"], 44100, 2, "flac"))
+            f.flush()
+            _final_record(self._iter_job(self._prepare_file(
+                f.name, "pt", True, CHUNK_SECONDS, OVERLAP_SECONDS, STITCH_MODE,
+                use_cache=False,
+            )))
+
+    async def _awarmup(self, audio_bytes: bytes) -> None:
+        """One request through the async path, then drop the async client:
+        it is bound to this throwaway event loop."""
+        try:
+            async for _ in self.aiter_transcribe(audio_bytes, use_cache=False):
+                pass
+        finally:
+            await self._aclose()
+
+    def _do_transcribe(self, audio_bytes: bytes, language: str = "pt",
+                       vad: bool = True, chunk_seconds: float = CHUNK_SECONDS,
+                       overlap_seconds: float = OVERLAP_SECONDS,
+                       stitch: str = STITCH_MODE, use_cache: bool = True,
+                       timings: bool = True, audio_format: str = "auto",
+                       sample_rate: int = audio_io.TARGET_SR, **resume) -> dict:
+        """Shared transcription logic for both gRPC and web endpoints."""
+        return _final_record(self._iter_transcribe(
+            audio_bytes, language, vad=vad, chunk_seconds=chunk_seconds,
+            overlap_seconds=overlap_seconds, stitch=stitch, use_cache=use_cache,
+            timings=timings, audio_format=audio_format, sample_rate=sample_rate,
+            **resume,
+        ))
+
+    def _iter_transcribe(self, audio_bytes: bytes, language: str = "pt",
+                         vad: bool = True, chunk_seconds: float = CHUNK_SECONDS,
+                         overlap_seconds: float = OVERLAP_SECONDS,
+                         stitch: str = STITCH_MODE, use_cache: bool = True,
+                         timings: bool = True, audio_format: str = "auto",
+                         sample_rate: int = audio_io.TARGET_SR, **resume) -> Iterator[dict]:
+        """Transcription pipeline as a stream of records: plan, chunks, summary.
+
+        A cache hit yields only the summary, with "cached" set to "bytes" (same
+        upload) or "pcm" (same audio in another container or encoding).
+        resume: checkpoint / time_budget_s, as for _prepare.
+        """
+        yield from self._iter_job(self._prepare(
+            audio_bytes, language, vad, chunk_seconds, overlap_seconds, stitch,
+            use_cache, timings, audio_format, sample_rate, **resume,
+        ))
+
+    def _iter_job(self, job: dict) -> Iterator[dict]:
+        if "summary" in job:
+            yield self._served(job["summary"])
+            return
+        # A streamed job's plan is only known once decoding has finished
+        if not job.get("streaming"):
+            yield self._plan_record(job)
+
+        results_by_index = {}
+        chunks = enumerate(job["chunks"])
+        if isinstance(job["chunks"], list):
+            chunks = list(chunks)
+        checkpoint = job.get("checkpoint")
+        if checkpoint is None:
+            for r in self._dispatch(chunks, job["language"]):
+                results_by_index[r["index"]] = r
+                yield self._chunk_record(job, r)
+            yield self._served(self._summarize(job, results_by_index))
+            return
+
+        try:
+            for r in self._dispatch(self._resume(job, chunks, results_by_index),
+                                    job["language"]):
+                yield from self._restored_records(job, results_by_index)
+                results_by_index[r["index"]] = r
+                checkpoint.save(r["index"], job["plan"]["spans_s"][r["index"]], r)
+                yield self._chunk_record(job, r)
+        except (Exception, GeneratorExit):
+            # Failed, or closed early (a cancelled job): keep what was saved
+            checkpoint.commit()
+            raise
+        yield from self._restored_records(job, results_by_index)
+        yield self._served(self._finish_checkpointed(job, results_by_index))
+
+    async def aiter_transcribe(self, audio_bytes: bytes, language: str = "pt",
+                               vad: bool = True, chunk_seconds: float = CHUNK_SECONDS,
+                               overlap_seconds: float = OVERLAP_SECONDS,
+                               stitch: str = STITCH_MODE, use_cache: bool = True,
+                               timings: bool = True, audio_format: str = "auto",
+                               sample_rate: int = audio_io.TARGET_SR,
+                               checkpoint: bool = False,
+                               time_budget_s: float | None = None) -> AsyncIterator[dict]:
+        """Async _iter_transcribe: CPU stages in a worker thread, chunks on the event loop."""
+        job = await asyncio.to_thread(
+            self._prepare, audio_bytes, language, vad, chunk_seconds,
+            overlap_seconds, stitch, use_cache, timings, audio_format, sample_rate,
+            checkpoint, time_budget_s,
+        )
+        if "summary" in job:
+            yield self._served(job["summary"])
+            return
+        yield self._plan_record(job)
+
+        results_by_index = {}
+        chunks = enumerate(job["chunks"])
+        if checkpoint:
+            chunks = self._resume(job, chunks, results_by_index)
+        try:
+            async for r in self._adispatch(chunks, language):
+                if checkpoint:
+                    for record in self._restored_records(job, results_by_index):
+                        yield record
+                results_by_index[r["index"]] = r
+                if checkpoint:
+                    await asyncio.to_thread(
+                        job["checkpoint"].save, r["index"],
+                        job["plan"]["spans_s"][r["index"]], r,
+                    )
+                yield self._chunk_record(job, r)
+        except (Exception, GeneratorExit, asyncio.CancelledError):
+            # Failed, client gone (aclose) or request cancelled: keep what was saved.
+            # Shielded, so a second cancellation cannot cut the commit short.
+            if checkpoint:
+                await asyncio.shield(asyncio.to_thread(job["checkpoint"].commit))
+            raise
+        if checkpoint:
+            for record in self._restored_records(job, results_by_index):
+                yield record
+        finish = self._finish_checkpointed if checkpoint else self._summarize
+        yield self._served(await asyncio.to_thread(finish, job, results_by_index))
+
+    def _prepare(self, audio_bytes: bytes, language: str, vad: bool,
+                 chunk_seconds: float, overlap_seconds: float, stitch: str,
+                 use_cache: bool, timings: bool = True,
+                 audio_format: str = "auto",
+                 sample_rate: int = audio_io.TARGET_SR, checkpoint: bool = False,
+                 time_budget_s: float | None = None) -> dict:
+        """Validate, check the cache, decode and plan chunks.
+
+        Returns a job dict -- {"summary": ...} alone on a cache hit, otherwise
+        the lazy chunk iterator plus everything _summarize needs. With timings,
+        job["timings"] collects the per-stage breakdown as stages run.
+
+        Clips no longer than chunk_seconds (dictation) skip chunk planning:
+        the whole clip is one chunk, sent without a worker pool.
+
+        With checkpoint, finished chunks are saved as they arrive and a rerun
+        of the same job reuses them; time_budget_s stops taking new chunks
+        after that long, returning an incomplete summary to resume from.
+        """
+        t0 = time.perf_counter()
+        stage_times = {"bytes_in": len(audio_bytes)} if timings else None
+        params = _cache_params(
+            language, vad, chunk_seconds, overlap_seconds, stitch, self.model,
+        )
+        self._check_resume(checkpoint, time_budget_s)
+        bytes_key = pcm_key = None
+        if use_cache:
+            t_hash = time.perf_counter()
+            bytes_key = cache_key(
+                hashlib.sha256(audio_bytes).hexdigest(),
+                **params, **_raw_params(audio_format, sample_rate),
+            )
+            _add_time(stage_times, "hash_s", t_hash)
+            cached = self.cache.get(bytes_key)
+            if cached is not None:
+                return {"summary": self._cache_hit(cached, "bytes", t0, stage_times)}
+
+        audio_array = audio_io.decode_audio(
+            audio_bytes, audio_io.TARGET_SR, dtype="int16", timings=stage_times,
+            audio_format=audio_format, sample_rate=sample_rate,
+        )
+
+        if use_cache and audio_format == "pcm_s16le" and sample_rate == audio_io.TARGET_SR:
+            # The upload is the PCM: same key as bytes_key, which just missed
+            pcm_key = bytes_key
+        elif use_cache:
+            t_hash = time.perf_counter()
+            pcm_key = cache_key(hashlib.sha256(audio_array).hexdigest(), **params)
+            _add_time(stage_times, "hash_s", t_hash)
+            cached = self.cache.get(pcm_key)
+            if cached is not None:
+                self.cache.put(cached, bytes_key)
+                return {"summary": self._cache_hit(cached, "pcm", t0, stage_times)}
+
+        self._ensure_ready()
+
+        if len(audio_array) <= chunk_seconds * audio_io.TARGET_SR:
+            chunks, audio_duration, plan = _single_chunk(audio_array, vad)
+        else:
+            chunks, audio_duration, plan = chunk_audio(
+                audio_array, vad=vad, chunk_seconds=chunk_seconds,
+                overlap_seconds=overlap_seconds, timings=stage_times,
+            )
+        self.logger.info(
+            "Audio: %.1fs, %d chunk(s), %.1fs non-speech skipped",
+            audio_duration, len(plan["spans_s"]), plan["skipped_s"],
+        )
+        job = {
+            "t0": t0,
+            "t_infer": time.perf_counter(),
+            "http_before": self._transport_stats(),
+            "vllm_before": self._queue_metrics() if timings else None,
+            "timings": stage_times,
+            "language": language,
+            "stitch": stitch,
+            "chunks": chunks,
+            "audio_duration": audio_duration,
+            "plan": plan,
+            "cache_keys": tuple(dict.fromkeys((bytes_key, pcm_key))) if use_cache else (),
+        }
+        if checkpoint:
+            audio_key = pcm_key or cache_key(hashlib.sha256(audio_array).hexdigest(), **params)
+            plan_digest = hashlib.sha256(repr(plan["spans_s"]).encode()).hexdigest()
+            self._open_checkpoint(job, cache_key(audio_key, plan=plan_digest), time_budget_s)
+        return job
+
+    def _prepare_file(self, path: str, language: str, vad: bool,
+                      chunk_seconds: float, overlap_seconds: float, stitch: str,
+                      use_cache: bool, timings: bool = True,
+                      audio_format: str = "auto",
+                      sample_rate: int = audio_io.TARGET_SR, checkpoint: bool = False,
+                      time_budget_s: float | None = None) -> dict:
+        """_prepare for a volume file, decoded and planned as a stream.
+
+        Nothing is decoded up front: the job's chunk iterator reads, resamples
+        and plans the file window by window as the dispatcher pulls chunks, so
+        memory stays flat and the first chunks reach vLLM while the rest is
+        still being decoded. Duration, skipped time and the PCM cache key are
+        filled in when the stream ends (before _summarize runs).
+
+        A checkpoint is keyed by the file's bytes: its streamed chunk plan is
+        not known up front, but follows from the bytes and params alone.
+        """
+        t0 = time.perf_counter()
+        stage_times = {"bytes_in": os.path.getsize(path)} if timings else None
+        params = _cache_params(
+            language, vad, chunk_seconds, overlap_seconds, stitch, self.model,
+        )
+        self._check_resume(checkpoint, time_budget_s)
+        bytes_key = None
+        if use_cache or checkpoint:
+            t_hash = time.perf_counter()
+            with open(path, "rb") as f:
+                bytes_key = cache_key(
+                    hashlib.file_digest(f, "sha256").hexdigest(),
+                    **params, **_raw_params(audio_format, sample_rate),
+                )
+            _add_time(stage_times, "hash_s", t_hash)
+            cached = self.cache.get(bytes_key) if use_cache else None
+            if cached is not None:
+                return {"summary": self._cache_hit(cached, "bytes", t0, stage_times)}
+
+        self._ensure_ready()
+        self.logger.info("Streaming decode: %s (%.1fMB)", path, os.path.getsize(path) / 1e6)
+
+        plan = {"spans_s": [], "skipped_s": 0.0}
+        job = {
+            "t0": t0,
+            "t_infer": time.perf_counter(),
+            "http_before": self._transport_stats(),
+            "vllm_before": self._queue_metrics() if timings else None,
+            "timings": stage_times,
+            "language": language,
+            "stitch": stitch,
+            "audio_duration": 0.0,
+            "plan": plan,
+            "cache_keys": (),
+            "streaming": True,
+        }
+
+        def chunks():
+            pcm_hash = hashlib.sha256()
+
+            def blocks():
+                for block in audio_io.iter_decode_file(
+                    path, audio_io.TARGET_SR, timings=stage_times,
+                    audio_format=audio_format, sample_rate=sample_rate,
+                ):
+                    t_hash = time.perf_counter()
+                    pcm_hash.update(block)
+                    _add_time(stage_times, "hash_s", t_hash)
+                    yield block
+
+            yield from stream_chunks(
+                blocks(), plan, vad, chunk_seconds, overlap_seconds, timings=stage_times,
+            )
+            job["audio_duration"] = plan.pop("duration_s")
+            if use_cache:
+                job["cache_keys"] = (bytes_key, cache_key(pcm_hash.hexdigest(), **params))
+            self.logger.info(
+                "Audio: %.1fs, %d chunk(s), %.1fs non-speech skipped (streamed)",
+                job["audio_duration"], len(plan["spans_s"]), plan["skipped_s"],
+            )
+
+        job["chunks"] = chunks()
+        if checkpoint:
+            self._open_checkpoint(job, cache_key(bytes_key, plan="stream"), time_budget_s)
+        return job
+
+    @staticmethod
+    def _plan_record(job: dict) -> dict:
+        plan = job["plan"]
+        return {
+            "type": "plan",
+            "duration_audio_s": round(job["audio_duration"], 1),
+            "chunks": len(plan["spans_s"]),
+            "skipped_s": round(plan["skipped_s"], 1),
+            "spans_s": [(round(a, 2), round(b, 2)) for a, b in plan["spans_s"]],
+        }
+
+    @staticmethod
+    def _chunk_record(job: dict, r: dict, restored: bool = False) -> dict:
+        start_s, end_s = job["plan"]["spans_s"][r["index"]]
+        record = {
+            "type": "chunk",
+            "index": r["index"],
+            "start_s": round(start_s, 2),
+            "end_s": round(end_s, 2),
+            "text": r["text"],
+            "latency_s": round(r["latency_s"], 2),
+            "attempts": r["attempts"],
+            "elapsed_s": round(time.perf_counter() - job["t0"], 2),
+        }
+        if restored:
+            record["restored"] = True
+        return record
+
+    # --- checkpointed jobs (transcript_checkpoint.py) ---
+
+    def _check_resume(self, checkpoint: bool, time_budget_s: float | None) -> None:
+        if checkpoint and self.checkpoints is None:
+            raise ValueError("checkpoint=True needs a checkpoint store on this service")
+        if time_budget_s is not None and not checkpoint:
+            raise ValueError("time_budget_s needs checkpoint=True to resume from")
+        if time_budget_s is not None and time_budget_s <= 0:
+            raise ValueError("time_budget_s must be positive")
+
+    def _open_checkpoint(self, job: dict, key: str, time_budget_s: float | None) -> None:
+        job["checkpoint"] = self.checkpoints.open(key)
+        job["deadline"] = job["t0"] + time_budget_s if time_budget_s else None
+        job["resumed"] = 0
+        job["restored"] = []  # indices reused by _resume, not yet sent as records
+        if job["checkpoint"].done:
+            self.logger.info("Checkpoint: %d chunk(s) already done", len(job["checkpoint"].done))
+
+    @staticmethod
+    def _resume(job: dict, chunks, results_by_index: dict) -> Iterator:
+        """Filter (index, chunk) pairs: reuse checkpointed results, stop at the deadline.
+
+        Reused results go straight into results_by_index, their indices into
+        job["restored"] for _restored_records. Past the deadline
+        no new chunk is handed out (those in flight still finish) and
+        job["stopped"] is set.
+        """
+        checkpoint, deadline = job["checkpoint"], job["deadline"]
+        for index, chunk in chunks:
+            stored = checkpoint.get(index, job["plan"]["spans_s"][index])
+            if stored is not None:
+                results_by_index[index] = stored
+                job["resumed"] += 1
+                job["restored"].append(index)
+                continue
+            if deadline is not None and time.perf_counter() > deadline:
+                job["stopped"] = True
+                return
+            yield index, chunk
+
+    def _restored_records(self, job: dict, results_by_index: dict) -> Iterator[dict]:
+        """Chunk records (flagged "restored") for results _resume reused since the last call."""
+        restored, job["restored"] = job["restored"], []
+        for index in restored:
+            yield self._chunk_record(job, results_by_index[index], restored=True)
+
+    def _finish_checkpointed(self, job: dict, results_by_index: dict) -> dict:
+        """Summary of a finished checkpointed job (checkpoint dropped), or a partial one."""
+        checkpoint = job["checkpoint"]
+        if job.get("stopped"):
+            checkpoint.commit()
+            plan = job["plan"]
+            self.logger.info(
+                "Time budget spent: %d of %s chunk(s) done, checkpoint kept",
+                len(results_by_index), "?" if job.get("streaming") else len(plan["spans_s"]),
+            )
+            return {
+                "type": "summary",
+                "complete": False,
+                "text": "",
+                "language": job["language"],
+                "chunks_done": len(results_by_index),
+                # A streamed file's plan is only complete once it is fully decoded
+                "chunks_planned": None if job.get("streaming") else len(plan["spans_s"]),
+                "resumed_chunks": job["resumed"],
+                "total_s": round(time.perf_counter() - job["t0"], 2),
+                "cached": False,
+                "mode": self.mode,
+            }
+        summary = self._summarize(job, results_by_index)
+        checkpoint.clear()
+        summary["resumed_chunks"] = job["resumed"]
+        return summary
+
+    def _summarize(self, job: dict, results_by_index: dict) -> dict:
+        """Stitch chunk results in order, log, cache and build the summary record."""
+        plan = job["plan"]
+        audio_duration = job["audio_duration"]
+        num_chunks = len(plan["spans_s"])
+        chunk_results = [results_by_index[i] for i in sorted(results_by_index)]
+        latencies = [r["latency_s"] for r in chunk_results] or [0.0]
+
+        infer_time = time.perf_counter() - job["t_infer"]
+        t_stitch = time.perf_counter()
+        full_text, overlaps_merged = stitch_chunks(
+            chunk_results, plan["spans_s"], job["stitch"],
+        )
+        stitch_s = time.perf_counter() - t_stitch
+        elapsed = time.perf_counter() - job["t0"]
+
+        self.logger.info(
+            "Transcribed %.1fs audio in %.1fs (infer %.1fs, RTF %.3f, "
+            "chunk latency min %.2fs / max %.2fs, retries %d)",
+            audio_duration, elapsed, infer_time,
+            elapsed / audio_duration if audio_duration > 0 else 0,
+            min(latencies), max(latencies),
+            sum(r["attempts"] - 1 for r in chunk_results),
+        )
+
+        summary = {
+            "type": "summary",
+            "text": full_text,
+            "language": job["language"],
+            "duration_audio_s": round(audio_duration, 1),
+            "inference_s": round(infer_time, 2),
+            "total_s": round(elapsed, 2),
+            "rtf": round(elapsed / audio_duration, 3) if audio_duration > 0 else 0,
+            "chunks": num_chunks,
+            "skipped_s": round(plan["skipped_s"], 1),
+            "stitch": job["stitch"],
+            "stitch_used": _stitch_used(job["stitch"], chunk_results),
+            "overlaps_merged": overlaps_merged,
+            "cached": False,
+            "http_container": _stats_delta(job["http_before"], self._transport_stats()),
+            "chunk_latencies_s": [round(r["latency_s"], 2) for r in chunk_results],
+            "max_in_flight": min(MAX_CONCURRENT_CHUNKS, num_chunks),
+            "mode": self.mode,
+        }
+        if job["cache_keys"]:
+            self.cache.put(_without(summary, _PER_REQUEST_FIELDS), *job["cache_keys"])
+        if job["timings"] is not None:
+            summary["timings"] = self._timing_breakdown(job, chunk_results, stitch_s)
+        return summary
+
+    def _timing_breakdown(self, job: dict, chunk_results: list[dict],
+                          stitch_s: float) -> dict:
+        """Per-stage timings and byte counts for one job, logged and returned.
+
+        vllm_queue_s / vllm_inference_s come from the server's /metrics
+        counters, so with concurrent requests they include their traffic too.
+        """
+        timings = dict(job["timings"])
+        timings.update(
+            encode_s=sum(r["encode_s"] for r in chunk_results),
+            chunk_latency_s=_percentile_summary([r["latency_s"] for r in chunk_results]),
+            stitch_s=stitch_s,
+            bytes_to_vllm=sum(r["bytes_sent"] for r in chunk_results),
+            bytes_from_vllm=sum(r["bytes_received"] for r in chunk_results),
+        )
+        before, after = job["vllm_before"], self._queue_metrics()
+        if before is not None and after is not None:
+            served = after["requests"] - before["requests"]
+            queued = after["queue_s"] - before["queue_s"]
+            timings["vllm_queue_s"] = {
+                "total": queued, "mean": queued / served if served else 0.0,
+            }
+            timings["vllm_inference_s"] = after["inference_s"] - before["inference_s"]
+
+        self.logger.info(
+            "Timings: decode %.3fs (%s), resample %.3fs, hash %.3fs, plan %.3fs, "
+            "encode %.3fs, stitch %.3fs; chunk latency %s; vLLM queue %s; "
+            "%d bytes in, %d to vLLM, %d back",
+            timings.get("decode_s", 0), timings.get("decoder", "-"),
+            timings.get("resample_s", 0), timings.get("hash_s", 0),
+            timings.get("plan_s", 0), timings["encode_s"], stitch_s,
+            timings["chunk_latency_s"], timings.get("vllm_queue_s", "n/a"),
+            timings["bytes_in"], timings["bytes_to_vllm"], timings["bytes_from_vllm"],
+        )
+        return _round_floats(timings)
+
+    def _do_transcribe_batch(self, items: list[tuple[str, bytes]], language: str,
+                             vad: bool, chunk_seconds: float, overlap_seconds: float,
+                             stitch: str, use_cache: bool, timings: bool = True,
+                             audio_format: str = "auto",
+                             sample_rate: int = audio_io.TARGET_SR) -> dict:
+        """Transcribe many files with all their chunks in one shared work queue."""
+        batch = self._prepare_batch(
+            items, [self._prepare_or_error(audio_bytes, language, vad, chunk_seconds,
+                                           overlap_seconds, stitch, use_cache, timings,
+                                           audio_format, sample_rate)
+                    for _, audio_bytes in items],
+        )
+        for r in self._dispatch(enumerate(batch["chunks"]), language):
+            self._absorb_batch_result(batch, r)
+        return self._served(self._summarize_batch(batch))
+
+    async def atranscribe_batch(self, items: list[tuple[str, bytes]], language: str,
+                                vad: bool, chunk_seconds: float,
+                                overlap_seconds: float, stitch: str,
+                                use_cache: bool, timings: bool = True,
+                                audio_format: str = "auto",
+                                sample_rate: int = audio_io.TARGET_SR) -> dict:
+        """Async _do_transcribe_batch: files decode in parallel worker threads."""
+        jobs = await asyncio.gather(*[
+            asyncio.to_thread(self._prepare_or_error, audio_bytes, language, vad,
+                              chunk_seconds, overlap_seconds, stitch, use_cache,
+                              timings, audio_format, sample_rate)
+            for _, audio_bytes in items
+        ])
+        batch = self._prepare_batch(items, jobs)
+        async for r in self._adispatch(enumerate(batch["chunks"]), language):
+            await asyncio.to_thread(self._absorb_batch_result, batch, r)
+        return self._served(self._summarize_batch(batch))
+
+    def _prepare_or_error(self, *args) -> dict:
+        """_prepare for one file of a batch; a bad file fails alone, not the batch."""
+        if not args[0]:
+            return {"error": "No audio data"}
+        try:
+            return self._prepare(*args)
+        except (ValueError, OSError) as e:
+            self.logger.warning("Batch file rejected: %s", e)
+            return {"error": str(e)}
+
+    def _prepare_batch(self, items: list[tuple[str, bytes]], jobs: list[dict]) -> dict:
+        """Flatten the chunks of every prepared file into one lazy stream.
+
+        owners[i] maps the i-th chunk of the stream back to (file, local index);
+        it is filled as the dispatcher pulls chunks, always before the chunk is
+        submitted.
+        """
+        owners = []
+
+        def chunks():
+            for pos, job in enumerate(jobs):
+                if "chunks" not in job:
+                    continue
+                for local, chunk in enumerate(job["chunks"]):
+                    owners.append((pos, local))
+                    yield chunk
+
+        batch = {
+            "t0": time.perf_counter(),
+            "http_before": self._transport_stats(),
+            "names": [name for name, _ in items],
+            "jobs": jobs,
+            "results": [job.get("summary") for job in jobs],
+            "by_index": [{} for _ in jobs],
+            "owners": owners,
+            "chunks": chunks(),
+        }
+        # Files whose plan has no chunks at all (pure silence) are done already
+        for pos, job in enumerate(jobs):
+            if "chunks" in job and not job["plan"]["spans_s"]:
+                batch["results"][pos] = self._summarize(job, {})
+        return batch
+
+    def _absorb_batch_result(self, batch: dict, r: dict) -> None:
+        """File one chunk result under its owner; summarize the file once complete."""
+        pos, local = batch["owners"][r["index"]]
+        job = batch["jobs"][pos]
+        by_index = batch["by_index"][pos]
+        by_index[local] = {**r, "index": local}
+        if len(by_index) == len(job["plan"]["spans_s"]):
+            batch["results"][pos] = self._summarize(job, by_index)
+
+    def _summarize_batch(self, batch: dict) -> dict:
+        results = []
+        for name, job, summary in zip(batch["names"], batch["jobs"], batch["results"]):
+            if summary is None:
+                results.append({"name": name, "error": job["error"]})
+            else:
+                results.append({"name": name, **{k: v for k, v in summary.items() if k != "type"}})
+
+        ok = [r for r in results if "error" not in r]
+        duration = sum(r["duration_audio_s"] for r in ok)
+        elapsed = time.perf_counter() - batch["t0"]
+        num_chunks = sum(r["chunks"] for r in ok if not r["cached"])
+        self.logger.info(
+            "Batch: %d file(s), %.1fs audio, %d chunk(s) in %.1fs (%d cached, %d failed)",
+            len(results), duration, num_chunks, elapsed,
+            sum(1 for r in ok if r["cached"]), len(results) - len(ok),
+        )
+        return {
+            "results": results,
+            "files": len(results),
+            "failed": len(results) - len(ok),
+            "cached": sum(1 for r in ok if r["cached"]),
+            "chunks": num_chunks,
+            "duration_audio_s": round(duration, 1),
+            "inference_s": round(elapsed, 2),
+            "rtf": round(elapsed / duration, 3) if duration > 0 else 0,
+            "http_container": _stats_delta(batch["http_before"], self._transport_stats()),
+            "max_in_flight": min(MAX_CONCURRENT_CHUNKS, num_chunks),
+            "mode": f"{self.mode}-batch",
+        }
+
+    def _served(self, result: dict) -> dict:
+        """Tag a final result; the container's first one carries the cold-start timeline."""
+        result.update(self.coldstart.first_response())
+        return result
+
+    def _cache_hit(self, cached: dict, kind: str, t0: float,
+                   timings: dict | None = None) -> dict:
+        elapsed = time.perf_counter() - t0
+        duration = cached["duration_audio_s"]
+        self.logger.info("Cache hit (%s): %.1fs audio in %.3fs", kind, duration, elapsed)
+        summary = {
+            # Entries written before per-request fields were kept out still carry them
+            **_without(cached, _PER_REQUEST_FIELDS),
+            "type": "summary",
+            "inference_s": 0.0,
+            "total_s": round(elapsed, 3),
+            "rtf": round(elapsed / duration, 4) if duration > 0 else 0,
+            "cached": kind,
+        }
+        if timings is not None:
+            summary["timings"] = _round_floats(timings)
+        return summary
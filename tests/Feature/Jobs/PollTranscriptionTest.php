@@ -0,0 +1,142 @@
+<?php
+
+namespace Tests\Feature\Jobs;
+
+use App\Enums\TranscriptionStatus;
+use App\Jobs\PollTranscription;
+use App\Models\Transcription;
+use App\Services\ModalService;
+use Illuminate\Foundation\Testing\RefreshDatabase;
+use Mockery;
+use Tests\TestCase;
+
+class PollTranscriptionTest extends TestCase
+{
+    use RefreshDatabase;
+
+    public function test_completes_transcription_when_job_is_done(): void
+    {
+        $transcription = Transcription::factory()->processing()->create();
+
+        $mockModal = Mockery::mock(ModalService::class);
+        $mockModal->shouldReceive('transcriptionStatus')
+            ->once()
+            ->with('job-1')
+            ->andReturn(['state' => 'done', 'chunks_done' => 4, 'chunks_planned' => 4, 'eta_s' => 0.0]);
+        $mockModal->shouldReceive('transcriptionResult')
+            ->once()
+            ->with('job-1')
+            ->andReturn(['text' => 'Texto transcrito de teste.', 'inference_s' => 5.2, 'rtf' => 0.12]);
+
+        $job = (new PollTranscription($transcription->id, 'job-1'))->withFakeQueueInteractions();
+        $job->handle($mockModal);
+
+        $job->assertNotReleased();
+        $transcription->refresh();
+        $this->assertEquals(TranscriptionStatus::Completed, $transcription->status);
+        $this->assertEquals('Texto transcrito de teste.', $transcription->text);
+        $this->assertEquals(0.12, $transcription->rtf);
+        $this->assertEquals('job-1', $transcription->metadata['job_id']);
+    }
+
+    public function test_records_progress_and_polls_again_while_running(): void
+    {
+        $transcription = Transcription::factory()->processing()->create();
+
+        $mockModal = Mockery::mock(ModalService::class);
+        $mockModal->shouldReceive('transcriptionStatus')
+            ->once()
+            ->andReturn(['state' => 'running', 'chunks_done' => 3, 'chunks_planned' => 10, 'eta_s' => 40.0]);
+        $mockModal->shouldNotReceive('transcriptionResult');
+
+        $job = (new PollTranscription($transcription->id, 'job-1'))->withFakeQueueInteractions();
+        $job->handle($mockModal);
+
+        $job->assertReleased(delay: 20);
+        $transcription->refresh();
+        $this->assertEquals(TranscriptionStatus::Processing, $transcription->status);
+        $this->assertEquals(3, $transcription->metadata['chunks_done']);
+        $this->assertEquals(10, $transcription->metadata['chunks_planned']);
+    }
+
+    public function test_marks_transcription_as_failed_when_job_failed(): void
+    {
+        $transcription = Transcription::factory()->processing()->create();
+
+        $mockModal = Mockery::mock(ModalService::class);
+        $mockModal->shouldReceive('transcriptionStatus')
+            ->once()
+            ->andReturn(['state' => 'failed', 'error' => 'RuntimeError: GPU timeout']);
+
+        $job = (new PollTranscription($transcription->id, 'job-1'))->withFakeQueueInteractions();
+        $job->handle($mockModal);
+
+        $job->assertNotReleased();
+        $transcription->refresh();
+        $this->assertEquals(TranscriptionStatus::Failed, $transcription->status);
+        $this->assertStringContainsString('GPU timeout', $transcription->error_message);
+    }
+
+    public function test_fails_without_retrying_when_job_is_unknown(): void
+    {
+        $transcription = Transcription::factory()->processing()->create();
+
+        $mockModal = Mockery::mock(ModalService::class);
+        $mockModal->shouldReceive('transcriptionStatus')
+            ->once()
+            ->with('job-gone')
+            ->andReturn(null);
+        $mockModal->shouldNotReceive('transcriptionResult');
+
+        $job = (new PollTranscription($transcription->id, 'job-gone'))->withFakeQueueInteractions();
+        $job->handle($mockModal);
+
+        $job->assertFailed();
+        $job->assertNotReleased();
+        $transcription->refresh();
+        $this->assertEquals(TranscriptionStatus::Failed, $transcription->status);
+        $this->assertStringContainsString('job-gone', $transcription->error_message);
+    }
+
+    public function test_cancels_modal_job_when_polling_gives_up(): void
+    {
+        $transcription = Transcription::factory()->processing()->create();
+
+        $mockModal = Mockery::mock(ModalService::class);
+        $mockModal->shouldReceive('cancelTranscription')
+            ->once()
+            ->with('job-1')
+            ->andReturn(true);
+        $this->app->instance(ModalService::class, $mockModal);
+
+        (new PollTranscription($transcription->id, 'job-1'))
+            ->failed(new \RuntimeException('Transcription status failed (502)'));
+
+        $transcription->refresh();
+        $this->assertEquals(TranscriptionStatus::Failed, $transcription->status);
+        $this->assertStringContainsString('502', $transcription->error_message);
+    }
+
+    public function test_does_not_cancel_when_transcription_already_ended(): void
+    {
+        $transcription = Transcription::factory()->failed()->create();
+
+        $mockModal = Mockery::mock(ModalService::class);
+        $mockModal->shouldNotReceive('cancelTranscription');
+        $this->app->instance(ModalService::class, $mockModal);
+
+        (new PollTranscription($transcription->id, 'job-1'))->failed(null);
+
+        $this->assertEquals(TranscriptionStatus::Failed, $transcription->refresh()->status);
+    }
+
+    public function test_next_delay_follows_eta_within_bounds(): void
+    {
+        $job = new PollTranscription('id', 'job-1');
+
+        $this->assertEquals(PollTranscription::MIN_DELAY_S, $job->nextDelay(null));
+        $this->assertEquals(PollTranscription::MIN_DELAY_S, $job->nextDelay(1.0));
+        $this->assertEquals(20, $job->nextDelay(40.0));
+        $this->assertEquals(PollTranscription::MAX_DELAY_S, $job->nextDelay(600.0));
+    }
+}
@@ -3,10 +3,12 @@
 namespace Tests\Feature\Jobs;
 
 use App\Enums\TranscriptionStatus;
+use App\Jobs\PollTranscription;
 use App\Jobs\ProcessTranscription;
 use App\Models\Transcription;
 use App\Services\ModalService;
 use Illuminate\Foundation\Testing\RefreshDatabase;
+use Illuminate\Support\Facades\Queue;
 use Mockery;
 use Tests\TestCase;
 
@@ -19,6 +21,7 @@ class ProcessTranscriptionTest extends TestCase
         $transcription = Transcription::factory()->pending()->create();
 
         $mockModal = Mockery::mock(ModalService::class);
+        $mockModal->shouldReceive('supportsJobs')->andReturn(false);
         $mockModal->shouldReceive('run')
             ->once()
             ->with('whisper-http', Mockery::on(function (array $options) use ($transcription) {
@@ -55,6 +58,7 @@ class ProcessTranscriptionTest extends TestCase
         $transcription = Transcription::factory()->pending()->create();
 
         $mockModal = Mockery::mock(ModalService::class);
+        $mockModal->shouldReceive('supportsJobs')->andReturn(false);
         $mockModal->shouldReceive('run')
             ->once()
             ->andThrow(new \RuntimeException('GPU timeout'));
@@ -79,6 +83,7 @@ class ProcessTranscriptionTest extends TestCase
         $transcription = Transcription::factory()->pending()->create();
 
         $mockModal = Mockery::mock(ModalService::class);
+        $mockModal->shouldReceive('supportsJobs')->andReturn(false);
         $mockModal->shouldReceive('run')
             ->once()
             ->andReturn([
@@ -101,4 +106,32 @@ class ProcessTranscriptionTest extends TestCase
         $this->assertEquals(TranscriptionStatus::Failed, $transcription->status);
         $this->assertStringContainsString('no result', $transcription->error_message);
     }
+
+    public function test_submits_job_and_dispatches_poll_when_jobs_are_supported(): void
+    {
+        Queue::fake();
+        $transcription = Transcription::factory()->pending()->create();
+
+        $mockModal = Mockery::mock(ModalService::class);
+        $mockModal->shouldReceive('supportsJobs')->once()->andReturn(true);
+        $mockModal->shouldReceive('submitTranscription')
+            ->once()
+            ->with(Mockery::type('string'), 'pt')
+            ->andReturn(['job_id' => 'job-1', 'state' => 'queued']);
+        $mockModal->shouldNotReceive('transcribe');
+
+        $job = new ProcessTranscription($transcription->id);
+        $job->handle($mockModal);
+
+        $transcription->refresh();
+        $this->assertEquals(TranscriptionStatus::Processing, $transcription->status);
+        $this->assertEquals('job-1', $transcription->metadata['job_id']);
+        $this->assertEquals('queued', $transcription->metadata['job_state']);
+
+        Queue::assertPushed(PollTranscription::class, function (PollTranscription $poll) use ($transcription) {
+            return $poll->transcriptionId === $transcription->id
+                && $poll->jobId === 'job-1'
+                && $poll->delay !== null;
+        });
+    }
 }